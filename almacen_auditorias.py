@@ -0,0 +1,260 @@
+import glob
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+
+from normalizacion import normalizar_dni_columna, normalizar_dni_final
+from pipeline_auditoria import lote_vacio
+from registros import BaseRNTAnual, BaseRNTMensual, Perceptor190, RegistroIDC, columnas_registros
+
+# Almacén en Parquet de los registros extraídos, para no perder una auditoría
+# al cerrar la pestaña ni volver a leer los PDFs para compararla con otras.
+# Una carpeta por tabla con particiones estilo Hive por CIF del cliente y año:
+#     <almacén>/rnt_anual/cif=B12345678/anio=2025/datos.parquet
+# Guardar una auditoría reemplaza su partición; las consultas por CIF o año
+# solo abren las carpetas que tocan y las de DNI filtran dentro del Parquet.
+
+RUTA_ALMACEN = os.environ.get(
+    "AUDITORIA_ALMACEN",
+    os.path.join(os.path.expanduser("~"), ".local", "share", "auditoria", "almacen")
+)
+
+_FECHA = pa.timestamp("us")
+_IMPORTE = pa.float64()
+
+# tabla -> (clave del lote, columna de DNI, esquema, clase de registro). Las
+# columnas van tipadas (fechas como fechas, importes como float) y en el orden
+# de los campos del registro. Las nóminas siguen siendo diccionarios (clase None).
+TABLAS = {
+    "idc": ("raw_idc", "DNI_Trabajador", pa.schema([
+        ("Nombre", pa.string()), ("DNI_Trabajador", pa.string()), ("NIF_Empresa", pa.string()),
+        ("Empresa", pa.string()), ("CTP", pa.int32()), ("Es_Autonomo", pa.bool_()),
+        ("Desde_Info", _FECHA), ("Hasta_Info", _FECHA), ("Inicio_Contrato", _FECHA),
+        ("Tramos_IT", pa.list_(pa.struct([("desde", _FECHA), ("hasta", _FECHA)]))),
+        ("Alta", _FECHA), ("Baja", _FECHA), ("Tipo_Contrato", pa.string()),
+    ]), RegistroIDC),
+    "190": ("raw_190", "NIF", pa.schema([
+        ("Archivo", pa.string()), ("NIF", pa.string()), ("Nombre", pa.string()), ("Clave", pa.string()),
+        ("Subclave", pa.string()), ("Dinerarias NO IL", _IMPORTE), ("Especie NO IL", _IMPORTE),
+        ("Dinerarias IL", _IMPORTE), ("Especie IL", _IMPORTE), ("Año_190", pa.int32()),
+    ]), Perceptor190),
+    "rnt_mensual": ("raw_rnt_det", "DNI", pa.schema([
+        ("IPF", pa.string()), ("DNI", pa.string()), ("Año", pa.int32()), ("Mes", pa.int32()),
+        ("Base_CC", _IMPORTE), ("Base_AT", _IMPORTE), ("Base_Solidaridad", _IMPORTE),
+    ]), BaseRNTMensual),
+    "rnt_anual": ("raw_rnt_res", "DNI", pa.schema([
+        ("DNI", pa.string()), ("Año", pa.int32()), ("Base_CC_Anual", _IMPORTE),
+        ("Base_AT_Anual", _IMPORTE), ("Base_Solidaridad_Anual", _IMPORTE),
+    ]), BaseRNTAnual),
+    "nominas": ("raw_nom", "DNI", pa.schema([
+        ("Archivo", pa.string()), ("Nombre", pa.string()), ("DNI", pa.string()), ("MesNomina", pa.string()),
+        ("Anualidad", pa.string()), ("Salario", pa.string()), ("AportacionEmpresa", _IMPORTE),
+        ("Empresa", pa.string()), ("CIF", pa.string()),
+    ]), None),
+}
+
+# Columna extra con el DNI normalizado, para consultar sin depender del formato
+COLUMNA_DNI = "DNI_Normalizado"
+
+# Versión del formato de los archivos, en los metadatos de cada Parquet.
+# Súbela si cambia algún esquema y añade aquí cómo pasar del anterior.
+# 1 (sin metadatos): Alta y Baja del IDC como texto ("dd-mm-YYYY", "ACTIVO")
+FORMATO_ALMACEN = 2
+_CLAVE_FORMATO = b"formato_almacen"
+_PARTICIONES = pa.schema([("cif", pa.string()), ("anio", pa.int32())])
+
+
+def _cif_valido(cif):
+    cif = "".join(str(cif or "").split()).upper()
+    if not re.fullmatch(r"[A-Z0-9]{1,15}", cif):
+        raise ValueError(f"CIF no válido para el almacén: {cif!r}")
+    return cif
+
+
+def _ruta_particion(ruta, tabla, cif, anio):
+    return os.path.join(ruta, tabla, f"cif={cif}", f"anio={int(anio)}")
+
+
+def cif_de_lote(lote, cif_manual=""):
+    """
+    CIF del cliente de un lote: el indicado a mano o, si no, el NIF de
+    empresa más repetido en los IDC (o en las nóminas). None si no hay ninguno.
+    """
+    if cif_manual.strip():
+        return cif_manual.strip().upper()
+    for nifs in ((r.nif_empresa for r in lote["raw_idc"]), (r.get("CIF") for r in lote["raw_nom"])):
+        candidatos = Counter(
+            nif for nif in (str(n or "").strip().upper() for n in nifs)
+            if re.fullmatch(r"[A-Z0-9]{9}", nif)
+        )
+        if candidatos:
+            return candidatos.most_common(1)[0][0]
+    return None
+
+
+def _a_tabla(registros, tabla):
+    _, col_dni, esquema, clase = TABLAS[tabla]
+    if clase is None:
+        # Nóminas: el extractor da AportacionEmpresa como texto ("1234.56"); aquí va como importe
+        registros = [dict(r, AportacionEmpresa=float(r.get("AportacionEmpresa") or 0)) for r in registros]
+        datos = pa.Table.from_pylist(registros, schema=esquema)
+    else:
+        columnas = columnas_registros(registros, clase)
+        if tabla == "idc":
+            columnas["Tramos_IT"] = [[{"desde": a, "hasta": b} for a, b in t] for t in columnas["Tramos_IT"]]
+        datos = pa.Table.from_pydict(columnas, schema=esquema)
+    dnis = normalizar_dni_columna(pd.Series(datos.column(col_dni).to_pylist(), dtype=object))
+    return datos.append_column(COLUMNA_DNI, pa.array(dnis.tolist(), pa.string()))
+
+
+def _a_registros(datos, tabla):
+    _, _, esquema, clase = TABLAS[tabla]
+    if clase is None:
+        return datos.select(esquema.names).to_pylist()
+    # Las columnas del esquema van en el orden de los campos de la clase
+    columnas = [datos.column(nombre).to_pylist() for nombre in esquema.names]
+    if tabla == "idc":
+        i = esquema.names.index("Tramos_IT")
+        columnas[i] = [tuple((t["desde"], t["hasta"]) for t in tramos or []) for tramos in columnas[i]]
+    return [clase(*fila) for fila in zip(*columnas)]
+
+
+def _idc_desde_formato_1(datos):
+    altas, bajas = [], []
+    for alta, baja in zip(datos.column("Alta").to_pylist(), datos.column("Baja").to_pylist()):
+        # Como el extractor: baja None si sigue ACTIVO, alta None si alguna es ilegible
+        try:
+            f_alta = datetime.strptime(alta, "%d-%m-%Y")
+            f_baja = datetime.strptime(baja, "%d-%m-%Y") if baja != "ACTIVO" else None
+        except (TypeError, ValueError):
+            f_alta, f_baja = None, None
+        altas.append(f_alta)
+        bajas.append(f_baja)
+    for columna, valores in (("Alta", altas), ("Baja", bajas)):
+        i = datos.schema.get_field_index(columna)
+        datos = datos.set_column(i, pa.field(columna, _FECHA), pa.array(valores, _FECHA))
+    return datos
+
+
+def _escribir(datos, destino):
+    import pyarrow.parquet as pq
+    datos = datos.replace_schema_metadata({_CLAVE_FORMATO: str(FORMATO_ALMACEN).encode()})
+    # Se escribe aparte y se cambia de golpe: una lectura a la vez nunca ve medio
+    # archivo (y las consultas se saltan los que empiezan por punto)
+    temporal = os.path.join(os.path.dirname(destino), f".datos.{os.getpid()}.tmp")
+    pq.write_table(datos, temporal)
+    os.replace(temporal, destino)
+
+
+def _poner_al_dia(archivo, tabla):
+    """
+    Reescribe en el formato actual un archivo guardado con uno anterior. Uno
+    de una versión más nueva de la app da ValueError.
+    """
+    import pyarrow.parquet as pq
+    formato = int((pq.read_schema(archivo).metadata or {}).get(_CLAVE_FORMATO, b"1"))
+    if formato == FORMATO_ALMACEN:
+        return
+    if formato > FORMATO_ALMACEN:
+        raise ValueError(f"{archivo} está guardado con una versión más nueva de la app (formato {formato})")
+    datos = pq.read_table(archivo, partitioning=None)
+    if tabla == "idc":
+        datos = _idc_desde_formato_1(datos)
+    _escribir(datos, archivo)
+
+
+def guardar_auditoria(lote, cif, anio, ruta=RUTA_ALMACEN):
+    """
+    Guarda los registros crudos del lote (IDC, 190, RNT mensual y anual,
+    nóminas) en la partición CIF/año, sustituyendo lo que hubiera.
+    Devuelve {tabla: filas guardadas}.
+    """
+    cif = _cif_valido(cif)
+    filas = {}
+    for tabla, (clave, *_) in TABLAS.items():
+        carpeta = _ruta_particion(ruta, tabla, cif, anio)
+        destino = os.path.join(carpeta, "datos.parquet")
+        if not lote[clave]:
+            if os.path.exists(destino):
+                os.remove(destino)
+            continue
+        os.makedirs(carpeta, exist_ok=True)
+        _escribir(_a_tabla(lote[clave], tabla), destino)
+        filas[tabla] = len(lote[clave])
+    return filas
+
+
+def auditorias_guardadas(ruta=RUTA_ALMACEN):
+    """
+    Auditorías del almacén: lista de dicts {CIF, Año, Guardada, <tabla>: filas},
+    de la más reciente a la más antigua.
+    """
+    import pyarrow.parquet as pq
+    auditorias = {}
+    for tabla in TABLAS:
+        base = os.path.join(ruta, tabla)
+        if not os.path.isdir(base):
+            continue
+        for carpeta_cif in os.listdir(base):
+            if not carpeta_cif.startswith("cif=") or not os.path.isdir(os.path.join(base, carpeta_cif)):
+                continue
+            for carpeta_anio in os.listdir(os.path.join(base, carpeta_cif)):
+                archivo = os.path.join(base, carpeta_cif, carpeta_anio, "datos.parquet")
+                if not carpeta_anio.startswith("anio=") or not os.path.exists(archivo):
+                    continue
+                clave = (carpeta_cif[4:], int(carpeta_anio[5:]))
+                auditoria = auditorias.setdefault(clave, {"CIF": clave[0], "Año": clave[1], "Guardada": 0.0})
+                auditoria["Guardada"] = max(auditoria["Guardada"], os.path.getmtime(archivo))
+                auditoria[tabla] = pq.read_metadata(archivo).num_rows
+    resultado = sorted(auditorias.values(), key=lambda a: (-a["Año"], a["CIF"]))
+    for auditoria in resultado:
+        auditoria["Guardada"] = time.strftime("%d-%m-%Y %H:%M", time.localtime(auditoria["Guardada"]))
+    return resultado
+
+
+def cargar_auditoria(cif, anio, ruta=RUTA_ALMACEN):
+    """
+    Lote (ver lote_vacio) con los registros guardados de una auditoría, listo
+    para el Cuadro de Mando. Las nóminas traen AportacionEmpresa como número.
+    """
+    import pyarrow.parquet as pq
+    cif = _cif_valido(cif)
+    lote = lote_vacio()
+    for tabla, (clave, *_) in TABLAS.items():
+        archivo = os.path.join(_ruta_particion(ruta, tabla, cif, anio), "datos.parquet")
+        if os.path.exists(archivo):
+            _poner_al_dia(archivo, tabla)
+            lote[clave] = _a_registros(pq.read_table(archivo), tabla)
+    return lote
+
+
+def consultar(tabla, dni=None, cif=None, anio=None, ruta=RUTA_ALMACEN):
+    """
+    Registros de `tabla` (clave de TABLAS) de todas las auditorías guardadas,
+    filtrados por DNI (en cualquier formato), CIF y año si se indican.
+    Devuelve un DataFrame con las columnas de la tabla más "cif" y "anio".
+    """
+    import pyarrow.dataset as ds
+    base = os.path.join(ruta, tabla)
+    columnas = TABLAS[tabla][2].names + ["cif", "anio"]
+    if not os.path.isdir(base):
+        return pd.DataFrame(columns=columnas)
+
+    for archivo in glob.glob(os.path.join(base, "cif=*", "anio=*", "datos.parquet")):
+        _poner_al_dia(archivo, tabla)
+
+    filtro = None
+    for condicion in (
+        ds.field("cif") == _cif_valido(cif) if cif else None,
+        ds.field("anio") == int(anio) if anio else None,
+        ds.field(COLUMNA_DNI) == normalizar_dni_final(dni) if dni else None,
+    ):
+        if condicion is not None:
+            filtro = condicion if filtro is None else filtro & condicion
+    datos = ds.dataset(base, format="parquet", partitioning=ds.partitioning(_PARTICIONES, flavor="hive"))
+    return datos.to_table(columns=columnas, filter=filtro).to_pandas()
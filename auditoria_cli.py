@@ -0,0 +1,124 @@
+"""
+Auditoría completa desde la línea de comandos, sin Streamlit.
+
+Ejemplo (lote nocturno en un servidor, con todos los núcleos):
+    python auditoria_cli.py --idc pdfs/idc --190 pdfs/190 --rnt pdfs/rnt \\
+        --nominas pdfs/nominas --anio 2025 --horas-convenio 1780 \\
+        --salida auditoria_2025.xlsx
+
+Con --todo se indica una carpeta con documentos mezclados: el tipo de cada
+PDF se detecta por su primera página.
+
+Con --rendimiento se guarda en JSON el desglose de la ejecución (segundos
+por etapa y, por tipo de documento, páginas, registros, bytes, segundos de
+texto y de análisis, llamadas a la API y aciertos de caché).
+
+Con --guardar los registros extraídos se guardan además en el almacén de
+auditorías (almacen_auditorias.py) bajo el CIF del cliente y el año --anio.
+
+Con --salida terminado en .parquet se escribe el consolidado en ese archivo
+y cada tabla en <nombre>_<tabla>.parquet al lado.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from almacen_auditorias import RUTA_ALMACEN, cif_de_lote, guardar_auditoria
+from ejecutor_lote import PROCESOS_POR_DEFECTO, LIMITE_SEGUNDOS, LIMITE_MB
+from pipeline_auditoria import ANIOS_AUDITORIA, ejecutar_pipeline, informe_rendimiento
+
+
+def _nombre_archivo(tabla):
+    return tabla.lower().replace("ó", "o")
+
+
+def guardar_tablas(tablas, salida):
+    """
+    Escribe las tablas en un Excel (una hoja por tabla) o en Parquet según la extensión.
+    """
+    base, extension = os.path.splitext(salida)
+    if extension.lower() == ".parquet":
+        tablas["Consolidado"].to_parquet(salida, index=False)
+        for nombre, df in tablas.items():
+            if nombre != "Consolidado" and not df.empty:
+                df.to_parquet(f"{base}_{_nombre_archivo(nombre)}.parquet", index=False)
+        return
+
+    with pd.ExcelWriter(salida, engine='xlsxwriter') as writer:
+        for nombre, df in tablas.items():
+            df.to_excel(writer, index=False, sheet_name=nombre)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Unificación IDC + 190 + RNT + nóminas sin interfaz.")
+    parser.add_argument("--idc", help="Carpeta con los IDC (PDF)")
+    parser.add_argument("--190", dest="m190", help="Carpeta con los Modelos 190 (PDF)")
+    parser.add_argument("--rnt", help="Carpeta con los RNT (PDF)")
+    parser.add_argument("--nominas", help="Carpeta con las nóminas (PDF, usa Document AI)")
+    parser.add_argument("--todo", help="Carpeta con documentos de cualquier tipo (se detecta por la primera página)")
+    parser.add_argument("--anio", type=int, default=ANIOS_AUDITORIA[0], choices=ANIOS_AUDITORIA, help="Año de auditoría del IDC")
+    parser.add_argument("--anio-190", type=int, default=2024, help="Año del Modelo 190")
+    parser.add_argument("--horas-convenio", type=float, default=1800.0)
+    parser.add_argument("--tipo-general", type=float, default=25.07, help="Tipo de cotización general (%%)")
+    parser.add_argument("--empresa", default="", help="Empresa cliente (autónomos)")
+    parser.add_argument("--cif", default="", help="CIF de la empresa (autónomos)")
+    parser.add_argument("--procesos", type=int, default=PROCESOS_POR_DEFECTO)
+    parser.add_argument("--limite-s", type=float, default=LIMITE_SEGUNDOS, help="Segundos como mucho por documento (0: sin límite)")
+    parser.add_argument("--limite-mb", type=float, default=LIMITE_MB, help="Memoria como mucho por documento en MB (0: sin límite)")
+    parser.add_argument("--salida", default="auditoria_consolidada.xlsx", help="Archivo .xlsx o .parquet")
+    parser.add_argument("--guardar", action="store_true", help="Guardar los registros en el almacén de auditorías")
+    parser.add_argument("--rendimiento", help="Archivo .json para el desglose de tiempos y contadores")
+    args = parser.parse_args(argv)
+
+    carpetas = {"idc": args.idc, "190": args.m190, "rnt": args.rnt, "nominas": args.nominas, "auto": args.todo}
+    if not any(carpetas.values()):
+        parser.error("indica al menos una carpeta de documentos")
+
+    tiempos = {}
+    inicio = time.perf_counter()
+    tablas, lote = ejecutar_pipeline(
+        carpetas, anio=args.anio, h_conv=args.horas_convenio, tipo_general=args.tipo_general,
+        anio_190=args.anio_190, emp_manual=args.empresa, cif_manual=args.cif,
+        procesos=args.procesos, tiempos=tiempos, limite_s=args.limite_s, limite_mb=args.limite_mb
+    )
+    t_guardado = time.perf_counter()
+    guardar_tablas(tablas, args.salida)
+    tiempos["escritura"] = time.perf_counter() - t_guardado
+
+    for aviso in lote["avisos"]:
+        print(f"🔀 {aviso['Archivo']}: subido como {aviso['Subido como']}, procesado como {aviso['Procesado como']}", file=sys.stderr)
+    for error in lote["errores"]:
+        pagina = f" (página {error['Página']})" if error['Página'] else ""
+        print(f"⚠️ {error['Tipo']} {error['Archivo']}{pagina} [{error['Motivo']}]: {error['Error']}", file=sys.stderr)
+    for nombre, df in tablas.items():
+        print(f"{nombre:12s} {len(df):8d} filas")
+    print(f"Guardado en {args.salida}")
+    if args.guardar:
+        cif = cif_de_lote(lote, args.cif)
+        if cif:
+            guardar_auditoria(lote, cif, args.anio)
+            print(f"Auditoría {cif} {args.anio} guardada en {RUTA_ALMACEN}")
+        else:
+            print("⚠️ No se ha podido deducir el CIF del cliente: indícalo con --cif para guardar", file=sys.stderr)
+
+    print("\nTiempos por etapa:")
+    for etapa, segundos in tiempos.items():
+        print(f"  {etapa:24s} {segundos:8.2f} s")
+    print(f"  {'total':24s} {time.perf_counter() - inicio:8.2f} s")
+
+    for fila in lote["rendimiento"]:
+        print(f"  {fila['Tipo']:8s} {fila['Archivos']:5d} archivos {fila['Páginas']:7d} págs "
+              f"{fila['Registros']:7d} registros {fila['Segundos']:8.2f} s por archivo (suma)")
+    if args.rendimiento:
+        tiempos["total"] = time.perf_counter() - inicio
+        with open(args.rendimiento, "w", encoding="utf-8") as f:
+            json.dump(informe_rendimiento(tiempos, lote), f, ensure_ascii=False, indent=2)
+    return 1 if lote["errores"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Benchmark de arranque: cuánto tarda la app en importarse y en pintar la
+primera pantalla, y qué módulos se llevan ese tiempo.
+
+Cada medida se hace en un intérprete nuevo (las importaciones ya hechas no
+cuentan). La primera pantalla se mide con streamlit.testing (AppTest), que
+ejecuta main_superextractor.py igual que `streamlit run` sin abrir navegador.
+
+Uso:
+    python benchmarks/bench_arranque.py [repeticiones] [modulos_en_el_top]
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRIMERA_PANTALLA = """
+import time
+t = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("main_superextractor.py", default_timeout=60).run()
+assert not at.exception, at.exception
+print(time.perf_counter() - t)
+"""
+
+MODULOS_PESADOS = ["google.cloud.documentai_v1beta3", "PyPDF2", "pdfplumber", "pdfminer"]
+
+
+def _python(*args):
+    salida = subprocess.run([sys.executable, *args], cwd=RAIZ, capture_output=True, text=True, check=True)
+    return salida.stdout, salida.stderr
+
+
+def tiempos_importacion(modulo="super_extractor"):
+    """
+    {módulo: microsegundos acumulados} de `python -X importtime -c "import modulo"`.
+    """
+    _, informe = _python("-X", "importtime", "-c", f"import {modulo}")
+    tiempos = {}
+    for linea in informe.splitlines():
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)", linea)
+        if m:
+            tiempos[m.group(3)] = int(m.group(1))
+    return tiempos
+
+
+def cargados_al_importar(modulo="super_extractor"):
+    salida, _ = _python("-c", f"import sys, {modulo}; print(' '.join(sys.modules))")
+    cargados = set(salida.split())
+    return [m for m in MODULOS_PESADOS if m in cargados]
+
+
+def medir(repeticiones=5, top=15):
+    importaciones = [tiempos_importacion() for _ in range(repeticiones)]
+    total = statistics.median(t["super_extractor"] for t in importaciones) / 1e6
+    print(f"import super_extractor: {total:.3f} s (mediana de {repeticiones})")
+
+    ultima = importaciones[-1]
+    print("\nMódulos que más tardan (acumulado, última ejecución):")
+    for nombre, us in sorted(ultima.items(), key=lambda x: -x[1])[:top]:
+        print(f"  {nombre:45s} {us / 1e3:8.1f} ms")
+
+    pesados = cargados_al_importar()
+    print(f"\nImportaciones pesadas al arrancar: {', '.join(pesados) or 'ninguna'}")
+
+    pantallas = [float(_python("-c", PRIMERA_PANTALLA)[0]) for _ in range(repeticiones)]
+    print(f"\nPrimera pantalla de main_superextractor: {statistics.median(pantallas):.3f} s (mediana)")
+
+
+if __name__ == "__main__":
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    medir(repeticiones, top)
@@ -0,0 +1,212 @@
+"""
+Benchmark de extremo a extremo sobre PDFs sintéticos (ver generador_pdf.py).
+
+Para cada tamaño (trabajadores de la empresa) y cada número de procesos mide:
+  - extracción de IDC, 190 y RNT con procesar_lote (procesos aislados, como
+    la app): segundos, páginas por segundo y RSS pico de los procesos;
+  - nóminas con el backend falso (sin red): páginas por segundo;
+  - horas del IDC (matriz de horas + tabla): tiempo total y por trabajador;
+  - Cuadro de Mando: unión y filtrado, con el pico de memoria de Python.
+Comprueba además que se extrae lo que el generador ha escrito.
+
+Los resultados se guardan en JSON para comparar ejecuciones:
+    python benchmarks/bench_extractores.py --tamanos 10 100 1000 --procesos 1 4 \\
+        --salida hoy.json --comparar ayer.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Caché propia y vacía: se mide la extracción, no la lectura de la caché
+os.environ["AUDITORIA_CACHE"] = os.path.join(tempfile.mkdtemp(prefix="bench_auditoria_"), "cache.sqlite")
+
+import extractor_nominas
+from cache_extractores import cache
+from cuadro_mando import claves_disponibles, construir_cuadro, filtrar_cuadro
+from ejecutor_lote import EXTRACTORES, procesar_lote
+from generador_pdf import lote_sintetico
+from motor_horas import construir_matriz_horas
+from pipeline_auditoria import (
+    ANIOS_AUDITORIA, clave_archivo, ensamblar_registros, nombres_idc,
+    tabla_190, tabla_idc_final, tabla_nominas, tabla_rnt,
+)
+
+VERSION_RESULTADOS = 1
+
+
+def _mejor(repeticiones, medir):
+    # Se queda con la repetición más rápida (la menos afectada por ruido)
+    return min((medir() for _ in range(repeticiones)), key=lambda m: m["segundos"])
+
+
+def _extraccion(tipo, tareas, procesos):
+    cache.invalidar(EXTRACTORES[tipo][0])
+    inicio = time.perf_counter()
+    resultados = procesar_lote(tareas, procesos, limite_s=0, limite_mb=0)
+    segundos = time.perf_counter() - inicio
+    paginas = sum(r["paginas"] or 0 for r in resultados)
+    return {
+        "etapa": f"extracción {tipo}", "documentos": len(tareas), "paginas": paginas,
+        "segundos": segundos, "paginas_por_segundo": paginas / segundos if segundos else None,
+        "rss_pico_mb": max((r["rss_pico_mb"] for r in resultados if r["rss_pico_mb"] is not None), default=None),
+        "errores": sum(1 for r in resultados if r["error"]),
+        "_datos": [r["datos"] for r in resultados],
+    }
+
+
+def _nominas(contenido, procesos):
+    extractor_nominas.invalidar_cache_nominas()
+    paginas = list(extractor_nominas.dividir_pdf_en_memoria(contenido))
+    inicio = time.perf_counter()
+    datos = list(extractor_nominas.iterar_documentos(paginas))
+    segundos = time.perf_counter() - inicio
+    return {
+        "etapa": "extracción nominas", "documentos": 1, "paginas": len(paginas),
+        "segundos": segundos, "paginas_por_segundo": len(paginas) / segundos if segundos else None,
+        "rss_pico_mb": None, "errores": 0, "_datos": [datos],
+    }
+
+
+def _en_memoria(etapa, funcion):
+    # Tiempo y pico de memoria de Python (numpy y pandas incluidos) de una etapa en este proceso
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcion()
+    segundos = time.perf_counter() - inicio
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"etapa": etapa, "segundos": segundos, "pico_python_mb": pico / 2**20, "_resultado": resultado}
+
+
+def medir_tamano(n_trabajadores, procesos, repeticiones=1, anio=2024, meses=12):
+    """
+    Mediciones de un tamaño y un número de procesos (lista de dicts, una por etapa).
+    """
+    archivos = lote_sintetico(n_trabajadores, anio, meses)
+    por_tipo = {tipo: [a for a in archivos if a[0] == tipo] for tipo in ("idc", "190", "rnt", "nominas")}
+
+    medidas = [_mejor(repeticiones, lambda: _extraccion(tipo, por_tipo[tipo], procesos)) for tipo in ("idc", "190", "rnt")]
+    medidas.append(_mejor(repeticiones, lambda: _nominas(por_tipo["nominas"][0][2], procesos)))
+
+    # Mismo ensamblado que la app
+    claves, procesados = [], {}
+    for tipo, medida in zip(("idc", "190", "rnt", "nominas"), medidas):
+        for archivo, datos in zip(por_tipo[tipo], medida.pop("_datos")):
+            clave = clave_archivo(*archivo)
+            claves.append(clave)
+            if datos is not None:
+                procesados[clave] = datos
+    lote = ensamblar_registros(claves, procesados, anio)
+
+    def horas():
+        matriz = construir_matriz_horas(lote["raw_idc"], ANIOS_AUDITORIA)
+        return tabla_idc_final(matriz, anio, 1800.0, 25.07, nombres_idc(lote["raw_idc"]))
+    horas_idc = _mejor(repeticiones, lambda: _en_memoria("horas IDC", horas))
+    df_idc = horas_idc.pop("_resultado")
+    horas_idc["trabajadores"] = len(df_idc)
+    horas_idc["ms_por_trabajador"] = horas_idc["segundos"] * 1000 / max(1, len(df_idc))
+    medidas.append(horas_idc)
+
+    df_190, df_rnt, df_nom = tabla_190(lote["raw_190"]), tabla_rnt(lote["raw_rnt_res"]), tabla_nominas(lote["raw_nom"])
+    union = _mejor(repeticiones, lambda: _en_memoria("cuadro: unión", lambda: construir_cuadro(df_idc, df_190, df_nom, df_rnt)))
+    cuadro = union.pop("_resultado")
+    filtrado = _mejor(repeticiones, lambda: _en_memoria("cuadro: filtrado", lambda: filtrar_cuadro(cuadro, claves_disponibles(cuadro))))
+    union["filas"] = filtrado["filas"] = len(filtrado.pop("_resultado"))
+    medidas += [union, filtrado]
+
+    esperado = {"raw_idc": n_trabajadores, "raw_190": n_trabajadores, "raw_rnt_det": n_trabajadores * meses,
+                "raw_nom": n_trabajadores}
+    faltan = {k: (len(lote[k]), v) for k, v in esperado.items() if len(lote[k]) != v}
+    for medida in medidas:
+        medida.update(tamano=n_trabajadores, procesos=procesos)
+        if faltan:
+            medida["registros_distintos"] = faltan
+    return medidas
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, anterior):
+    """
+    Imprime, por tamaño, procesos y etapa, cuántas veces más rápido es `actual` que `anterior`.
+    """
+    previas = {(m["tamano"], m["procesos"], m["etapa"]): m for m in anterior["resultados"]}
+    print(f"\nComparación con {anterior.get('commit') or '?'} ({anterior['fecha']}):")
+    for m in actual["resultados"]:
+        previa = previas.get((m["tamano"], m["procesos"], m["etapa"]))
+        if previa and m["segundos"]:
+            print(f"  {m['tamano']:6d} {m['procesos']:3d}  {m['etapa']:22s} "
+                  f"{previa['segundos']:9.3f} s -> {m['segundos']:9.3f} s  ({previa['segundos'] / m['segundos']:5.2f}x)")
+
+
+def _imprimir(medidas):
+    for m in medidas:
+        extra = ""
+        if m.get("paginas_por_segundo"):
+            extra += f"  {m['paginas']:6d} págs  {m['paginas_por_segundo']:8.1f} págs/s"
+        if m.get("rss_pico_mb"):
+            extra += f"  RSS pico {m['rss_pico_mb']:7.1f} MB"
+        if "pico_python_mb" in m:
+            extra += f"  pico {m['pico_python_mb']:7.1f} MB"
+        if "ms_por_trabajador" in m:
+            extra += f"  {m['ms_por_trabajador']:.3f} ms/trabajador"
+        print(f"  {m['tamano']:6d} {m['procesos']:3d}  {m['etapa']:22s} {m['segundos']:9.3f} s{extra}")
+        if m.get("registros_distintos"):
+            print(f"    ⚠️ registros (extraídos, esperados): {m['registros_distintos']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de extractores y Cuadro de Mando sobre PDFs sintéticos.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10, 100], help="Trabajadores por empresa (10 a 10000)")
+    parser.add_argument("--procesos", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--meses", type=int, default=12, help="Meses del RNT")
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--latencia-nominas", type=float, default=0.0, help="Segundos por página del backend falso")
+    parser.add_argument("--salida", default="bench_extractores.json")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    extractor_nominas.BACKENDS_NOMINAS["bench"] = lambda: extractor_nominas.ClienteDocumentAIFalso(latencia=args.latencia_nominas)
+    extractor_nominas.usar_backend("bench")
+
+    resultados = []
+    print(f"{'tamaño':>8s} {'proc':>4s}  etapa")
+    for n in args.tamanos:
+        for procesos in sorted(set(args.procesos)):
+            medidas = medir_tamano(n, procesos, args.repeticiones, meses=args.meses)
+            _imprimir(medidas)
+            resultados += medidas
+
+    informe = {
+        "version": VERSION_RESULTADOS,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parametros": vars(args),
+        "resultados": resultados,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(informe, json.load(f))
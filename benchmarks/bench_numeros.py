@@ -0,0 +1,78 @@
+"""
+Benchmark de normalizacion: versión por columna frente a .apply fila a fila.
+
+Genera columnas sintéticas (importes en formato español mezclados con vacíos,
+"N/A" y números ya convertidos; DNIs/NIEs con espacios, guiones y prefijos de
+país) y comprueba que ambas versiones devuelven exactamente lo mismo.
+
+Uso:
+    python benchmarks/bench_numeros.py [filas] [repeticiones]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from normalizacion import (
+    limpiar_valor_numerico, limpiar_columna_numerica,
+    normalizar_dni_final, normalizar_dni_columna,
+)
+
+LETRAS = "TRWAGMYFPDXBNJZSQVHLCKE"
+
+
+def importe_aleatorio(rnd):
+    r = rnd.random()
+    if r < 0.02: return None
+    if r < 0.04: return "N/A"
+    if r < 0.05: return ""
+    if r < 0.15: return round(rnd.uniform(0, 90000), 2)
+    entero = f"{rnd.randint(0, 999999):,}".replace(",", ".")
+    return f"{entero},{rnd.randint(0, 99):02d}"
+
+
+def dni_aleatorio(rnd):
+    r = rnd.random()
+    if r < 0.02: return None
+    if r < 0.03: return "  "
+    numero = rnd.randint(0, 99999999)
+    dni = f"{numero:08d}{LETRAS[numero % 23]}"
+    if r < 0.2: return f"ES {dni[:4]}-{dni[4:]}"
+    if r < 0.3: return f"X{dni[1:]}".lower()
+    return dni
+
+
+def medir(funcion, serie, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        salida = funcion(serie)
+    return (time.perf_counter() - inicio) / repeticiones, salida
+
+
+def iguales(a, b):
+    return a.dtype == b.dtype and a.astype(object).where(a.notna(), None).tolist() == b.astype(object).where(b.notna(), None).tolist()
+
+
+if __name__ == "__main__":
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    rnd = random.Random(190)
+
+    importes = pd.Series([importe_aleatorio(rnd) for _ in range(filas)], dtype=object)
+    dnis = pd.Series([dni_aleatorio(rnd) for _ in range(filas)], dtype=object)
+    casos = [
+        ("importes (texto mezclado)", importes, limpiar_valor_numerico, limpiar_columna_numerica),
+        ("importes (ya float)", limpiar_columna_numerica(importes), limpiar_valor_numerico, limpiar_columna_numerica),
+        ("DNI/NIE", dnis, normalizar_dni_final, normalizar_dni_columna),
+    ]
+
+    print(f"{filas} filas, {repeticiones} repeticiones")
+    for nombre, serie, escalar, columna in casos:
+        t_apply, ref = medir(lambda s: s.apply(escalar), serie, repeticiones)
+        t_col, nuevo = medir(columna, serie, repeticiones)
+        assert iguales(ref, nuevo), f"{nombre}: la versión por columna no devuelve lo mismo que .apply"
+        print(f"  {nombre:28s} apply {t_apply * 1000:8.1f} ms · columna {t_col * 1000:8.1f} ms · {t_apply / t_col:6.1f}x")
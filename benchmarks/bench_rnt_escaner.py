@@ -0,0 +1,124 @@
+"""
+Micro-benchmark del clasificador de líneas del RNT.
+
+Compara el escáner compilado (rnt_reader._escanear_pagina) con la versión
+anterior línea a línea (copiada abajo como referencia) sobre el texto ya
+extraído de un RNT, de modo que solo se mide la clasificación y no pdfplumber.
+Comprueba además que ambas devuelven exactamente lo mismo.
+
+Sin ruta se usa rnt_muestra.pdf (un RNT real, junto a este script) y, si no
+está, un RNT sintético de 200 trabajadores (generador_pdf.py).
+
+Uso:
+    python benchmarks/bench_rnt_escaner.py [ruta_rnt.pdf] [repeticiones]
+"""
+import io
+import os
+import re
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdfplumber
+import rnt_reader
+from generador_pdf import plantilla, pdf_rnt
+from normalizacion import importe_es
+
+MUESTRA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rnt_muestra.pdf")
+
+
+def _importe_referencia(lineas, i, max_offset=3):
+    m = re.search(r"([\d]{1,3}(?:\.[\d]{3})*,[\d]{2})\s*$", lineas[i])
+    if m:
+        return importe_es(m.group(1))
+    for offset in range(1, max_offset + 1):
+        if i + offset >= len(lineas):
+            break
+        candidata = lineas[i + offset].strip()
+        if re.fullmatch(r"[\d]{1,3}(?:\.[\d]{3})*,[\d]{2}", candidata):
+            return importe_es(candidata)
+    return None
+
+
+def escanear_pagina_referencia(texto, trabajador_actual, año_actual, mes_actual):
+    # Bucle original: normalización, regex y búsquedas por cada línea
+    bases = []
+    match_periodo = re.search(r"Periodo de liquidación\s+(\d{2})/(\d{4})", texto)
+    if match_periodo:
+        mes_actual = match_periodo.group(1)
+        año_actual = match_periodo.group(2)
+
+    lineas = texto.split("\n")
+    for i, linea in enumerate(lineas):
+        linea = unicodedata.normalize("NFKD", linea)
+        linea = linea.encode("ascii", "ignore").decode()
+
+        match_trabajador = re.match(r"(\d{11,12})\s+(\d{9,10}[A-Z])", linea)
+        if match_trabajador:
+            trabajador_actual = match_trabajador.group(2)
+
+        if not trabajador_actual or not mes_actual:
+            continue
+
+        if "SUMA DE BASES" in linea:
+            trabajador_actual = None
+            continue
+
+        clave = (trabajador_actual, año_actual, mes_actual)
+        if "BASE DE CONTINGENCIAS COMUNES" in linea:
+            valor = _importe_referencia(lineas, i)
+            if valor is not None:
+                bases.append((clave, "Base_CC", valor))
+        if "BASE DE ACCIDENTES DE TRABAJO" in linea:
+            valor = _importe_referencia(lineas, i)
+            if valor is not None:
+                bases.append((clave, "Base_AT", valor))
+        if "COTIZACION ADIC" in linea or "SOLIDARIDAD" in linea:
+            valor = _importe_referencia(lineas, i)
+            if valor is not None:
+                bases.append((clave, "Base_Solidaridad", valor))
+
+    return bases, bool(match_periodo), (trabajador_actual, año_actual, mes_actual)
+
+
+def recorrer(textos, escanear):
+    estado, salida = (None, None, None), []
+    for texto in textos:
+        bases, con_periodo, estado = escanear(texto, *estado)[:3]
+        salida.append((bases, con_periodo))
+    return salida
+
+
+def medir(textos, escanear, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        salida = recorrer(textos, escanear)
+    return (time.perf_counter() - inicio) / repeticiones, salida
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1]:
+        ruta = sys.argv[1]
+        origen = ruta
+    elif os.path.exists(MUESTRA):
+        ruta = origen = MUESTRA
+    else:
+        ruta = "RNT sintético"
+        origen = io.BytesIO(pdf_rnt(*plantilla(200)))
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with pdfplumber.open(origen) as pdf:
+        textos = [t for t in (p.extract_text() for p in pdf.pages) if t]
+    n_lineas = sum(t.count("\n") + 1 for t in textos)
+
+    t_ref, salida_ref = medir(textos, escanear_pagina_referencia, repeticiones)
+    t_nuevo, salida_nueva = medir(textos, rnt_reader._escanear_pagina, repeticiones)
+
+    assert salida_ref == salida_nueva, "El escáner compilado no devuelve lo mismo que la referencia"
+
+    print(f"{os.path.basename(ruta)}: {len(textos)} páginas, {n_lineas} líneas, {repeticiones} repeticiones")
+    print(f"  referencia (línea a línea): {t_ref * 1000:8.2f} ms/documento")
+    print(f"  escáner compilado:          {t_nuevo * 1000:8.2f} ms/documento")
+    print(f"  aceleración:                {t_ref / t_nuevo:8.1f}x  (salidas idénticas)")
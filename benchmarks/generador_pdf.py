@@ -0,0 +1,267 @@
+"""
+Generador de PDFs sintéticos (IDC, 190, RNT y nóminas) para los benchmarks.
+
+Los documentos imitan la maquetación que esperan los extractores: las mismas
+etiquetas, el mismo orden de campos y los mismos formatos de fecha e importe
+que los informes reales, con una línea de texto por línea del PDF. Todos
+comparten la misma plantilla de trabajadores, así que el Cuadro de Mando
+cruza IDC, 190 y RNT igual que con una auditoría real.
+
+El PDF se escribe a mano (texto Helvetica, sin dependencias): basta para
+pdfplumber y PyPDF2, que es lo que leen los extractores.
+
+Uso (escribe una carpeta por tipo, lista para auditoria_cli.py):
+    python benchmarks/generador_pdf.py trabajadores carpeta_salida [anio]
+"""
+import os
+import random
+import sys
+import zlib
+
+LETRAS_DNI = "TRWAGMYFPDXBNJZSQVHLCKE"
+NOMBRES = ["JOSE", "MARIA", "ANTONIO", "CARMEN", "MANUEL", "ANA", "FRANCISCO", "LAURA", "DAVID", "ISABEL",
+           "JUAN", "LUCIA", "JAVIER", "PILAR", "CARLOS", "ELENA", "MIGUEL", "ROSA", "PEDRO", "NURIA"]
+APELLIDOS = ["GARCIA", "MARTINEZ", "LOPEZ", "SANCHEZ", "PEREZ", "GOMEZ", "MARTIN", "JIMENEZ", "RUIZ",
+             "HERNANDEZ", "DIAZ", "MORENO", "MUÑOZ", "ALVAREZ", "ROMERO", "ALONSO", "GUTIERREZ", "NAVARRO",
+             "TORRES", "DOMINGUEZ", "VAZQUEZ", "RAMOS", "GIL", "SERRANO", "BLANCO", "CASTRO", "ORTEGA"]
+CONTRATOS = ["100", "100", "100", "189", "200", "289", "401", "402", "501", "502"]
+
+# Página A4 y una línea cada 10 puntos
+ANCHO, ALTO = 595, 842
+MARGEN, INTERLINEA, LETRA = 30, 10, 7
+LINEAS_POR_PAGINA = (ALTO - 2 * MARGEN) // INTERLINEA
+
+
+# --- ESCRITURA DEL PDF ---
+
+def _literal(texto):
+    datos = texto.encode("cp1252", "replace")
+    return b"(" + datos.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _contenido_pagina(lineas):
+    partes = [b"BT /F1 %d Tf %d TL %d %d Td" % (LETRA, INTERLINEA, MARGEN, ALTO - MARGEN)]
+    partes += [_literal(linea) + b" Tj T*" for linea in lineas]
+    partes.append(b"ET")
+    return zlib.compress(b"\n".join(partes))
+
+
+def pdf_de_lineas(paginas, titulo=None):
+    """
+    PDF (bytes) con una página por lista de líneas de `paginas`.
+    `titulo` va a los metadatos (/Title), como en los informes reales.
+    """
+    # 1 catálogo, 2 árbol de páginas, 3 fuente, 4 metadatos; luego página y contenido
+    objetos = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+               b"<< /Producer (generador_pdf)" + (b" /Title " + _literal(titulo) if titulo else b"") + b" >>"]
+    hijos = []
+    for lineas in paginas:
+        flujo = _contenido_pagina(lineas)
+        n = len(objetos) + 1
+        hijos.append(b"%d 0 R" % n)
+        objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> "
+                       b"/Contents %d 0 R >>" % (ANCHO, ALTO, n + 1))
+        objetos.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(flujo) + flujo + b"\nendstream")
+    objetos[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objetos[1] = b"<< /Type /Pages /Kids [" + b" ".join(hijos) + b"] /Count %d >>" % len(hijos)
+
+    salida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    posiciones = []
+    for n, objeto in enumerate(objetos, 1):
+        posiciones.append(len(salida))
+        salida += b"%d 0 obj\n" % n + objeto + b"\nendobj\n"
+    inicio_xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    salida += b"".join(b"%010d 00000 n \n" % p for p in posiciones)
+    salida += b"trailer\n<< /Size %d /Root 1 0 R /Info 4 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    return bytes(salida)
+
+
+def _paginar(lineas, cabecera=()):
+    # Reparte las líneas en páginas repitiendo la cabecera en cada una
+    hueco = LINEAS_POR_PAGINA - len(cabecera)
+    return [list(cabecera) + lineas[i:i + hueco] for i in range(0, len(lineas), hueco)] or [list(cabecera)]
+
+
+# --- DATOS DE LOS TRABAJADORES ---
+
+def _importe(valor):
+    entero, decimales = f"{valor:.2f}".split(".")
+    return f"{int(entero):,}".replace(",", ".") + "," + decimales
+
+
+def _dni(rnd):
+    numero = rnd.randint(10000000, 99999999)
+    return f"{numero}{LETRAS_DNI[numero % 23]}"
+
+
+def plantilla(n_trabajadores, anio=2024, semilla=0):
+    """
+    Empresa y `n_trabajadores` trabajadores con DNI, NAF, contrato, salario,
+    alta/baja y bajas por IT, deterministas para una misma semilla.
+    """
+    rnd = random.Random(semilla)
+    empresa = {"nombre": "EMPRESA SINTETICA, S.L.", "cif": "B" + str(rnd.randint(10000000, 99999999)),
+               "ccc": f"0111 28{rnd.randint(100000000, 999999999)}"}
+    trabajadores, nombres, dnis = [], set(), set()
+    while len(trabajadores) < n_trabajadores:
+        nombre = f"{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}, {rnd.choice(NOMBRES)}"
+        dni = _dni(rnd)
+        if nombre in nombres or dni in dnis:
+            continue
+        nombres.add(nombre)
+        dnis.add(dni)
+        alta = (rnd.randint(2010, anio), rnd.randint(1, 12), rnd.randint(1, 28))
+        baja = (anio, rnd.randint(alta[1] if alta[0] == anio else 1, 12), 28) if rnd.random() < 0.1 else None
+        it = None
+        if rnd.random() < 0.15:
+            mes = rnd.randint(1, 11)
+            it = ((anio, mes, rnd.randint(1, 10)), (anio, mes, rnd.randint(15, 28)))
+        trabajadores.append({
+            "nombre": nombre, "dni": dni, "naf": f"28{rnd.randint(1000000000, 9999999999)}",
+            "ipf": "10" + dni, "contrato": rnd.choice(CONTRATOS),
+            "ctp": 0 if rnd.random() < 0.8 else rnd.choice([500, 625, 750]),
+            "base_mensual": round(rnd.uniform(1200, 5200), 2), "alta": alta, "baja": baja, "it": it,
+        })
+    return empresa, trabajadores
+
+
+def _fecha(f):
+    return f"{f[2]:02d}-{f[1]:02d}-{f[0]}"
+
+
+# --- DOCUMENTOS ---
+
+def pdf_idc(empresa, t, anio=2024):
+    """
+    IDC de cuenta ajena de un trabajador (una página).
+    """
+    inicio = max(t["alta"], (anio, 1, 1))
+    fin = t["baja"] or (anio, 12, 31)
+    lineas = [
+        "INFORME DE DATOS PARA LA COTIZACIÓN - TRABAJADORES POR CUENTA AJENA",
+        f"RAZÓN SOCIAL: {empresa['nombre']} CCC: {empresa['ccc']}",
+        f"DNI/NIE/CIF: 9 0{empresa['cif']}",
+        f"NOMBRE Y APELLIDOS: {t['nombre']}",
+        f"DOC. IDENTIFICATIVO: 1 NUM: {t['dni']} NAF: {t['naf']}",
+        f"ALTA: {_fecha(t['alta'])}" + (f" BAJA: {_fecha(t['baja'])}" if t["baja"] else ""),
+        f"T.CONTRATO: {t['contrato']} COEF.TIEMPO PARCIAL: {t['ctp']}",
+        "INICIO CONTRATO DE TRABAJO",
+        f"FECHA: {_fecha(t['alta'])}",
+        f"PERIODO: DESDE {_fecha(inicio)} HASTA {_fecha(fin)}",
+        "TIPO DE PECULIARIDAD FECHA DESDE FECHA HASTA",
+    ]
+    if t["it"]:
+        lineas.append(f"IT. ENFERMEDAD COMUN {_fecha(t['it'][0])} {_fecha(t['it'][1])}")
+    lineas.append("***")
+    return pdf_de_lineas([lineas])
+
+
+def pdf_190(empresa, trabajadores, anio=2024):
+    """
+    Modelo 190 con un perceptor (clave A) por trabajador.
+    """
+    cabecera = [f"Modelo 190 - Ejercicio {anio}", f"Declarante: {empresa['cif']} {empresa['nombre']}"]
+    lineas = []
+    for i, t in enumerate(trabajadores, 1):
+        anual = t["base_mensual"] * 12
+        lineas += [
+            f"Percepción {i}",
+            f"{t['dni']} {t['nombre']} 28",
+            "Clave: A Subclave: 01",
+            f"Percepción íntegra {_importe(anual)} Retenciones {_importe(anual * 0.15)}",
+            "Valoración 0,00 Ingresos a cuenta 0,00",
+            f"Percepción íntegra {_importe(anual * 0.03 if t['it'] else 0)}",
+            "Valoración 0,00",
+        ]
+    # Un perceptor nunca cruza de página
+    por_pagina = (LINEAS_POR_PAGINA - len(cabecera)) // 7 * 7
+    return pdf_de_lineas([cabecera + lineas[i:i + por_pagina] for i in range(0, len(lineas), por_pagina)] or [cabecera])
+
+
+def pdf_rnt(empresa, trabajadores, anio=2024, meses=12, cabecera_por_pagina=True):
+    """
+    RNT de `meses` meses: por mes, una línea por trabajador con sus bases de
+    contingencias comunes y AT (y solidaridad si supera el tope) y la suma final.
+    Con cabecera_por_pagina=False la cabecera solo sale al empezar cada mes y
+    las páginas se llenan seguidas, así que trabajadores y periodos cruzan de
+    una página a otra.
+    """
+    paginas, seguidas = [], []
+    for mes in range(1, meses + 1):
+        cabecera = [
+            "RELACIÓN NOMINAL DE TRABAJADORES",
+            f"Razón social {empresa['nombre']} Código de empresario 9 0{empresa['cif']}",
+            f"Código cuenta cotización {empresa['ccc']} Número de la liquidación 1 42{anio}{mes:02d}00201275734",
+            f"Periodo de liquidación {mes:02d}/{anio}-{mes:02d}/{anio} Número de trabajadores {len(trabajadores)}",
+            "NAF I.P.F. C.A.F. Tramo Tramo Coti. Coti. Compl",
+        ]
+        lineas, total = [], 0.0
+        for t in trabajadores:
+            base = min(t["base_mensual"], 4720.50)
+            total += 2 * base
+            lineas += [
+                f"{t['naf']} {t['ipf']} {t['nombre'][:5]} 01-{mes:02d}-{anio} 28-{mes:02d}-{anio} 30 D "
+                f"BASE DE CONTINGENCIAS COMUNES {_importe(base)}",
+                f"BASE DE ACCIDENTES DE TRABAJO {_importe(base)}",
+            ]
+            if t["base_mensual"] > base:
+                lineas.append(f"COTIZACIÓN ADICIONAL DE SOLIDARIDAD {_importe(t['base_mensual'] - base)}")
+        lineas.append(f"SUMA DE BASES {_importe(total)}")
+        if cabecera_por_pagina:
+            paginas += _paginar(lineas, cabecera)
+        else:
+            seguidas += cabecera + lineas
+    if seguidas:
+        paginas = _paginar(seguidas)
+    return pdf_de_lineas(paginas, titulo="RNT.rpt")
+
+
+def pdf_nominas(empresa, trabajadores, anio=2024, mes=1):
+    """
+    Nóminas de un mes, una página por trabajador.
+    """
+    paginas = []
+    for t in trabajadores:
+        bruto = t["base_mensual"]
+        paginas.append([
+            "RECIBO INDIVIDUAL JUSTIFICATIVO DEL PAGO DE SALARIOS",
+            f"EMPRESA: {empresa['nombre']} CIF: {empresa['cif']} CCC: {empresa['ccc']}",
+            f"TRABAJADOR: {t['nombre']} DNI: {t['dni']} Nº AFILIACIÓN: {t['naf']}",
+            f"PERIODO DE LIQUIDACIÓN: 01/{mes:02d}/{anio} A 28/{mes:02d}/{anio}",
+            "I. DEVENGOS",
+            f"SALARIO BASE {_importe(bruto * 0.8)}",
+            f"COMPLEMENTOS SALARIALES {_importe(bruto * 0.2)}",
+            f"A. TOTAL DEVENGADO {_importe(bruto)}",
+            "II. DEDUCCIONES",
+            f"CONTINGENCIAS COMUNES 4,70% {_importe(bruto * 0.047)}",
+            f"IRPF 15,00% {_importe(bruto * 0.15)}",
+            f"LÍQUIDO A PERCIBIR {_importe(bruto * 0.8)}",
+            f"APORTACIÓN DE LA EMPRESA {_importe(bruto * 0.31)}",
+        ])
+    return pdf_de_lineas(paginas)
+
+
+def lote_sintetico(n_trabajadores, anio=2024, meses=12, semilla=0):
+    """
+    Auditoría completa de una empresa con `n_trabajadores`: un IDC por
+    trabajador, un 190, un RNT de `meses` meses y un PDF de nóminas de un mes.
+    Devuelve [(tipo, nombre, bytes)] como pipeline_auditoria.archivos_desde_carpetas.
+    """
+    empresa, trabajadores = plantilla(n_trabajadores, anio, semilla)
+    archivos = [("idc", f"idc_{i:05d}.pdf", pdf_idc(empresa, t, anio)) for i, t in enumerate(trabajadores)]
+    archivos.append(("190", f"modelo190_{anio}.pdf", pdf_190(empresa, trabajadores, anio)))
+    archivos.append(("rnt", f"rnt_{anio}.pdf", pdf_rnt(empresa, trabajadores, anio, meses)))
+    archivos.append(("nominas", f"nominas_{anio}_01.pdf", pdf_nominas(empresa, trabajadores, anio)))
+    return archivos
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    carpeta = sys.argv[2] if len(sys.argv) > 2 else "pdfs_sinteticos"
+    anio = int(sys.argv[3]) if len(sys.argv) > 3 else 2024
+    for tipo, nombre, contenido in lote_sintetico(n, anio):
+        os.makedirs(os.path.join(carpeta, tipo), exist_ok=True)
+        with open(os.path.join(carpeta, tipo, nombre), "wb") as f:
+            f.write(contenido)
+    print(f"{n} trabajadores escritos en {carpeta}/(idc|190|rnt|nominas)")
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+# Caché en disco de resultados ya extraídos, indexada por el hash del contenido del PDF.
+# Se puede mover/limitar con variables de entorno.
+RUTA_CACHE = os.environ.get(
+    "AUDITORIA_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "auditoria", "extractores.sqlite")
+)
+TAMANO_MAXIMO_MB = float(os.environ.get("AUDITORIA_CACHE_MB", "512"))
+
+
+def leer_contenido(file_object):
+    """
+    Devuelve el contenido del PDF sin mover el puntero de lectura: admite
+    UploadedFile/BytesIO, rutas en disco o bytes.
+    """
+    if isinstance(file_object, (bytes, bytearray, memoryview)):
+        return file_object
+    if isinstance(file_object, (str, os.PathLike)):
+        with open(file_object, "rb") as f:
+            return f.read()
+    if hasattr(file_object, "getvalue"):
+        # UploadedFile y los BytesIO creados a partir de bytes comparten esos
+        # bytes (copia en escritura de CPython): getvalue() los devuelve tal
+        # cual, mientras que getbuffer() obliga a copiarlos
+        return file_object.getvalue()
+    pos = file_object.tell()
+    contenido = file_object.read()
+    file_object.seek(pos)
+    return contenido
+
+
+def huella_contenido(contenido):
+    return hashlib.sha256(contenido).hexdigest()
+
+
+class CacheDisco:
+    """
+    Caché clave -> resultado (pickle) en SQLite con expulsión LRU por tamaño.
+    Es segura entre hilos (Streamlit atiende cada sesión en un hilo distinto).
+    """
+
+    def __init__(self, ruta=RUTA_CACHE, tamano_maximo_mb=TAMANO_MAXIMO_MB):
+        self.ruta = ruta
+        self.tamano_maximo = int(tamano_maximo_mb * 1024 * 1024)
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        self._con = None
+
+    def _conexion(self):
+        if self._con is None:
+            if os.path.dirname(self.ruta):
+                os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            self._con = sqlite3.connect(self.ruta, check_same_thread=False)
+            self._con.execute("""
+                CREATE TABLE IF NOT EXISTS resultados (
+                    clave TEXT PRIMARY KEY,
+                    espacio TEXT NOT NULL,
+                    datos BLOB NOT NULL,
+                    tamano INTEGER NOT NULL,
+                    ultimo_acceso REAL NOT NULL
+                )
+            """)
+            self._con.execute("CREATE INDEX IF NOT EXISTS idx_acceso ON resultados (ultimo_acceso)")
+            self._con.commit()
+        return self._con
+
+    def obtener(self, clave):
+        """
+        Devuelve (True, valor) si la clave está en caché, (False, None) si no.
+        """
+        with self._lock:
+            con = self._conexion()
+            fila = con.execute("SELECT datos FROM resultados WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                self.fallos += 1
+                return False, None
+            con.execute("UPDATE resultados SET ultimo_acceso = ? WHERE clave = ?", (time.time(), clave))
+            con.commit()
+            self.aciertos += 1
+        return True, pickle.loads(fila[0])
+
+    def guardar(self, clave, valor, espacio=""):
+        datos = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            con = self._conexion()
+            con.execute(
+                "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?, ?)",
+                (clave, espacio, datos, len(datos), time.time())
+            )
+            self._expulsar(con)
+            con.commit()
+
+    def _expulsar(self, con):
+        # LRU: borramos los menos usados hasta quedar por debajo del tamaño máximo
+        total = con.execute("SELECT COALESCE(SUM(tamano), 0) FROM resultados").fetchone()[0]
+        if total <= self.tamano_maximo:
+            return
+        for clave, tamano in con.execute("SELECT clave, tamano FROM resultados ORDER BY ultimo_acceso").fetchall():
+            con.execute("DELETE FROM resultados WHERE clave = ?", (clave,))
+            total -= tamano
+            if total <= self.tamano_maximo:
+                break
+
+    def invalidar(self, espacio=None):
+        with self._lock:
+            con = self._conexion()
+            if espacio is None:
+                con.execute("DELETE FROM resultados")
+            else:
+                con.execute("DELETE FROM resultados WHERE espacio = ?", (espacio,))
+            con.commit()
+
+    def estadisticas(self):
+        return {"aciertos": self.aciertos, "fallos": self.fallos}
+
+
+cache = CacheDisco()
+
+
+def clave_cache(espacio, version, file_object, nombre=""):
+    """
+    La clave combina el extractor (`espacio`), su versión, el hash del
+    contenido y, si el resultado lo incluye, el nombre del archivo.
+    Cada extractor pasa su VERSION_EXTRACTOR: hay que subirla cuando cambia
+    el formato de los registros que devuelve, y así lo guardado con el
+    formato anterior deja de usarse.
+    """
+    return f"{espacio}:{version}:{nombre}:{huella_contenido(leer_contenido(file_object))}"
+
+
+def extraer_con_cache(espacio, version, file_object, funcion, nombre=""):
+    """
+    Ejecuta `funcion()` solo si no hay resultado guardado para este PDF.
+    """
+    clave = clave_cache(espacio, version, file_object, nombre)
+    encontrado, valor = cache.obtener(clave)
+    if encontrado:
+        return valor
+    valor = funcion()
+    cache.guardar(clave, valor, espacio)
+    return valor
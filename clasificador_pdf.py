@@ -0,0 +1,115 @@
+import io
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from cache_extractores import cache, clave_cache
+from extractor_idc import MARCAS_AUTONOMO
+
+# Detección barata del tipo de documento (IDC, 190, RNT o nómina) para poder
+# subirlo todo a una sola zona. Solo se mira el título de los metadatos y el
+# texto de la primera página con PyPDF2, sin el análisis de maquetación de
+# pdfplumber: unas 5 veces menos que leer una página con los extractores.
+
+VERSION_CLASIFICADOR = 3
+
+# Título de los metadatos (lo pone el programa que genera el informe)
+MARCAS_TITULO = {"rnt": ["RNT"]}
+
+# Marcas de texto de la primera página, en el orden en que se comprueban:
+# (tipo, patrones, propia). Las de RNT, 190 e IDC son las mismas etiquetas que
+# buscan sus extractores. Primero las propias de cada informe, luego las de
+# nómina y al final las etiquetas genéricas que una nómina también puede
+# llevar ("Periodo de liquidación", "T.CONTRATO:"): así una nómina nunca pasa
+# por RNT o IDC. Solo una marca propia (o el título) es lo bastante clara como
+# para corregir un archivo subido en el cargador de otro tipo.
+MARCAS_TEXTO = [
+    ("rnt", [re.compile(r"RELACIÓN NOMINAL DE TRABAJADORES")], True),
+    ("190", [re.compile(r"Percepción\s+\d+"), re.compile(r"Percepción íntegra"), re.compile(r"Modelo 190")], True),
+    ("idc", [re.compile(r"PERIODO:\s*DESDE"), re.compile(r"RAZÓN SOCIAL:.*CCC:")]
+            + [re.compile(re.escape(m)) for m in MARCAS_AUTONOMO], True),
+    ("nominas", [re.compile(r"DEVENGOS", re.IGNORECASE), re.compile(r"L[ÍI]QUIDO A PERCIBIR", re.IGNORECASE),
+                 re.compile(r"DEDUCCIONES", re.IGNORECASE)], False),
+    ("rnt", [re.compile(r"Periodo de liquidación")], False),
+    ("idc", [re.compile(r"T\.CONTRATO:")], False),
+]
+
+
+def _tipo_por_titulo(titulo):
+    for tipo, marcas in MARCAS_TITULO.items():
+        if any(m in titulo for m in marcas):
+            return tipo
+    return None
+
+
+def tipo_por_texto(texto):
+    """
+    (tipo, propia) a partir del texto de la primera página: propia si lo ha
+    dado una marca propia del informe (ver MARCAS_TEXTO).
+    Sin texto (PDF escaneado) solo puede ser una nómina; (None, False) si no se reconoce.
+    """
+    if not texto.strip():
+        return "nominas", False
+    for tipo, patrones, propia in MARCAS_TEXTO:
+        if any(p.search(texto) for p in patrones):
+            return tipo, propia
+    return None, False
+
+
+def _detectar(contenido):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(io.BytesIO(contenido))
+    tipo = _tipo_por_titulo(str((reader.metadata or {}).get("/Title") or ""))
+    if tipo:
+        return tipo, True
+    if not reader.pages:
+        return None, False
+    return tipo_por_texto(reader.pages[0].extract_text() or "")
+
+
+def _detectar_seguro(contenido):
+    try:
+        return _detectar(contenido)
+    except Exception:
+        # PDF dañado o cifrado: que lo intente el extractor y dé su propio error
+        return None, False
+
+
+def clasificar_pdf(contenido):
+    """
+    (tipo, propia) de un PDF (bytes): tipo "idc", "190", "rnt", "nominas" o
+    None y propia si se ha reconocido por el título o una marca propia.
+    El resultado se guarda en la caché por hash del contenido.
+    """
+    clave = clave_cache("tipo", VERSION_CLASIFICADOR, contenido)
+    encontrado, deteccion = cache.obtener(clave)
+    if not encontrado:
+        deteccion = _detectar_seguro(contenido)
+        cache.guardar(clave, deteccion, "tipo")
+    return deteccion
+
+
+def clasificar_lote(contenidos, procesos=1):
+    """
+    clasificar_pdf para muchos PDFs; los que no están en caché se reparten
+    entre `procesos` procesos.
+    """
+    detecciones, pendientes = [], []
+    for i, contenido in enumerate(contenidos):
+        clave = clave_cache("tipo", VERSION_CLASIFICADOR, contenido)
+        encontrado, deteccion = cache.obtener(clave)
+        detecciones.append(deteccion)
+        if not encontrado:
+            pendientes.append((i, clave))
+
+    if procesos > 1 and len(pendientes) > 1:
+        # Se llama desde el hilo del trabajo: mismo contexto que la extracción (sin fork)
+        from ejecutor_lote import contexto_procesos
+        with ProcessPoolExecutor(max_workers=min(procesos, len(pendientes)), mp_context=contexto_procesos()) as pool:
+            detectados = list(pool.map(_detectar_seguro, [contenidos[i] for i, _ in pendientes], chunksize=8))
+    else:
+        detectados = [_detectar_seguro(contenidos[i]) for i, _ in pendientes]
+
+    for (i, clave), deteccion in zip(pendientes, detectados):
+        detecciones[i] = deteccion
+        cache.guardar(clave, deteccion, "tipo")
+    return detecciones
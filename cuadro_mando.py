@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+from normalizacion import normalizar_dni_columna
+
+# Motor de unión del Cuadro de Mando. La tabla unificada (190 + IDC + RNT +
+# nóminas) se construye una vez por cada combinación de datos de entrada y
+# los filtros de claves y trabajadores son búsquedas por posición sobre ella.
+# Filtrar antes o después de unir da lo mismo: la unión es un left join sobre
+# el 190, que conserva el orden y las columnas de sus filas.
+
+# Columnas del IDC que se pegan a cada registro del 190 (sin nombre, para no duplicar)
+COLUMNAS_IDC = ['DNI_JOIN', 'Horas Efectivas', 'Días IT', 'Empresa', 'CIF Empresa', 'Contrato', 'Total Cotización (%)']
+
+
+def huella(df):
+    """
+    Huella del contenido de un DataFrame (columnas, tamaño y hash de los valores).
+    """
+    if df.empty:
+        return (tuple(df.columns), 0)
+    valores = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return (tuple(df.columns), len(df), int(valores.sum(dtype=np.uint64)))
+
+
+def agregado_por_dni(df, columnas, memo=None):
+    """
+    Suma `columnas` por DNI normalizado; la tabla queda indexada por DNI_JOIN.
+    Con `memo` (dict) no se recalcula mientras el DataFrame no cambie.
+    """
+    clave = (tuple(columnas), huella(df))
+    if memo is not None and clave in memo:
+        return memo[clave]
+    tabla = df.assign(DNI_JOIN=normalizar_dni_columna(df['DNI'])).groupby('DNI_JOIN')[columnas].sum()
+    if memo is not None:
+        memo[clave] = tabla
+    return tabla
+
+
+def _tipos_enteros(df):
+    return {c: t for c, t in df.dtypes.items() if t.kind in "iub" and c != 'DNI_JOIN'}
+
+
+def construir_cuadro(df_i, df_1, df_n, df_r, memo=None):
+    """
+    Une el 190 completo con IDC, RNT y nóminas y calcula SS y costes por hora.
+    Devuelve un dict con la tabla y los índices de posiciones por clave y por
+    nombre que usa filtrar_cuadro.
+    """
+    # Para el match, normalizamos el DNI en todas
+    df_1 = df_1.copy()
+    for col in ['NIF', 'DNI']:
+        if col in df_1.columns:
+            df_1['DNI_JOIN'] = normalizar_dni_columna(df_1[col])
+
+    # Columnas enteras que la unión pasa a float si algún registro no cruza;
+    # filtrar_cuadro las devuelve a su tipo cuando en lo filtrado cruzan todos
+    enteras = {}
+
+    # UNIÓN: El IDC no tiene clave, así que lo pegamos por DNI a cada registro del 190
+    if not df_i.empty and 'DNI_JOIN' in df_1.columns:
+        df_i_min = df_i.assign(DNI_JOIN=normalizar_dni_columna(df_i['DNI']))[COLUMNAS_IDC]
+        enteras.update(_tipos_enteros(df_i_min))
+        resultado = pd.merge(df_1, df_i_min, on='DNI_JOIN', how='left')
+    else:
+        resultado = df_1
+
+    # RNT: sumando SOLO la Base CC
+    if not df_r.empty and 'DNI' in df_r.columns and 'DNI_JOIN' in resultado.columns:
+        # Borramos restos de columnas RNT si existieran por re-ejecución
+        cols_rnt_limpiar = [c for c in resultado.columns if any(p in c for p in ['Base_CC', 'Base_AT', 'Solidaridad'])]
+        resultado = resultado.drop(columns=cols_rnt_limpiar)
+        agregado = agregado_por_dni(df_r, ['Base_CC_Anual'], memo)
+        enteras.update(_tipos_enteros(agregado))
+        resultado = resultado.join(agregado, on='DNI_JOIN')
+
+    # NÓMINAS
+    if not df_n.empty and 'DNI_JOIN' in resultado.columns:
+        if 'AportacionEmpresa' in resultado.columns:
+            resultado = resultado.drop(columns=['AportacionEmpresa'])
+        agregado = agregado_por_dni(df_n, ['AportacionEmpresa'], memo)
+        enteras.update(_tipos_enteros(agregado))
+        resultado = resultado.join(agregado, on='DNI_JOIN')
+
+    if not resultado.empty:
+        # --- 1. CÁLCULO DE LA SS TEÓRICA ---
+        if 'Base_CC_Anual' in resultado.columns and 'Total Cotización (%)' in resultado.columns:
+            # Fórmula: (Base RNT * Porcentaje IDC) / 100
+            resultado['SS a cargo Empresa'] = round(
+                (resultado['Base_CC_Anual'] * resultado['Total Cotización (%)']) / 100, 2
+            )
+        # --- 2. CÁLCULO DE COSTES POR HORA ---
+        if 'Horas Efectivas' in resultado.columns:
+            # 'Coste hora' simple (Percepciones / Horas) como referencia
+            if 'Percepciones' in resultado.columns:
+                resultado['Coste hora'] = round(resultado['Percepciones'] / resultado['Horas Efectivas'], 2)
+
+            # Coste Hora Real (Dinerarias + SS) / Horas
+            if 'Dinerarias NO IL' in resultado.columns and 'SS a cargo Empresa' in resultado.columns:
+                resultado['Coste Hora Real'] = round(
+                    (resultado['Dinerarias NO IL'] + resultado['SS a cargo Empresa']) / resultado['Horas Efectivas'], 2
+                )
+        # Limpieza final de columnas técnicas
+        if 'DNI_JOIN' in resultado.columns:
+            resultado = resultado.drop(columns=['DNI_JOIN'])
+
+    resultado = resultado.reset_index(drop=True)
+    claves = resultado['Clave'] if 'Clave' in resultado.columns else pd.Series(index=resultado.index, dtype=object)
+    nombres = resultado['Nombre'] if 'Nombre' in resultado.columns else pd.Series(index=resultado.index, dtype=object)
+    por_clave = claves.groupby(claves, sort=False, dropna=False).indices
+    return {
+        "tabla": resultado,
+        "enteras": {c: t for c, t in enteras.items() if c in resultado.columns and resultado[c].dtype != t},
+        "por_clave": por_clave,
+        "por_nombre": nombres.groupby(nombres, sort=False, dropna=False).indices,
+        "nombres_por_clave": {c: nombres.iloc[pos].unique() for c, pos in por_clave.items()},
+    }
+
+
+def claves_disponibles(cuadro):
+    return sorted(cuadro["por_clave"])
+
+
+def nombres_disponibles(cuadro, claves):
+    """
+    Trabajadores que aparecen con alguna de las claves seleccionadas.
+    """
+    nombres = [cuadro["nombres_por_clave"][c] for c in claves if c in cuadro["nombres_por_clave"]]
+    return sorted(pd.unique(np.concatenate(nombres))) if nombres else []
+
+
+def _posiciones(indice, valores):
+    partes = [indice[v] for v in valores if v in indice]
+    return np.concatenate(partes) if partes else np.array([], dtype=np.intp)
+
+
+def filtrar_cuadro(cuadro, claves, nombres=None):
+    """
+    Filas de la tabla unificada con alguna de `claves` y, si se indican,
+    de alguno de `nombres`, en el mismo orden que la tabla.
+    """
+    posiciones = _posiciones(cuadro["por_clave"], claves)
+    if nombres:
+        posiciones = np.intersect1d(posiciones, _posiciones(cuadro["por_nombre"], nombres))
+    else:
+        posiciones = np.sort(posiciones)
+    tabla = cuadro["tabla"].iloc[posiciones].reset_index(drop=True)
+    for col, tipo in cuadro["enteras"].items():
+        if tabla[col].notna().all():
+            tabla[col] = tabla[col].astype(tipo)
+    return tabla
@@ -0,0 +1,257 @@
+import io
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing import forkserver
+from multiprocessing.connection import wait as esperar_conexiones
+
+from cache_extractores import cache, clave_cache
+from extractor_idc import extraer_datos_idc, VERSION_EXTRACTOR as VERSION_IDC
+from extractor_190 import extraer_datos_190, VERSION_EXTRACTOR as VERSION_190
+from rnt_reader import extraer_bases_rnt, VERSION_EXTRACTOR as VERSION_RNT
+from paginas_pdf import rss_grupo_mb, vigilar_paginas
+
+# tipo -> (espacio de caché, versión, ¿el resultado incluye el nombre del archivo?)
+EXTRACTORES = {
+    "idc": ("idc", VERSION_IDC, True),
+    "190": ("190", VERSION_190, True),
+    "rnt": ("rnt", VERSION_RNT, False),
+}
+
+PROCESOS_POR_DEFECTO = os.cpu_count() or 1
+
+# Extractores que saben repartir un mismo PDF por bloques de páginas
+POR_PAGINAS = ("rnt", "190")
+
+# Límites por documento (0 = sin límite). Un PDF que se cuelga o se come la
+# memoria se mata sin parar al resto del lote
+LIMITE_SEGUNDOS = float(os.environ.get("AUDITORIA_LIMITE_S", "900"))
+LIMITE_MB = float(os.environ.get("AUDITORIA_LIMITE_MB", "4096"))
+INTERVALO_VIGILANCIA_S = 0.2
+# Margen para que un documento que se mata cierre su pool de bloques de
+# páginas (y libere sus semáforos) antes de matarlo a la fuerza
+GRACIA_AL_MATAR_S = 2.0
+
+# Los documentos se leen en procesos que salen de un forkserver con los
+# extractores ya importados: arrancan rápido y no heredan los hilos del
+# proceso principal (gRPC de Document AI, Streamlit), que al hacer fork
+# pueden dejar al hijo bloqueado antes de empezar. pdfplumber se importa al
+# usarse, así que se precarga aparte
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _CONTEXTO = multiprocessing.get_context("forkserver")
+    _CONTEXTO.set_forkserver_preload(["ejecutor_lote", "pdfplumber", "pdfminer.layout"])
+    # El forkserver arranca con el sys.path de un intérprete nuevo (Python
+    # 3.11 no le pasa el nuestro antes de precargar) y, si no encuentra
+    # ejecutor_lote, cada documento pagaría otra vez todas las importaciones.
+    # La carpeta de la app se añade al PYTHONPATH una sola vez, al importar
+    # (antes de que haya hilos de trabajos), y ya no se toca
+    _CARPETA_APP = os.path.dirname(os.path.abspath(__file__))
+    if _CARPETA_APP not in os.environ.get("PYTHONPATH", "").split(os.pathsep):
+        os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [_CARPETA_APP, os.environ.get("PYTHONPATH")]))
+else:
+    _CONTEXTO = multiprocessing.get_context("spawn")
+
+
+def _arrancar_forkserver():
+    if _CONTEXTO.get_start_method() == "forkserver":
+        forkserver.ensure_running()
+
+
+def contexto_procesos():
+    """
+    Contexto de multiprocessing para lanzar procesos desde la app (forkserver
+    ya arrancado, o spawn si no hay forkserver): nunca fork desde un proceso
+    con hilos vivos.
+    """
+    _arrancar_forkserver()
+    return _CONTEXTO
+
+
+def extraer_archivo(tipo, nombre, contenido, procesos=1, medida=None):
+    """
+    Extrae un PDF (bytes) con el extractor de su tipo. Vive a nivel de módulo
+    para poder ejecutarse en un proceso hijo. `procesos` solo lo usan el RNT
+    y el 190 (lectura por bloques de páginas en paralelo). `medida` (dict)
+    recibe las páginas leídas y el pico de memoria del archivo.
+    """
+    buffer = io.BytesIO(contenido)
+    buffer.name = nombre
+    if tipo == "idc":
+        return extraer_datos_idc(buffer, medida=medida)
+    if tipo == "190":
+        return extraer_datos_190(buffer, procesos=procesos, medida=medida)
+    if tipo == "rnt":
+        return extraer_bases_rnt(contenido if procesos > 1 else buffer, procesos=procesos, medida=medida)
+    raise ValueError(f"Tipo de documento desconocido: {tipo}")
+
+
+def _extraer_seguro(tipo, nombre, contenido, procesos=1):
+    medida = {"bytes": len(contenido)}
+    inicio = time.perf_counter()
+    try:
+        return extraer_archivo(tipo, nombre, contenido, procesos, medida), None, medida
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", medida
+    finally:
+        medida["segundos"] = time.perf_counter() - inicio
+
+
+def _salir(signum, frame):
+    # SIGTERM como excepción: los `with ProcessPoolExecutor` se cierran al salir
+    raise SystemExit(128 + signum)
+
+
+def _trabajador_aislado(conexion, pagina, tipo, nombre, contenido, procesos):
+    # Proceso hijo de un solo documento. Con grupo de procesos propio se puede
+    # matar de una vez junto con los procesos de bloques de páginas que lance
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    signal.signal(signal.SIGTERM, _salir)
+    # Este proceso no tiene hilos: su pool de bloques de páginas puede usar
+    # fork, con lo que los hijos quedan en su grupo (y reciben las señales de
+    # _matar) y los semáforos del pool no dependen de que alguien los libere
+    if "fork" in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method("fork", force=True)
+    vigilar_paginas(pagina)
+    conexion.send(_extraer_seguro(tipo, nombre, contenido, procesos))
+    conexion.close()
+
+
+def _senal(proceso, grupo, senal):
+    try:
+        if grupo:
+            os.killpg(proceso.pid, senal)
+        elif senal == signal.SIGTERM:
+            proceso.terminate()
+        else:
+            proceso.kill()
+    except ProcessLookupError:
+        pass
+
+
+def _matar(proceso, gracia_s=GRACIA_AL_MATAR_S):
+    # Primero SIGTERM, para que cierre su pool de bloques de páginas (un
+    # SIGKILL deja sus semáforos sin liberar hasta que se para la app) y, pasado
+    # el margen, SIGKILL a lo que quede del grupo
+    try:
+        # Si no llegó a crear su grupo (se colgó antes), solo queda él
+        grupo = hasattr(os, "killpg") and os.getpgid(proceso.pid) == proceso.pid
+    except ProcessLookupError:
+        grupo = False
+    _senal(proceso, grupo, signal.SIGTERM)
+    proceso.join(gracia_s)
+    _senal(proceso, grupo, signal.SIGKILL)
+    proceso.join()
+
+
+def _fallo(motivo, error, pagina):
+    return None, error, {"motivo": motivo, "pagina": pagina or None}
+
+
+def _extraer_aislados(documentos, max_procesos, limite_s, limite_mb, cerrar):
+    """
+    documentos: [(k, tipo, nombre, contenido, procesos)]. Cada uno se extrae en
+    su propio proceso, como mucho `max_procesos` a la vez. El que pasa de
+    `limite_s` segundos o de `limite_mb` MB se mata y queda como fallo con la
+    página en la que iba; el resto sigue. `cerrar(k, (datos, error, medida))`
+    se llama al terminar cada uno.
+    """
+    contexto = contexto_procesos()
+    cola = list(documentos)
+    en_curso = {}
+    while cola or en_curso:
+        while cola and len(en_curso) < max_procesos:
+            k, tipo, nombre, contenido, procesos = cola.pop(0)
+            receptor, emisor = contexto.Pipe(duplex=False)
+            pagina = contexto.Value("i", 0, lock=False)
+            proceso = contexto.Process(
+                target=_trabajador_aislado, args=(emisor, pagina, tipo, nombre, contenido, procesos),
+                name=f"extraer-{tipo}-{nombre}"
+            )
+            proceso.start()
+            emisor.close()
+            en_curso[k] = (proceso, receptor, pagina, time.monotonic())
+
+        listos = esperar_conexiones([receptor for _, receptor, _, _ in en_curso.values()], timeout=INTERVALO_VIGILANCIA_S)
+        for k, (proceso, receptor, pagina, inicio) in list(en_curso.items()):
+            if receptor in listos:
+                try:
+                    salida = receptor.recv()
+                    if salida[1]:
+                        salida[2].update(motivo="error", pagina=pagina.value or None)
+                    proceso.join()
+                except EOFError:
+                    # Murió sin responder (segfault, el OOM killer del sistema...)
+                    proceso.join()
+                    salida = _fallo("proceso caído", f"El proceso terminó con código {proceso.exitcode}", pagina.value)
+            else:
+                segundos = time.monotonic() - inicio
+                rss = rss_grupo_mb(proceso.pid) if limite_mb else None
+                if limite_s and segundos > limite_s:
+                    salida = _fallo("tiempo", f"Más de {limite_s:g} s de lectura", pagina.value)
+                elif rss is not None and rss > limite_mb:
+                    salida = _fallo("memoria", f"{rss:.0f} MB (límite {limite_mb:.0f} MB)", pagina.value)
+                else:
+                    continue
+                _matar(proceso)
+            receptor.close()
+            del en_curso[k]
+            cerrar(k, salida)
+
+
+def procesar_lote(tareas, max_procesos=PROCESOS_POR_DEFECTO, al_terminar=None,
+                  limite_s=LIMITE_SEGUNDOS, limite_mb=LIMITE_MB):
+    """
+    Procesa una lista de tareas (tipo, nombre, contenido) repartiendo los
+    archivos entre `max_procesos` procesos. Primero se consulta la caché y
+    solo se extraen los archivos nuevos, cada uno en un proceso aislado con
+    un límite de tiempo y de memoria (0 o None: sin límite).
+
+    Devuelve una lista de dicts {tipo, nombre, datos, error, motivo, pagina,
+    desde_cache, paginas, rss_pico_mb, medida} en el mismo orden que `tareas`,
+    así que el resultado es determinista. Páginas, memoria y medida (la
+    completa del extractor, con segundos, bytes y registros) quedan a None si
+    vino de caché.
+    Un archivo que falla no detiene al resto: queda con `error` relleno,
+    `motivo` ("error", "tiempo", "memoria" o "proceso caído") y la página en
+    la que iba (empezando en 1) si se sabe.
+    `al_terminar(i, resultado)` se llama en cuanto está listo cada archivo.
+    """
+    resultados = []
+    pendientes = []
+    for i, (tipo, nombre, contenido) in enumerate(tareas):
+        espacio, version, con_nombre = EXTRACTORES[tipo]
+        clave = clave_cache(espacio, version, contenido, nombre if con_nombre else "")
+        encontrado, datos = cache.obtener(clave)
+        resultados.append({"tipo": tipo, "nombre": nombre, "datos": datos, "error": None, "motivo": None, "pagina": None,
+                           "desde_cache": encontrado, "paginas": None, "rss_pico_mb": None, "medida": None})
+        if encontrado:
+            if al_terminar: al_terminar(i, resultados[i])
+        else:
+            pendientes.append((i, clave, espacio))
+
+    def cerrar(k, salida):
+        i, clave, espacio = pendientes[k]
+        datos, error, medida = salida
+        resultados[i]["datos"], resultados[i]["error"] = datos, error
+        resultados[i]["motivo"], resultados[i]["pagina"] = medida.get("motivo"), medida.get("pagina")
+        resultados[i]["paginas"] = medida.get("paginas")
+        resultados[i]["rss_pico_mb"] = medida.get("rss_pico_mb")
+        resultados[i]["medida"] = medida
+        if error is None:
+            cache.guardar(clave, datos, espacio)
+        if al_terminar: al_terminar(i, resultados[i])
+
+    if not pendientes:
+        return resultados
+
+    # Con menos archivos que procesos, los RNT y 190 (miles de páginas) se
+    # reparten además por bloques de páginas con los procesos que sobran
+    procesos_por_paginas = max(1, max_procesos // len(pendientes))
+    documentos = [
+        (k, *tareas[i], procesos_por_paginas if tareas[i][0] in POR_PAGINAS else 1)
+        for k, (i, _, _) in enumerate(pendientes)
+    ]
+    _extraer_aislados(documentos, max(1, max_procesos), limite_s, limite_mb, cerrar)
+    return resultados
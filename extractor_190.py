@@ -1,77 +1,126 @@
-import pdfplumber
 import pandas as pd
 import re
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-def limpiar_monto(texto):
-    if not texto: return 0.0
-    limpio = re.sub(r'[^0-9,.]', '', texto)
-    if not limpio: return 0.0
-    limpio = limpio.replace('.', '').replace(',', '.')
-    try:
-        return float(limpio)
-    except:
+from cache_extractores import leer_contenido
+from normalizacion import limpiar_monto
+from paginas_pdf import iterar_textos, contar_paginas, unir_medidas
+from registros import Perceptor190
+
+VERSION_EXTRACTOR = 2
+
+# --- TOKENIZADOR DE BLOQUES (una sola pasada por página) ---
+# Cada "Percepción N" abre un bloque de perceptor. El mismo patrón localiza los
+# separadores y todas las etiquetas que interesan dentro del bloque; clave y
+# subclave van en lookahead para no consumir el carácter (puede empezar otra etiqueta).
+_PATRON_TOKENS = re.compile(
+    r"(?P<sep>Percepción\s+\d+)"
+    r"|(?P<integra>Percepción íntegra)"
+    r"|(?P<valoracion>Valoración)"
+    r"|Subclave:\s*(?=(?P<subclave>\d{2}))"
+    r"|Clave:\s*(?=(?P<clave>[A-Z]))"
+)
+# --- RIGOR EN NIF/NIE/CIF ---
+# Acepta: 8núm+letra O letra+7/8 caracteres (cubre E de notarías, XYZ de extranjeros, etc.)
+_PATRON_ID = re.compile(r'([A-Z0-9][0-9A-Z]{7,8})\s+(.*?)\s+(\d{2})')
+_PATRON_NUMERO = re.compile(r'(\d{1,3}(\.\d{3})*,\d{2})')
+
+
+def _importe_tras(texto, posiciones, instancia, fin):
+    # Primer número en los 200 caracteres siguientes a la n-ésima etiqueta,
+    # sin salirse del bloque
+    if len(posiciones) < instancia:
         return 0.0
+    inicio = posiciones[instancia - 1]
+    num_match = _PATRON_NUMERO.search(texto, inicio, min(inicio + 200, fin))
+    return limpiar_monto(num_match.group(1)) if num_match else 0.0
+
+
+def _cerrar_bloque(texto, ini, fin, marcas, nombre_archivo):
+    match_id = _PATRON_ID.search(texto, ini, fin)
+    if not match_id: return None
+
+    # La letra de la clave puede ser el inicio del siguiente separador: no cuenta
+    clave = marcas["clave"][1] if marcas["clave"] and marcas["clave"][0] < fin else ""
+    subclave = marcas["subclave"][1] if marcas["subclave"] and marcas["subclave"][0] < fin else ""
+
+    return Perceptor190(
+        archivo=nombre_archivo,
+        nif=match_id.group(1),
+        nombre=match_id.group(2).strip(),
+        clave=clave,
+        subclave=subclave,
+        dinerarias_no_il=_importe_tras(texto, marcas["integra"], 1, fin),
+        especie_no_il=_importe_tras(texto, marcas["valoracion"], 1, fin),
+        dinerarias_il=_importe_tras(texto, marcas["integra"], 2, fin),
+        especie_il=_importe_tras(texto, marcas["valoracion"], 2, fin)
+    )
+
 
-def extraer_por_instancia(bloque, etiqueta, instancia):
-    try:
-        matches = [m.start() for m in re.finditer(re.escape(etiqueta), bloque)]
-        if len(matches) >= instancia:
-            punto_inicio = matches[instancia-1]
-            fragmento = bloque[punto_inicio:punto_inicio+200]
-            num_match = re.search(r'(\d{1,3}(\.\d{3})*,\d{2})', fragmento)
-            if num_match:
-                return limpiar_monto(num_match.group(1))
-    except:
-        pass
-    return 0.0
-
-def extraer_datos_190(file_object):
+def extraer_registros_pagina(texto, nombre_archivo):
+    """
+    Registros de perceptores de una página del 190, recorriendo el texto una vez.
+    """
     resultados = []
-    
+    ini, marcas = None, None
+    for m in _PATRON_TOKENS.finditer(texto):
+        tipo = m.lastgroup
+        if tipo == "sep":
+            if ini is not None:
+                registro = _cerrar_bloque(texto, ini, m.start(), marcas, nombre_archivo)
+                if registro: resultados.append(registro)
+            ini, marcas = m.end(), {"integra": [], "valoracion": [], "clave": None, "subclave": None}
+        elif ini is None:
+            continue  # texto anterior al primer perceptor
+        elif tipo in ("integra", "valoracion"):
+            if len(marcas[tipo]) < 2: marcas[tipo].append(m.start())
+        elif marcas[tipo] is None:
+            marcas[tipo] = (m.start(tipo), m.group(tipo))
+    if ini is not None:
+        registro = _cerrar_bloque(texto, ini, len(texto), marcas, nombre_archivo)
+        if registro: resultados.append(registro)
+    return resultados
+
+
+def _procesar_paginas(origen, inicio, fin, nombre_archivo):
+    resultados, medida = [], {}
+    for _, texto in iterar_textos(origen, inicio, fin, medida=medida):
+        if not texto: continue
+        resultados.extend(extraer_registros_pagina(texto, nombre_archivo))
+    return resultados, medida
+
+
+def _procesar_paginas_paralelo(args):
+    return _procesar_paginas(*args)
+
+
+def extraer_datos_190(file_object, procesos=1, paginas_por_bloque=None, medida=None):
+    """
+    Con procesos > 1 las páginas se reparten en bloques entre varios procesos.
+    Un perceptor nunca cruza de página, así que basta con concatenar.
+    `medida` (dict) recibe las páginas leídas, el pico de memoria, los
+    segundos de texto y de análisis y los registros extraídos.
+    """
     if hasattr(file_object, 'name'):
         nombre_archivo = file_object.name
     else:
         nombre_archivo = os.path.basename(file_object)
-    
-    with pdfplumber.open(file_object) as pdf:
-        for page in pdf.pages:
-            texto = page.extract_text()
-            if not texto: continue
-            
-            bloques = re.split(r'Percepción\s+\d+', texto)
-            
-            for bloque in bloques[1:]:
-                # --- RIGOR EN NIF/NIE/CIF ---
-                # Acepta: 8núm+letra O letra+7/8 caracteres (cubre E de notarías, XYZ de extranjeros, etc.)
-                match_id = re.search(r'([A-Z0-9][0-9A-Z]{7,8})\s+(.*?)\s+(\d{2})', bloque)
-                if not match_id: continue
-                
-                nif = match_id.group(1)
-                nombre = match_id.group(2).strip()
-                
-                # --- EXTRACCIÓN DE CLAVES ---
-                clave_match = re.search(r'Clave:\s*([A-Z])', bloque)
-                clave = clave_match.group(1) if clave_match else ""
-                
-                subclave_match = re.search(r'Subclave:\s*(\d{2})', bloque)
-                subclave = subclave_match.group(1) if subclave_match else ""
-                
-                # --- TU LÓGICA DE IMPORTES ORIGINAL ---
-                d_no_il = extraer_por_instancia(bloque, "Percepción íntegra", 1)
-                e_no_il = extraer_por_instancia(bloque, "Valoración", 1)
-                d_il = extraer_por_instancia(bloque, "Percepción íntegra", 2)
-                e_il = extraer_por_instancia(bloque, "Valoración", 2)
-
-                resultados.append({
-                    "Archivo": nombre_archivo,
-                    "NIF": nif,
-                    "Nombre": nombre,
-                    "Clave": clave,
-                    "Subclave": subclave,
-                    "Dinerarias NO IL": d_no_il,
-                    "Especie NO IL": e_no_il,
-                    "Dinerarias IL": d_il,
-                    "Especie IL": e_il
-                })
-    return resultados
\ No newline at end of file
+
+    if procesos <= 1:
+        resultados, medida_lectura = _procesar_paginas(file_object, 0, None, nombre_archivo)
+        if medida is not None: medida.update(medida_lectura, registros=len(resultados))
+        return resultados
+
+    # Los procesos hijos necesitan algo serializable: ruta o bytes
+    origen = file_object if isinstance(file_object, (str, os.PathLike, bytes)) else bytes(leer_contenido(file_object))
+    n_paginas = contar_paginas(origen)
+    tam = paginas_por_bloque or max(1, -(-n_paginas // (procesos * 4)))
+    tareas = [(origen, ini, min(ini + tam, n_paginas), nombre_archivo) for ini in range(0, n_paginas, tam)]
+    resultados, medidas = [], []
+    with ProcessPoolExecutor(max_workers=min(procesos, len(tareas) or 1)) as pool:
+        for parcial, medida_bloque in pool.map(_procesar_paginas_paralelo, tareas):
+            resultados.extend(parcial)
+            medidas.append(medida_bloque)
+    if medida is not None: medida.update(unir_medidas(medidas), registros=len(resultados))
+    return resultados
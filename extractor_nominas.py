@@ -1,72 +1,241 @@
+import io
 import os
-import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 import pandas as pd
-import streamlit as st
-from PyPDF2 import PdfReader, PdfWriter
-from google.oauth2 import service_account
-from google.cloud import documentai_v1beta3 as documentai
-
-# --- Autenticación local ---
-# Asegúrate de que esta línea esté al principio del archivo (o antes de crear el cliente)
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/Users/oscarvines/Downloads/lectornominas-04238e0ab172.json"
-
-# ELIMINA O COMENTA estas líneas:
-# info = json.loads(st.secrets["google"]["credentials"])
-# creds = service_account.Credentials.from_service_account_info(info)
-
-# MODIFICA el cliente para que quede SOLO así:
-client = documentai.DocumentProcessorServiceClient(
-    client_options={"api_endpoint": "eu-documentai.googleapis.com"}
-)
+from cache_extractores import cache, extraer_con_cache
+from normalizacion import importe_es
+
+# google-cloud y PyPDF2 se importan cuando hacen falta: abrir la app, o una
+# sesión que no toca nóminas, no paga sus importaciones ni crea el cliente.
+
+# --- Autenticación ---
+# GOOGLE_APPLICATION_CREDENTIALS (ruta al JSON de la cuenta de servicio) o,
+# dentro de la app, la sección [gcp_service_account] de .streamlit/secrets.toml.
+# Sin ninguna de las dos, las credenciales por defecto de Google (gcloud auth).
+SECCION_SECRETS = "gcp_service_account"
+
 # Configuración de Document AI
 PROJECT_ID = "654011088"
 LOCATION = "eu"
 PROCESSOR_ID = "ff607a96112bfc11"
-processor_name = client.processor_path(PROJECT_ID, LOCATION, PROCESSOR_ID)
+API_ENDPOINT = "eu-documentai.googleapis.com"
+# Lo mismo que devuelve client.processor_path(...), sin necesitar el cliente
+processor_name = f"projects/{PROJECT_ID}/locations/{LOCATION}/processors/{PROCESSOR_ID}"
+# Cambia (o exporta DOCUMENTAI_PROCESSOR_VERSION) al actualizar el procesador:
+# las respuestas cacheadas con otra versión dejan de usarse
+PROCESSOR_VERSION = os.environ.get("DOCUMENTAI_PROCESSOR_VERSION", "default")
+
+# Motor que lee las nóminas: "documentai" o "falso" (local, sin red ni credenciales).
+# Se pueden añadir otros en BACKENDS_NOMINAS.
+BACKEND_NOMINAS = os.environ.get("NOMINAS_BACKEND", "documentai")
+
+# Peticiones simultáneas a Document AI y reintentos ante cuota/errores transitorios
+MAX_EN_VUELO = int(os.environ.get("DOCUMENTAI_MAX_EN_VUELO", "8"))
+MAX_REINTENTOS = 5
+ESPERA_REINTENTO_S = 1.0  # primera espera; se dobla en cada reintento
+
+def errores_transitorios():
+    """
+    Errores de cuota o transitorios de Google ante los que se reintenta.
+    """
+    from google.api_core import exceptions as google_exceptions
+    return (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+        google_exceptions.Aborted,
+    )
 
 # Rutas por defecto (pueden sobreescribirse al importar)
 DEFAULT_INPUT_FOLDER = "/Users/oscarvines/Downloads/nominas"
 DEFAULT_SPLIT_DIR = os.path.join(DEFAULT_INPUT_FOLDER, "split_temp")
 DEFAULT_OUTPUT_EXCEL = "nominas_extraidas.xlsx"
 
-def split_pdf(ruta_pdf: str, split_dir: str = DEFAULT_SPLIT_DIR) -> list[str]:
+def _nombre_base(origen) -> str:
+    nombre = getattr(origen, "name", None) or (origen if isinstance(origen, str) else "documento.pdf")
+    return os.path.splitext(os.path.basename(nombre))[0]
+
+def dividir_pdf_en_memoria(origen, reader=None):
     """
-    Divide un PDF en páginas individuales y devuelve la lista de rutas.
+    Divide un PDF en páginas individuales sin tocar disco. `origen` puede ser
+    una ruta, un archivo subido (UploadedFile/BytesIO) o bytes; si ya se ha
+    abierto, se puede pasar su `reader` (PdfReader) para no volver a parsearlo.
+    Genera tuplas (nombre_pagina, bytes_pdf_una_pagina).
     """
-    reader = PdfReader(ruta_pdf)
-    archivos = []
-    base = os.path.splitext(os.path.basename(ruta_pdf))[0]
-    os.makedirs(split_dir, exist_ok=True)
+    from PyPDF2 import PdfReader, PdfWriter
+    if reader is None:
+        reader = PdfReader(io.BytesIO(origen) if isinstance(origen, (bytes, bytearray, memoryview)) else origen)
+    base = _nombre_base(origen)
 
     for i, page in enumerate(reader.pages):
         writer = PdfWriter()
         writer.add_page(page)
-        chunk_name = f"{base}_page_{i+1}.pdf"
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        yield f"{base}_page_{i+1}.pdf", buffer.getvalue()
+
+def split_pdf(ruta_pdf: str, split_dir: str = None) -> list[str]:
+    """
+    Divide un PDF en páginas individuales en disco y devuelve la lista de rutas.
+    Sin `split_dir` usa un directorio temporal propio de cada llamada, para que
+    dos usuarios a la vez no se pisen los archivos.
+    (Se mantiene por compatibilidad; el flujo de nóminas usa dividir_pdf_en_memoria.)
+    """
+    archivos = []
+    if split_dir is None:
+        split_dir = tempfile.mkdtemp(prefix="nominas_split_")
+    os.makedirs(split_dir, exist_ok=True)
+
+    for chunk_name, contenido in dividir_pdf_en_memoria(ruta_pdf):
         chunk_path = os.path.join(split_dir, chunk_name)
         with open(chunk_path, "wb") as f:
-            writer.write(f)
+            f.write(contenido)
         archivos.append(chunk_path)
 
     return archivos
 
-def procesar_documento(ruta_pdf: str) -> dict:
+def invalidar_cache_nominas():
     """
-    Procesa un PDF (ruta en disco) usando Document AI y devuelve
-    un diccionario con los campos extraídos y suma de AportacionEmpresa.
+    Borra todas las respuestas de Document AI guardadas en la caché.
     """
-    with open(ruta_pdf, "rb") as f:
-        contenido = f.read()
+    cache.invalidar("nominas")
+
+class ClienteDocumentAIFalso:
+    """
+    Procesador local que imita a Document AI para pruebas: responde con las
+    entidades indicadas tras `latencia` segundos (± la fracción `variacion`,
+    al azar) y, opcionalmente, falla con ResourceExhausted en una fracción de
+    las llamadas. `errores` son excepciones que se lanzan, una por llamada y
+    en orden, antes de empezar a responder. Cuenta las llamadas y el máximo
+    de peticiones que ha tenido en vuelo a la vez.
+    """
+
+    def __init__(self, entidades=None, latencia=0.0, tasa_error_cuota=0.0, variacion=0.0, errores=()):
+        self.entidades = entidades or {"Nombre": "TRABAJADOR FALSO", "DNI": "00000000T", "AportacionEmpresa": "100,00"}
+        self.latencia = latencia
+        self.variacion = variacion
+        self.tasa_error_cuota = tasa_error_cuota
+        self.errores = list(errores)
+        self.llamadas = 0
+        self.en_vuelo = 0
+        self.max_en_vuelo = 0
+        self._lock = threading.Lock()
+
+    def process_document(self, request):
+        with self._lock:
+            self.llamadas += 1
+            self.en_vuelo += 1
+            self.max_en_vuelo = max(self.max_en_vuelo, self.en_vuelo)
+            error = self.errores.pop(0) if self.errores else None
+        try:
+            time.sleep(self.latencia * (1 + self.variacion * (2 * random.random() - 1)))
+        finally:
+            with self._lock:
+                self.en_vuelo -= 1
+        if error is not None:
+            raise error
+        if random.random() < self.tasa_error_cuota:
+            from google.api_core import exceptions as google_exceptions
+            raise google_exceptions.ResourceExhausted("Cuota simulada agotada")
+        entidades = [SimpleNamespace(type_=t, mention_text=v) for t, v in self.entidades.items()]
+        return SimpleNamespace(document=SimpleNamespace(entities=entidades))
+
+# --- BACKENDS DE NÓMINAS ---
+# Un backend es una función que crea el cliente: cualquier objeto con
+# process_document(request=...) que responda como Document AI.
+
+def _cuenta_de_servicio_en_secrets():
+    # Solo si ya corre Streamlit: la línea de comandos no lo importa por esto
+    if "streamlit" not in sys.modules:
+        return None
+    import streamlit as st
+    try:
+        return dict(st.secrets[SECCION_SECRETS])
+    except (KeyError, FileNotFoundError, st.errors.StreamlitSecretNotFoundError):
+        return None
+
+def _crear_cliente_documentai():
+    from google.cloud import documentai_v1beta3 as documentai
+    credenciales = None
+    if "GOOGLE_APPLICATION_CREDENTIALS" not in os.environ:
+        cuenta = _cuenta_de_servicio_en_secrets()
+        if cuenta:
+            from google.oauth2 import service_account
+            credenciales = service_account.Credentials.from_service_account_info(cuenta)
+    return documentai.DocumentProcessorServiceClient(credentials=credenciales, client_options={"api_endpoint": API_ENDPOINT})
+
+BACKENDS_NOMINAS = {
+    "documentai": _crear_cliente_documentai,
+    "falso": ClienteDocumentAIFalso,
+}
+
+_cliente = None
+_lock_cliente = threading.Lock()
+
+def obtener_cliente():
+    """
+    Cliente del backend BACKEND_NOMINAS. Se crea la primera vez que se
+    procesa una nómina y se reutiliza (es seguro entre hilos).
+    """
+    global _cliente
+    with _lock_cliente:
+        if _cliente is None:
+            _cliente = BACKENDS_NOMINAS[BACKEND_NOMINAS]()
+        return _cliente
 
+def usar_backend(nombre):
+    """
+    Cambia de backend (una clave de BACKENDS_NOMINAS); el cliente se crea al usarlo.
+    """
+    global BACKEND_NOMINAS, _cliente
+    if nombre not in BACKENDS_NOMINAS:
+        raise ValueError(f"Backend de nóminas desconocido: {nombre}")
+    with _lock_cliente:
+        BACKEND_NOMINAS, _cliente = nombre, None
+
+def _version_cache():
+    # Las respuestas de otro backend (p. ej. el falso) no se mezclan en la
+    # caché con las de Document AI
+    version = f"{PROCESSOR_ID}:{PROCESSOR_VERSION}"
+    return version if BACKEND_NOMINAS == "documentai" else f"{BACKEND_NOMINAS}:{version}"
+
+def _con_reintentos(funcion, reintentos=MAX_REINTENTOS, espera_base=None):
+    """
+    Ejecuta `funcion()` reintentando con espera exponencial (y algo de azar)
+    si Document AI devuelve un error de cuota o transitorio.
+    """
+    espera_base = ESPERA_REINTENTO_S if espera_base is None else espera_base
+    for intento in range(reintentos + 1):
+        try:
+            return funcion()
+        except errores_transitorios():
+            if intento == reintentos:
+                raise
+            time.sleep(espera_base * (2 ** intento) * (0.5 + random.random()))
+
+def _extraer_campos(contenido: bytes, cliente=None) -> dict:
+    """
+    Envía una página (bytes del PDF) a Document AI y devuelve los campos
+    extraídos con la suma de AportacionEmpresa.
+    """
     request = {
         "name": processor_name,
         "raw_document": {"content": contenido, "mime_type": "application/pdf"}
     }
-    resultado = client.process_document(request=request)
+    resultado = _con_reintentos(lambda: (cliente or obtener_cliente()).process_document(request=request))
     doc = resultado.document
 
     # Diccionario de campos a extraer
     campos = {
-        "Archivo": os.path.basename(ruta_pdf),
+        "Archivo": "",
         "Nombre": "",
         "DNI": "",
         "MesNomina": "",
@@ -86,9 +255,8 @@ def procesar_documento(ruta_pdf: str) -> dict:
             trozos = valor.replace("\n", " ").split()
             for t in trozos:
                 try:
-                   # Quita puntos de miles y convierte coma decimal
-                    t_limpio = t.replace(".", "").replace(",", ".")
-                    campos["AportacionEmpresa"] += float(t_limpio)
+                    # Quita puntos de miles y convierte coma decimal
+                    campos["AportacionEmpresa"] += importe_es(t)
                 except ValueError:
                     continue
         elif tipo in campos:
@@ -97,34 +265,112 @@ def procesar_documento(ruta_pdf: str) -> dict:
     campos["AportacionEmpresa"] = f"{campos['AportacionEmpresa']:.2f}"
     return campos
 
+_lock_medida = threading.Lock()
+
+def medida_nominas():
+    """
+    Dict vacío de contadores para pasar como `medida` a procesar_pagina y compañía.
+    """
+    return {"paginas": 0, "bytes": 0, "llamadas_api": 0, "aciertos_cache": 0, "segundos_api": 0.0}
+
+def procesar_pagina(nombre: str, contenido: bytes, cliente=None, medida=None) -> dict:
+    """
+    Procesa una página (bytes de un PDF de una sola página) con Document AI y
+    devuelve un diccionario con los campos extraídos y suma de AportacionEmpresa.
+    Las respuestas se cachean por hash de la página + procesador, así que
+    una página ya vista no vuelve a llamar a la API.
+    Con `medida` (ver medida_nominas) se cuentan páginas, bytes, llamadas a
+    la API, aciertos de caché y segundos esperando a la API.
+    """
+    if medida is None:
+        campos = extraer_con_cache("nominas", _version_cache(), contenido, lambda: _extraer_campos(contenido, cliente))
+    else:
+        espera = []
+        def extraer():
+            inicio = time.perf_counter()
+            try:
+                return _extraer_campos(contenido, cliente)
+            finally:
+                espera.append(time.perf_counter() - inicio)
+        campos = extraer_con_cache("nominas", _version_cache(), contenido, extraer)
+        with _lock_medida:
+            medida["paginas"] += 1
+            medida["bytes"] += len(contenido)
+            medida["llamadas_api"] += len(espera)
+            medida["aciertos_cache"] += 1 - len(espera)
+            medida["segundos_api"] += sum(espera)
+    campos["Archivo"] = nombre
+    return campos
+
+def procesar_documento(ruta_pdf: str, cliente=None, medida=None) -> dict:
+    """
+    Procesa un PDF (ruta en disco) usando Document AI y devuelve
+    un diccionario con los campos extraídos y suma de AportacionEmpresa.
+    """
+    with open(ruta_pdf, "rb") as f:
+        contenido = f.read()
+    return procesar_pagina(os.path.basename(ruta_pdf), contenido, cliente, medida)
+
+def _procesar_o_error(pagina, cliente, medida, capturar_errores):
+    try:
+        return procesar_pagina(pagina[0], pagina[1], cliente, medida)
+    except Exception as e:
+        if not capturar_errores:
+            raise
+        return e
+
+def iterar_documentos(paginas: list[tuple[str, bytes]], max_en_vuelo: int = MAX_EN_VUELO, cliente=None, medida=None,
+                      capturar_errores=False):
+    """
+    Como procesar_documentos, pero entrega cada resultado (en el orden de
+    `paginas`) en cuanto está listo, para ir mostrando el progreso.
+    Con capturar_errores=True una página que falla (ya sin reintentos) no
+    corta la iteración: en su lugar se entrega la excepción.
+    """
+    if max_en_vuelo <= 1 or len(paginas) <= 1:
+        for p in paginas:
+            yield _procesar_o_error(p, cliente, medida, capturar_errores)
+        return
+    with ThreadPoolExecutor(max_workers=max_en_vuelo) as pool:
+        yield from pool.map(lambda p: _procesar_o_error(p, cliente, medida, capturar_errores), paginas)
+
+def procesar_documentos(paginas: list[tuple[str, bytes]], max_en_vuelo: int = MAX_EN_VUELO, cliente=None) -> list[dict]:
+    """
+    Procesa varias páginas (nombre, bytes) con hasta `max_en_vuelo` llamadas
+    simultáneas a Document AI. Los resultados salen en el mismo orden que `paginas`.
+    """
+    return list(iterar_documentos(paginas, max_en_vuelo, cliente))
+
 def procesar_folder(
     input_folder: str = DEFAULT_INPUT_FOLDER,
     split_dir: str = DEFAULT_SPLIT_DIR,
     output_excel: str = DEFAULT_OUTPUT_EXCEL
 ) -> pd.DataFrame:
     """
-    Recorre todos los PDFs de una carpeta, los divide si son multi-página,
-    procesa cada uno y guarda los resultados en un DataFrame.
+    Recorre todos los PDFs de una carpeta, los divide en memoria si son
+    multi-página, procesa cada uno y guarda los resultados en un DataFrame.
     Además exporta el DataFrame a un archivo Excel.
+    (`split_dir` ya no se usa: se conserva por compatibilidad.)
     """
-    resultados = []
-
-    # Asegura existencia de split_dir
-    os.makedirs(split_dir, exist_ok=True)
+    from PyPDF2 import PdfReader
+    trozos = []
 
     for archivo in os.listdir(input_folder):
         if not archivo.lower().endswith(".pdf"):
             continue
         ruta_pdf = os.path.join(input_folder, archivo)
-        reader = PdfReader(ruta_pdf)
-        total_paginas = len(reader.pages)
+        with open(ruta_pdf, "rb") as f:
+            contenido = f.read()
+        reader = PdfReader(io.BytesIO(contenido))
 
         # Si tiene varias páginas, dividir; si no, procesar directo
-        trozos = split_pdf(ruta_pdf, split_dir) if total_paginas > 1 else [ruta_pdf]
+        if len(reader.pages) > 1:
+            trozos.extend(dividir_pdf_en_memoria(ruta_pdf, reader))
+        else:
+            trozos.append((archivo, contenido))
 
-        for pdf_trozo in trozos:
-            datos = procesar_documento(pdf_trozo)
-            resultados.append(datos)
+    # Todas las páginas de todos los archivos comparten el mismo límite de peticiones en vuelo
+    resultados = procesar_documentos(trozos)
 
     df = pd.DataFrame(resultados)
     df.to_excel(output_excel, index=False)
@@ -0,0 +1,264 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Fecha que usamos como "baja" cuando el IDC sigue ACTIVO
+FECHA_ACTIVO = datetime(2099, 1, 1)
+
+
+def dias_del_anio(anio):
+    return 366 if (anio % 4 == 0 and (anio % 100 != 0 or anio % 400 == 0)) else 365
+
+
+def factor_dedicacion(idc, es_aut):
+    ctp_val = idc.ctp
+    return 1.0 if (es_aut or ctp_val in [0, 1000]) else ctp_val / 1000.0
+
+
+def _alta_baja(idc):
+    # Fechas ya leídas por el extractor (baja None si sigue ACTIVO)
+    return idc.alta.toordinal(), (idc.baja or FECHA_ACTIVO).toordinal()
+
+
+def construir_tramos_efectivos(idcs_p, anio):
+    """
+    Convierte los IDCs de un trabajador (ordenados por desde_info) en una línea
+    temporal sin solapes dentro del año. Cada tramo es un diccionario con los
+    días ordinales [ini, fin] y el IDC vigente (el último que cubre el tramo),
+    o None si ningún IDC informa esos días.
+    """
+    ini_anio = datetime(anio, 1, 1).toordinal()
+    fin_anio = ini_anio + dias_del_anio(anio) - 1
+
+    periodos = [(i.desde_info.toordinal(), i.hasta_info.toordinal(), i) for i in idcs_p]
+
+    cortes = {ini_anio, fin_anio + 1}
+    for desde, hasta, _ in periodos:
+        if ini_anio <= desde <= fin_anio: cortes.add(desde)
+        if ini_anio <= hasta + 1 <= fin_anio: cortes.add(hasta + 1)
+    cortes = sorted(cortes)
+
+    tramos = []
+    for ini, sig in zip(cortes, cortes[1:]):
+        # Dentro de un tramo elemental la vigencia no cambia: basta con mirar su primer día
+        vig = next((i for desde, hasta, i in reversed(periodos) if desde <= ini <= hasta), None)
+        if tramos and tramos[-1]['idc'] is vig:
+            tramos[-1]['fin'] = sig - 1
+        else:
+            tramos.append({'ini': ini, 'fin': sig - 1, 'idc': vig})
+    return tramos
+
+
+# =========================
+# MODO LOTE: MATRIZ DÍAS x TRABAJADORES
+# =========================
+
+def obtener_tipo_desempleo(codigo_contrato):
+    grupo_5_5 = ["100", "109", "130", "139", "150", "189", "200", "209", "230", "250", "289", "300", "389"]
+    grupo_6_7 = ["401", "402", "410", "421", "430", "441", "450", "501", "502", "510", "530", "541"]
+    
+    if str(codigo_contrato) in grupo_5_5:
+        return 5.5
+    elif str(codigo_contrato) in grupo_6_7:
+        return 6.7
+    return 0.0
+
+
+def construir_matriz_horas(raw_idc, anios):
+    """
+    Recorre los IDCs una sola vez y construye, para todos los años pedidos, una
+    matriz días x trabajadores con el factor de dedicación de cada día de alta,
+    más las máscaras de alta, IT y hueco. Cualquier escenario (año, horas de
+    convenio, tipos de cotización) se resuelve después con reducciones sobre
+    estas matrices, sin volver a tocar los registros.
+    """
+    anios = sorted(set(anios))
+    columnas, total_dias = {}, 0
+    for anio in anios:
+        columnas[anio] = (total_dias, dias_del_anio(anio))
+        total_dias += dias_del_anio(anio)
+
+    idcs_por_nombre = defaultdict(list)
+    for r in raw_idc:
+        idcs_por_nombre[r.nombre].append(r)
+    nombres = list(idcs_por_nombre)
+
+    # Días en filas y trabajadores en columnas: cada día es un vector contiguo
+    factor = np.zeros((total_dias, len(nombres)))
+    alta = np.zeros((total_dias, len(nombres)), dtype=bool)
+    it = np.zeros((total_dias, len(nombres)), dtype=bool)
+    hueco = np.zeros((total_dias, len(nombres)), dtype=bool)
+    info = []
+
+    for w, nombre in enumerate(nombres):
+        idcs_p = sorted(idcs_por_nombre[nombre], key=lambda x: x.desde_info)
+        es_aut = idcs_p[0].es_autonomo
+        ini_contrato = idcs_p[0].inicio_contrato.toordinal()
+        ultimo_ctp = idcs_p[-1].ctp
+
+        info.append({
+            "Nombre": nombre,
+            "DNI": idcs_p[0].dni_trabajador,
+            "CIF Empresa": idcs_p[0].nif_empresa,
+            "Empresa": idcs_p[0].empresa,
+            "Es_Autonomo": es_aut,
+            "Contrato": idcs_p[0].tipo_contrato,
+            "Inicio Contrato": idcs_p[0].inicio_contrato.strftime("%d-%m-%Y"),
+            "Dedicación": "100%" if (es_aut or ultimo_ctp in [0, 1000]) else f"{(ultimo_ctp/10):.2f}%",
+        })
+
+        for anio in anios:
+            col0 = columnas[anio][0] - datetime(anio, 1, 1).toordinal()
+
+            for tramo in construir_tramos_efectivos(idcs_p, anio):
+                vig = tramo['idc']
+
+                if vig is None:
+                    ini = max(tramo['ini'], ini_contrato)
+                    if ini <= tramo['fin']:
+                        hueco[col0 + ini:col0 + tramo['fin'] + 1, w] = True
+                    continue
+
+                if vig.alta is None:
+                    continue  # alta o baja ilegibles en el IDC
+                f_a, f_b = _alta_baja(vig)
+
+                ini, fin = max(tramo['ini'], f_a), min(tramo['fin'], f_b)
+                if ini > fin:
+                    continue
+
+                alta[col0 + ini:col0 + fin + 1, w] = True
+                factor[col0 + ini:col0 + fin + 1, w] = factor_dedicacion(vig, es_aut)
+
+                if not es_aut:
+                    for a, b in vig.tramos_it:
+                        a, b = max(a.toordinal(), ini), min(b.toordinal(), fin)
+                        if a <= b:
+                            it[col0 + a:col0 + b + 1, w] = True
+
+    return {
+        "anios": anios,
+        "columnas": columnas,
+        "nombres": nombres,
+        "posiciones": {n: w for w, n in enumerate(nombres)},
+        "info": info,
+        "factor": factor,
+        "alta": alta,
+        "it": it,
+        "hueco": hueco,
+    }
+
+
+def _suma_secuencial(filas):
+    # Acumula día a día (vectorizado por trabajadores) para reproducir el redondeo del bucle diario
+    total = np.zeros(filas.shape[1])
+    for fila in filas:
+        total += fila
+    return total
+
+
+def metricas_escenario(matriz, anio, h_conv, columnas=None):
+    """
+    Reduce la matriz para un año y unas horas de convenio. Devuelve arrays
+    alineados con `columnas` (posiciones de trabajador; todos por defecto).
+    """
+    col0, n_dias = matriz['columnas'][anio]
+    if columnas is None:
+        columnas = slice(None)
+    filas = slice(col0, col0 + n_dias)
+
+    v_h_d = h_conv / n_dias
+    factor = matriz['factor'][filas, columnas]
+    alta = matriz['alta'][filas, columnas]
+    it = matriz['it'][filas, columnas]
+
+    horas_dia = v_h_d * factor
+    dias_alta = alta.sum(axis=0)
+    primer = alta.argmax(axis=0)
+    ultimo = n_dias - 1 - alta[::-1].argmax(axis=0)
+
+    return {
+        "dias_alta": dias_alta,
+        "dias_it": it.sum(axis=0),
+        "horas_teoricas": _suma_secuencial(horas_dia),
+        "horas_it": _suma_secuencial(np.where(it, horas_dia, 0.0)),
+        "primer_dia": primer,
+        "ultimo_dia": ultimo,
+        "hay_hueco": matriz['hueco'][filas, columnas].any(axis=0),
+    }
+
+
+def tabla_idc(matriz, anio, h_conv, tipo_general, seleccion=None,
+              emp_manual="", cif_manual="", tipo_desempleo=obtener_tipo_desempleo):
+    """
+    Tabla resumen del IDC (misma forma que la pestaña IDC) para un escenario.
+    `tipo_desempleo` puede ser una función o un diccionario contrato -> tipo.
+    El DNI se devuelve tal cual viene del IDC, sin normalizar.
+    """
+    if seleccion is None:
+        seleccion = matriz['nombres']
+    posiciones = [matriz['posiciones'][n] for n in seleccion if n in matriz['posiciones']]
+    if not posiciones:
+        return pd.DataFrame()
+
+    m = metricas_escenario(matriz, anio, h_conv, posiciones)
+    inicio_anio = datetime(anio, 1, 1)
+    if isinstance(tipo_desempleo, dict):
+        tipo_desempleo = lambda c, tabla=tipo_desempleo: tabla.get(str(c), 0.0)
+
+    filas = []
+    for k, w in enumerate(posiciones):
+        if m['dias_alta'][k] == 0:
+            continue
+        info = matriz['info'][w]
+        es_aut = info['Es_Autonomo']
+        tipo_des_auto = tipo_desempleo(info['Contrato'])
+        h_t, h_i = float(m['horas_teoricas'][k]), float(m['horas_it'][k])
+
+        filas.append({
+            "Nombre": info['Nombre'],
+            "DNI": info['DNI'],
+            "CIF Empresa": cif_manual if es_aut else info['CIF Empresa'],
+            "Empresa": emp_manual if es_aut else info['Empresa'],
+            "Estado": "⚠️ INCOMPLETO" if m['hay_hueco'][k] else "✅ OK",
+            "Contrato": info['Contrato'],
+            "Inicio Contrato": info['Inicio Contrato'],
+            "Inicio Auditado": (inicio_anio + timedelta(days=int(m['primer_dia'][k]))).strftime("%d-%m-%Y"),
+            "Fin Auditado": (inicio_anio + timedelta(days=int(m['ultimo_dia'][k]))).strftime("%d-%m-%Y"),
+            "Días IT": int(m['dias_it'][k]),
+            "Horas Teóricas": round(h_t, 2),
+            "Horas IT": round(h_i, 2),
+            "Horas Efectivas": round(h_t - h_i, 2),
+            "Dedicación": info['Dedicación'],
+            "Cotiz. Gral (%)": tipo_general,
+            "Cotiz. Desempleo (%)": tipo_des_auto,
+            "Total Cotización (%)": round(tipo_general + tipo_des_auto, 2)
+        })
+    return pd.DataFrame(filas)
+
+
+def resumen_escenarios(matriz, escenarios, seleccion=None):
+    """
+    Totales por escenario. Cada escenario es un dict con 'anio', 'h_conv',
+    'tipo_general' y opcionalmente 'tipo_desempleo'.
+    """
+    filas = []
+    for esc in escenarios:
+        df = tabla_idc(
+            matriz, esc['anio'], esc['h_conv'], esc['tipo_general'], seleccion,
+            tipo_desempleo=esc.get('tipo_desempleo', obtener_tipo_desempleo)
+        )
+        filas.append({
+            "Año": esc['anio'],
+            "Horas Convenio": esc['h_conv'],
+            "Cotiz. Gral (%)": esc['tipo_general'],
+            "Trabajadores": len(df),
+            "Horas Teóricas": round(df['Horas Teóricas'].sum(), 2) if not df.empty else 0.0,
+            "Horas IT": round(df['Horas IT'].sum(), 2) if not df.empty else 0.0,
+            "Horas Efectivas": round(df['Horas Efectivas'].sum(), 2) if not df.empty else 0.0,
+            "Días IT": int(df['Días IT'].sum()) if not df.empty else 0,
+            "Cotización media (%)": round(df['Total Cotización (%)'].mean(), 2) if not df.empty else 0.0,
+        })
+    return pd.DataFrame(filas)
@@ -0,0 +1,108 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    _TIPO_TEXTO = "string[pyarrow]"
+except ImportError:
+    _TIPO_TEXTO = object
+
+# Conversión de importes en formato español ("1.234,56") y normalización de
+# DNI/NIE/CIF, en versión escalar (un valor) y vectorizada (columna entera).
+# Las versiones de columna dan exactamente lo mismo que aplicar la escalar
+# fila a fila con .apply, pero sin pasar por Python en cada fila.
+
+_NO_NUMERICO = re.compile(r'[^0-9,.]')
+# Lo que float() acepta con seguridad una vez quitados puntos y comas; el resto
+# (vacíos, "N/A", textos raros...) se resuelve con la función escalar
+_FLOAT_SIMPLE = r'-?(?:[0-9]+\.?[0-9]*|\.[0-9]+)'
+_ASCII_IMPRIMIBLE = r'[ -~]*'
+
+
+# --- ESCALARES ---
+
+def importe_es(texto):
+    """
+    "1.234,56" -> 1234.56. Lanza ValueError si no es un número.
+    """
+    return float(texto.replace('.', '').replace(',', '.'))
+
+
+def limpiar_monto(texto):
+    """
+    Quita todo lo que no sea dígito, punto o coma y convierte. 0.0 si no se puede.
+    """
+    if not texto: return 0.0
+    limpio = _NO_NUMERICO.sub('', texto)
+    if not limpio: return 0.0
+    try:
+        return importe_es(limpio)
+    except ValueError:
+        return 0.0
+
+
+def limpiar_valor_numerico(valor):
+    if pd.isna(valor) or valor == "" or valor == "N/A": return 0.0
+    if isinstance(valor, (int, float)): return float(valor)
+    s = str(valor).strip().replace('.', '').replace(',', '.')
+    try: return float(s)
+    except ValueError: return 0.0
+
+
+def normalizar_dni_final(valor):
+    if pd.isna(valor) or str(valor).strip() == "": return None
+    s = "".join(filter(str.isalnum, str(valor))).upper()
+    return s[-9:] if len(s) >= 9 else s
+
+
+# --- COLUMNAS (pandas) ---
+
+def _separar_textos(serie):
+    """
+    Separa los valores que son texto ASCII imprimible (la inmensa mayoría)
+    del resto. Con esos caracteres las operaciones .str dan lo mismo con
+    pyarrow que con Python, así que pueden ir por la vía rápida; el resto
+    (nulos, números, acentos...) se trata con la función escalar.
+    Devuelve (valores, posiciones de los textos, textos como Series, posiciones del resto).
+    """
+    valores = serie.to_numpy(dtype=object)
+    es_texto = np.fromiter((type(v) is str for v in valores), dtype=bool, count=len(valores))
+    textos = pd.Series(valores[es_texto], dtype=_TIPO_TEXTO)
+    imprimible = textos.str.fullmatch(_ASCII_IMPRIMIBLE).to_numpy(dtype=bool)
+    pos_textos = np.flatnonzero(es_texto)
+    resto = np.sort(np.concatenate([np.flatnonzero(~es_texto), pos_textos[~imprimible]]))
+    return valores, pos_textos[imprimible], textos[imprimible].reset_index(drop=True), resto
+
+
+def limpiar_columna_numerica(serie):
+    """
+    Versión de columna de limpiar_valor_numerico.
+    """
+    if pd.api.types.is_bool_dtype(serie.dtype) or pd.api.types.is_numeric_dtype(serie.dtype):
+        return serie.astype(float).fillna(0.0)
+
+    resultado = np.zeros(len(serie))
+    valores, posiciones, textos, resto = _separar_textos(serie)
+    limpios = textos.str.strip().str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    simples = limpios.str.fullmatch(_FLOAT_SIMPLE).to_numpy(dtype=bool)
+    resultado[posiciones[simples]] = limpios[simples].astype(float).to_numpy()
+    # Vacíos, "N/A", números ya convertidos, textos raros...: función escalar
+    otros = np.concatenate([posiciones[~simples], resto])
+    resultado[otros] = [limpiar_valor_numerico(v) for v in valores[otros]]
+    return pd.Series(resultado, index=serie.index, name=serie.name)
+
+
+def normalizar_dni_columna(serie):
+    """
+    Versión de columna de normalizar_dni_final (None si el valor está vacío).
+    """
+    resultado = np.full(len(serie), None, dtype=object)
+    valores, posiciones, textos, resto = _separar_textos(serie)
+    vacios = textos.str.strip().eq("").to_numpy(dtype=bool)
+    # En ASCII, "alfanumérico" es exactamente [0-9A-Za-z]
+    limpios = textos[~vacios].str.replace(r'[^0-9A-Za-z]+', '', regex=True).str.upper().str[-9:]
+    resultado[posiciones[~vacios]] = limpios.to_numpy(dtype=object)
+    resultado[resto] = [normalizar_dni_final(v) for v in valores[resto]]
+    return pd.Series(resultado, index=serie.index, name=serie.name)
@@ -0,0 +1,154 @@
+import io
+import os
+import resource
+import time
+
+# Lectura página a página común a los extractores (IDC, 190, RNT).
+# pdfplumber guarda en cada página su layout y sus objetos hasta cerrar el PDF:
+# en un RNT de miles de páginas eso son gigas. Aquí cada página se libera
+# en cuanto se ha sacado su texto, así que la memoria no crece con el documento.
+# pdfplumber/pdfminer se importan al abrir el primer PDF, no al arrancar la app.
+
+
+def abrir_pdf(origen):
+    """
+    Abre una ruta, un archivo abierto/BytesIO o bytes.
+    """
+    import pdfplumber
+    if isinstance(origen, (bytes, bytearray, memoryview)):
+        return pdfplumber.open(io.BytesIO(origen))
+    return pdfplumber.open(origen)
+
+
+def contar_paginas(origen):
+    with abrir_pdf(origen) as pdf:
+        return len(pdf.pages)
+
+
+def rss_actual_mb():
+    """
+    Memoria residente del proceso en MB. Fuera de Linux (sin /proc) devuelve
+    el pico del proceso, que es lo más parecido que da `resource`.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS lo da en bytes, Linux en KB
+        return pico / (1024 * 1024) if pico > 1 << 32 else pico / 1024
+
+
+def rss_grupo_mb(pid):
+    """
+    RSS en MB de un proceso y de todos sus descendientes (p. ej. los procesos
+    de bloques de páginas del RNT). None si no hay /proc para medirlo.
+    """
+    tamano_pagina = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    total, pendientes, medido = 0.0, [pid], False
+    while pendientes:
+        actual = pendientes.pop()
+        try:
+            with open(f"/proc/{actual}/statm") as f:
+                total += int(f.read().split()[1]) * tamano_pagina
+            medido = True
+            with open(f"/proc/{actual}/task/{actual}/children") as f:
+                pendientes.extend(int(hijo) for hijo in f.read().split())
+        except (OSError, ValueError, IndexError):
+            # Ha terminado entre medias o no hay /proc
+            continue
+    return total if medido else None
+
+
+# Si un proceso vigilado (ver ejecutor_lote) pone aquí un multiprocessing.Value,
+# iterar_textos va dejando en él la página que está leyendo (empezando en 1)
+_pagina_en_curso = None
+
+
+def vigilar_paginas(valor):
+    global _pagina_en_curso
+    _pagina_en_curso = valor
+
+
+def _cargar_solo_texto(page):
+    # pdfplumber convierte a dict todos los objetos de la página (curvas y
+    # rectángulos de las tablas incluidos) aunque el texto solo use los
+    # caracteres. Dejamos precargados únicamente los caracteres, en el mismo orden.
+    # Tira de atributos internos (page._objects, layout._objs; pdfplumber va
+    # acotado en requirements.txt): si una versión los cambia, la página se
+    # lee entera como antes en vez de fallar.
+    from pdfminer.layout import LTChar, LTContainer
+
+    def caracteres(objetos):
+        for obj in objetos:
+            if isinstance(obj, LTContainer):
+                yield from caracteres(obj._objs)
+            elif isinstance(obj, LTChar):
+                yield obj
+
+    try:
+        precargados = [page.process_object(obj) for obj in caracteres(page.layout._objs)]
+    except (AttributeError, TypeError):
+        return
+    page._objects = {"char": precargados}
+
+
+def iterar_textos(origen, inicio=0, fin=None, solo_texto=True, medida=None):
+    """
+    Genera (número de página empezando en 0, texto) para las páginas
+    [inicio, fin) (hasta el final si fin es None). El texto es "" si la página
+    no tiene. Cada página se cierra (page.close()) nada más leerla.
+
+    Si se pasa un dict en `medida`, se rellena con las páginas leídas, el
+    RSS inicial y pico (MB) durante la lectura y los segundos que se van en
+    sacar el texto con pdfplumber ("segundos_texto") y en analizarlo quien
+    recorre el generador ("segundos_analisis").
+    """
+    if medida is not None:
+        medida.update(paginas=0, rss_inicial_mb=rss_actual_mb(), segundos_texto=0.0, segundos_analisis=0.0)
+        medida["rss_pico_mb"] = medida["rss_inicial_mb"]
+        reloj = time.perf_counter()
+
+    with abrir_pdf(origen) as pdf:
+        paginas = pdf.pages
+        if fin is None:
+            fin = len(paginas)
+        for num_pagina in range(inicio, fin):
+            page = paginas[num_pagina]
+            if _pagina_en_curso is not None:
+                _pagina_en_curso.value = num_pagina + 1
+            try:
+                if solo_texto:
+                    _cargar_solo_texto(page)
+                texto = page.extract_text() or ""
+            finally:
+                page.close()
+
+            if medida is not None:
+                medida["paginas"] += 1
+                medida["rss_pico_mb"] = max(medida["rss_pico_mb"], rss_actual_mb())
+                ahora = time.perf_counter()
+                medida["segundos_texto"] += ahora - reloj
+
+            yield num_pagina, texto
+
+            if medida is not None:
+                reloj = time.perf_counter()
+                medida["segundos_analisis"] += reloj - ahora
+
+
+def unir_medidas(medidas):
+    """
+    Junta las medidas de varios bloques de páginas de un mismo archivo (leídos
+    en procesos distintos): suma páginas y segundos y se queda con el mayor pico.
+    """
+    medidas = [m for m in medidas if m]
+    if not medidas:
+        return {}
+    return {
+        "paginas": sum(m["paginas"] for m in medidas),
+        "rss_inicial_mb": max(m["rss_inicial_mb"] for m in medidas),
+        "rss_pico_mb": max(m["rss_pico_mb"] for m in medidas),
+        "segundos_texto": sum(m["segundos_texto"] for m in medidas),
+        "segundos_analisis": sum(m["segundos_analisis"] for m in medidas),
+    }
@@ -0,0 +1,343 @@
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
+
+import pandas as pd
+
+from cache_extractores import huella_contenido
+from clasificador_pdf import clasificar_lote
+from extractor_nominas import iterar_documentos, dividir_pdf_en_memoria, medida_nominas
+from ejecutor_lote import procesar_lote, PROCESOS_POR_DEFECTO, LIMITE_SEGUNDOS, LIMITE_MB
+from motor_horas import construir_matriz_horas, tabla_idc
+from normalizacion import normalizar_dni_columna, limpiar_columna_numerica
+from cuadro_mando import construir_cuadro, claves_disponibles, filtrar_cuadro
+from registros import BaseRNTAnual, Perceptor190, tabla_registros
+
+# Motor de la auditoría sin interfaz: extracción de todos los documentos,
+# tablas de cada pestaña y tabla unificada. Lo usan la app de Streamlit
+# (super_extractor) y la línea de comandos (auditoria_cli).
+
+ANIOS_AUDITORIA = [2026, 2025, 2024, 2023]
+TIPOS_DOCUMENTO = ["idc", "190", "nominas", "rnt"]
+
+
+@contextmanager
+def cronometro(tiempos, etapa):
+    """
+    Suma a tiempos[etapa] los segundos que tarda el bloque (si tiempos no es None).
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if tiempos is not None:
+            tiempos[etapa] = tiempos.get(etapa, 0.0) + time.perf_counter() - inicio
+
+
+def lote_vacio():
+    return {"raw_idc": [], "raw_190": [], "raw_nom": [], "raw_rnt_det": [], "raw_rnt_res": [],
+            "errores": [], "avisos": [], "memoria": [], "rendimiento": [], "nuevos": 0, "eliminados": 0,
+            "cache": {"aciertos": 0, "fallos": 0}}
+
+
+def pdfs_de_carpeta(carpeta):
+    if not carpeta:
+        return []
+    return sorted(
+        os.path.join(carpeta, f) for f in os.listdir(carpeta)
+        if f.lower().endswith(".pdf")
+    )
+
+
+def archivos_desde_carpetas(carpetas):
+    """
+    carpetas: {tipo: ruta} con tipo en TIPOS_DOCUMENTO o "auto" (documentos
+    mezclados). Devuelve la lista de archivos (tipo, nombre, bytes); los de
+    "auto" van con tipo None para asignar_tipos.
+    """
+    archivos = []
+    for tipo in TIPOS_DOCUMENTO + ["auto"]:
+        for ruta in pdfs_de_carpeta(carpetas.get(tipo)):
+            with open(ruta, "rb") as f:
+                archivos.append((None if tipo == "auto" else tipo, os.path.basename(ruta), f.read()))
+    return archivos
+
+
+def asignar_tipos(archivos, procesos=1, tiempos=None):
+    """
+    Detecta el tipo de cada PDF por su primera página (clasificador_pdf).
+    Los de tipo None (zona de subida única) toman el detectado y los que se
+    han subido en el cargador de otro tipo se pasan al suyo solo si lo ha
+    reconocido el título o una marca propia del informe. Devuelve (archivos con tipo, avisos, errores); los que no se
+    reconocen quedan fuera, en errores.
+    """
+    with cronometro(tiempos, "clasificación"):
+        detectados = clasificar_lote([contenido for _, _, contenido in archivos], int(procesos))
+    asignados, avisos, errores = [], [], []
+    for (tipo, nombre, contenido), (detectado, propia) in zip(archivos, detectados):
+        if tipo is None:
+            if detectado is None:
+                errores.append({"Archivo": nombre, "Tipo": "?", "Motivo": "tipo desconocido", "Página": None,
+                                "Error": "No se reconoce el tipo de documento: súbelo en su cargador"})
+                continue
+            tipo = detectado
+        elif propia and detectado != tipo:
+            avisos.append({"Archivo": nombre, "Subido como": tipo, "Procesado como": detectado})
+            tipo = detectado
+        asignados.append((tipo, nombre, contenido))
+    return asignados, avisos, errores
+
+
+def clave_archivo(tipo, nombre, contenido):
+    # Un archivo ya procesado se reconoce por tipo, nombre y hash del contenido
+    return (tipo, nombre, huella_contenido(contenido))
+
+
+def _paginas_nomina(nombre, contenido):
+    buffer = io.BytesIO(contenido)
+    buffer.name = nombre
+    return list(dividir_pdf_en_memoria(buffer))
+
+
+def _fallo_nomina(nombre, error, pagina, paginas):
+    # Mismos campos que un fallo de procesar_lote
+    return {"tipo": "nominas", "nombre": nombre, "datos": None, "error": f"{type(error).__name__}: {error}",
+            "motivo": "error", "pagina": pagina, "paginas": paginas}
+
+
+def ensamblar_registros(claves, procesados, anio_190=2024):
+    """
+    Lote (ver lote_vacio) con los registros crudos de los archivos `claves`
+    que ya estén en `procesados`, en el orden de `claves`.
+    """
+    lote = lote_vacio()
+    for clave in claves:
+        if clave not in procesados:
+            continue
+        tipo, datos = clave[0], procesados[clave]
+        if tipo == "idc":
+            if datos: lote["raw_idc"].extend(datos)
+        elif tipo == "190":
+            lote["raw_190"].extend(replace(d, anio_190=anio_190) for d in datos)
+        elif tipo == "rnt":
+            det, res, errs = datos
+            if det: lote["raw_rnt_det"].extend(det)
+            if res: lote["raw_rnt_res"].extend(res)
+        elif tipo == "nominas":
+            lote["raw_nom"].extend(datos)
+    return lote
+
+
+def _suma(medidas, campo):
+    return round(sum(m.get(campo) or 0 for m in medidas), 3)
+
+
+def rendimiento_por_tipo(archivos, pendientes, resultados, medida_nom=None, segundos_nom=0.0):
+    """
+    Una fila por tipo de documento con lo que ha costado extraerlo: archivos
+    (sin cambios, de caché y extraídos), páginas, registros, MB leídos,
+    segundos (suma por archivo), de ellos cuántos en sacar el texto del PDF y
+    cuántos en analizarlo, y para las nóminas llamadas y espera de la API.
+    """
+    filas = []
+    for tipo in TIPOS_DOCUMENTO:
+        total = sum(1 for archivo in archivos if archivo[0] == tipo)
+        if not total:
+            continue
+        nuevos = sum(1 for _, archivo in pendientes if archivo[0] == tipo)
+        fila = {"Tipo": tipo, "Archivos": total, "Sin cambios": total - nuevos}
+        if tipo == "nominas":
+            m = medida_nom or {}
+            fila.update({"De caché": m.get("aciertos_cache", 0), "Páginas": m.get("paginas", 0),
+                         "Registros": m.get("paginas", 0), "MB leídos": round(m.get("bytes", 0) / 2**20, 2),
+                         "Segundos": round(segundos_nom, 3), "Texto PDF (s)": None, "Análisis (s)": None,
+                         "Llamadas API": m.get("llamadas_api", 0), "Espera API (s)": round(m.get("segundos_api", 0.0), 3)})
+        else:
+            propios = [r for r in resultados if r['tipo'] == tipo]
+            medidas = [r['medida'] for r in propios if r['medida']]
+            fila.update({"De caché": sum(1 for r in propios if r['desde_cache']), "Páginas": int(_suma(medidas, "paginas")),
+                         "Registros": int(_suma(medidas, "registros")), "MB leídos": round(_suma(medidas, "bytes") / 2**20, 2),
+                         "Segundos": _suma(medidas, "segundos"), "Texto PDF (s)": _suma(medidas, "segundos_texto"),
+                         "Análisis (s)": _suma(medidas, "segundos_analisis"), "Llamadas API": None, "Espera API (s)": None})
+        filas.append(fila)
+    return filas
+
+
+def informe_rendimiento(tiempos, lote):
+    """
+    Desglose de una ejecución en forma serializable a JSON: segundos por
+    etapa y filas de rendimiento_por_tipo.
+    """
+    return {
+        "etapas": [{"Etapa": etapa, "Segundos": round(segundos, 3)} for etapa, segundos in (tiempos or {}).items()],
+        "documentos": lote.get("rendimiento", []),
+    }
+
+
+def extraer_documentos(archivos, procesos=PROCESOS_POR_DEFECTO, anio_190=2024, procesados=None, tiempos=None,
+                       claves=None, al_terminar=None, limite_s=LIMITE_SEGUNDOS, limite_mb=LIMITE_MB):
+    """
+    archivos: [(tipo, nombre, bytes)] con tipo en TIPOS_DOCUMENTO, en el orden
+    en que deben quedar los registros.
+
+    IDCs, 190s y RNTs se extraen en `procesos` procesos (pdfplumber usa CPU) y
+    a la vez las nóminas en un hilo aparte (esperas de Document AI).
+    `procesados` ({clave_archivo: datos}) son los de una pasada anterior: esos
+    archivos no se vuelven a extraer y los que ya no están se descartan.
+    `claves` son las clave_archivo de `archivos` si ya se han calculado.
+    `al_terminar(clave, resultado)` se llama al acabar cada archivo extraído
+    (resultado: {tipo, nombre, datos, error, paginas}).
+    Cada IDC, 190 o RNT se lee en un proceso aislado con `limite_s` segundos
+    y `limite_mb` MB como mucho (ver procesar_lote).
+
+    Devuelve (lote, procesados actualizados). El lote (ver lote_vacio) trae los
+    registros crudos de todos los archivos, los errores y la memoria de los
+    extraídos ahora, cuántos archivos eran nuevos o se han quitado y los
+    aciertos y fallos de la caché de extracción en esta llamada (archivos
+    IDC/190/RNT y páginas de nómina). Con
+    `tiempos` trae además el rendimiento por tipo (rendimiento_por_tipo).
+    """
+    procesados = procesados or {}
+    claves = claves or [clave_archivo(*archivo) for archivo in archivos]
+    vigentes = {clave: procesados[clave] for clave in claves if clave in procesados}
+    pendientes = [(clave, archivo) for clave, archivo in zip(claves, archivos) if clave not in vigentes]
+    nuevos, eliminados = len(pendientes), len(set(procesados) - set(vigentes))
+    errores = []
+
+    def terminado(clave, r):
+        if r['error']:
+            # No se guarda: se volverá a intentar en la siguiente pasada
+            errores.append({"Archivo": r['nombre'], "Tipo": r['tipo'], "Motivo": r['motivo'], "Página": r['pagina'], "Error": r['error']})
+        else:
+            vigentes[clave] = r['datos']
+        if al_terminar: al_terminar(clave, r)
+
+    tareas = [archivo for _, archivo in pendientes if archivo[0] != "nominas"]
+    claves_tareas = [clave for clave, archivo in pendientes if archivo[0] != "nominas"]
+    nominas = []
+    for clave, (tipo, nombre, contenido) in pendientes:
+        if tipo != "nominas":
+            continue
+        try:
+            nominas.append((clave, nombre, _paginas_nomina(nombre, contenido)))
+        except Exception as e:
+            terminado(clave, _fallo_nomina(nombre, e, None, None))
+
+    # Contadores de las nóminas de esta llamada (páginas, aciertos de caché...)
+    medida_nom = medida_nominas()
+    segundos_nom = []
+
+    def extraer_nominas():
+        # Todas las páginas comparten el límite de peticiones en vuelo; cada
+        # archivo se da por terminado al llegar su última página
+        inicio = time.perf_counter()
+        # Una página que falla deja fuera solo su archivo (a la tabla de fallos), no el lote
+        registros = iterar_documentos([p for _, _, paginas in nominas for p in paginas], medida=medida_nom,
+                                      capturar_errores=True)
+        for clave, nombre, paginas in nominas:
+            datos = [next(registros) for _ in paginas]
+            fallo = next(((n, d) for n, d in enumerate(datos, 1) if isinstance(d, Exception)), None)
+            if fallo:
+                terminado(clave, _fallo_nomina(nombre, fallo[1], fallo[0], len(paginas)))
+            else:
+                terminado(clave, {"tipo": "nominas", "nombre": nombre, "datos": datos, "error": None, "paginas": len(paginas)})
+        segundos_nom.append(time.perf_counter() - inicio)
+
+    with cronometro(tiempos, "extracción"):
+        with ThreadPoolExecutor(max_workers=1) as hilo_nominas:
+            futuro_nom = hilo_nominas.submit(extraer_nominas) if nominas else None
+            resultados = procesar_lote(
+                tareas, int(procesos), lambda i, r: terminado(claves_tareas[i], r), limite_s, limite_mb
+            ) if tareas else []
+            if futuro_nom: futuro_nom.result()
+
+    lote = ensamblar_registros(claves, vigentes, anio_190)
+    lote.update(errores=errores, nuevos=nuevos, eliminados=eliminados)
+    # Los de esta llamada, no los de CacheDisco (compartidos por todas las sesiones y trabajos)
+    aciertos = sum(1 for r in resultados if r['desde_cache']) + medida_nom["aciertos_cache"]
+    lote["cache"] = {"aciertos": aciertos, "fallos": len(resultados) + medida_nom["paginas"] - aciertos}
+    lote["memoria"] = [
+        {"Archivo": r['nombre'], "Tipo": r['tipo'], "Páginas": r['paginas'], "RSS pico (MB)": round(r['rss_pico_mb'], 1)}
+        for r in resultados if r['rss_pico_mb'] is not None
+    ]
+    if tiempos is not None:
+        lote["rendimiento"] = rendimiento_por_tipo(archivos, pendientes, resultados, medida_nom, sum(segundos_nom))
+    return lote, vigentes
+
+
+# --- TABLAS DE CADA PESTAÑA ---
+
+def nombres_idc(raw_idc):
+    """
+    Trabajadores seleccionables del IDC (los que no quedaron como DESCONOCIDO).
+    """
+    return sorted({r.nombre for r in raw_idc if "DESCONOCIDO" not in r.nombre})
+
+
+def tabla_idc_final(matriz, anio, h_conv, tipo_general, seleccion=None, emp_manual="", cif_manual=""):
+    df_idc = tabla_idc(matriz, anio, h_conv, tipo_general, seleccion, emp_manual, cif_manual)
+    if not df_idc.empty:
+        df_idc['DNI'] = normalizar_dni_columna(df_idc['DNI'])
+    return df_idc
+
+
+def tabla_190(raw_190):
+    df_190 = tabla_registros(raw_190, Perceptor190)
+    for col in ['Percepciones', 'Retenciones', 'Dinerarias NO IL', 'Especie NO IL']:
+        if col in df_190.columns: df_190[col] = limpiar_columna_numerica(df_190[col])
+
+    col_id = 'NIF' if 'NIF' in df_190.columns else ('DNI' if 'DNI' in df_190.columns else None)
+    if col_id: df_190[col_id] = normalizar_dni_columna(df_190[col_id])
+    return df_190
+
+
+def tabla_rnt(raw_rnt_res):
+    df_rnt = tabla_registros(raw_rnt_res, BaseRNTAnual)
+    if not df_rnt.empty:
+        df_rnt['DNI'] = normalizar_dni_columna(df_rnt['DNI'])
+    return df_rnt
+
+
+def tabla_nominas(raw_nom):
+    df_nom = pd.DataFrame(raw_nom)
+    if 'AportacionEmpresa' in df_nom.columns:
+        # El extractor la devuelve formateada como texto ("1234.56")
+        df_nom['AportacionEmpresa'] = pd.to_numeric(df_nom['AportacionEmpresa'], errors='coerce').fillna(0.0)
+    return df_nom
+
+
+def ejecutar_pipeline(carpetas, anio=ANIOS_AUDITORIA[0], h_conv=1800.0, tipo_general=25.07, anio_190=2024,
+                      emp_manual="", cif_manual="", procesos=PROCESOS_POR_DEFECTO, tiempos=None,
+                      limite_s=LIMITE_SEGUNDOS, limite_mb=LIMITE_MB):
+    """
+    Auditoría completa a partir de carpetas de PDFs ({tipo: ruta}, ver archivos_desde_carpetas).
+    Devuelve (tablas, lote): tablas es {"IDC", "190", "RNT", "Nóminas", "Consolidado"}.
+    """
+    with cronometro(tiempos, "lectura de archivos"):
+        archivos = archivos_desde_carpetas(carpetas)
+    archivos, avisos, errores = asignar_tipos(archivos, procesos, tiempos)
+    lote, _ = extraer_documentos(archivos, procesos, anio_190, tiempos=tiempos, limite_s=limite_s, limite_mb=limite_mb)
+    lote["avisos"], lote["errores"] = avisos, errores + lote["errores"]
+
+    with cronometro(tiempos, "horas IDC"):
+        df_idc = pd.DataFrame()
+        if lote["raw_idc"]:
+            matriz = construir_matriz_horas(lote["raw_idc"], ANIOS_AUDITORIA)
+            df_idc = tabla_idc_final(matriz, anio, h_conv, tipo_general, nombres_idc(lote["raw_idc"]), emp_manual, cif_manual)
+
+    with cronometro(tiempos, "tablas 190/RNT/nóminas"):
+        df_190 = tabla_190(lote["raw_190"])
+        df_rnt = tabla_rnt(lote["raw_rnt_res"])
+        df_nom = tabla_nominas(lote["raw_nom"])
+
+    with cronometro(tiempos, "unificación"):
+        consolidado = pd.DataFrame()
+        if not df_190.empty:
+            cuadro = construir_cuadro(df_idc, df_190, df_nom, df_rnt)
+            consolidado = filtrar_cuadro(cuadro, claves_disponibles(cuadro))
+
+    tablas = {"IDC": df_idc, "190": df_190, "RNT": df_rnt, "Nóminas": df_nom, "Consolidado": consolidado}
+    return tablas, lote
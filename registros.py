@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+from datetime import datetime
+from operator import attrgetter
+from typing import ClassVar
+
+import pandas as pd
+
+# Registros que pasan de los extractores a la app (caché, sesión, almacén).
+# Antes eran diccionarios con las claves repetidas en cada fila y las fechas de
+# alta/baja como texto que el motor de horas volvía a leer cada vez; ahora son
+# dataclasses con __slots__ (sin diccionario por fila), con las fechas ya
+# leídas al extraer y los números como números.
+# COLUMNAS da, en el orden de los campos, el nombre de cada columna en las
+# tablas (los de siempre, así que pestañas, cuadro y almacén no cambian).
+
+
+@dataclass(slots=True)
+class RegistroIDC:
+    nombre: str
+    dni_trabajador: str
+    nif_empresa: str
+    empresa: str
+    ctp: int
+    es_autonomo: bool
+    desde_info: datetime
+    hasta_info: datetime
+    inicio_contrato: datetime
+    tramos_it: tuple     # ((desde, hasta), ...) de las IT del periodo
+    alta: datetime | None  # None: fecha de alta o de baja ilegible (el IDC no cuenta días)
+    baja: datetime | None  # None: sigue ACTIVO
+    tipo_contrato: str
+
+    COLUMNAS: ClassVar[tuple] = (
+        "Nombre", "DNI_Trabajador", "NIF_Empresa", "Empresa", "CTP", "Es_Autonomo",
+        "Desde_Info", "Hasta_Info", "Inicio_Contrato", "Tramos_IT", "Alta", "Baja", "Tipo_Contrato",
+    )
+
+
+@dataclass(slots=True)
+class Perceptor190:
+    archivo: str
+    nif: str
+    nombre: str
+    clave: str
+    subclave: str
+    dinerarias_no_il: float
+    especie_no_il: float
+    dinerarias_il: float
+    especie_il: float
+    anio_190: int | None = None  # lo pone el lote (año del modelo que se audita)
+
+    COLUMNAS: ClassVar[tuple] = (
+        "Archivo", "NIF", "Nombre", "Clave", "Subclave", "Dinerarias NO IL", "Especie NO IL",
+        "Dinerarias IL", "Especie IL", "Año_190",
+    )
+
+
+@dataclass(slots=True)
+class BaseRNTMensual:
+    ipf: str
+    dni: str
+    anio: int
+    mes: int
+    base_cc: float
+    base_at: float
+    base_solidaridad: float
+
+    COLUMNAS: ClassVar[tuple] = ("IPF", "DNI", "Año", "Mes", "Base_CC", "Base_AT", "Base_Solidaridad")
+
+
+@dataclass(slots=True)
+class BaseRNTAnual:
+    dni: str
+    anio: int
+    base_cc_anual: float
+    base_at_anual: float
+    base_solidaridad_anual: float
+
+    COLUMNAS: ClassVar[tuple] = ("DNI", "Año", "Base_CC_Anual", "Base_AT_Anual", "Base_Solidaridad_Anual")
+
+
+def campos(clase):
+    """
+    Pares (atributo, columna) de una clase de registro, en orden.
+    """
+    return list(zip(clase.__slots__, clase.COLUMNAS))
+
+
+def columnas_registros(registros, clase):
+    """
+    {columna: lista de valores} de los registros, campo a campo (sin pasar
+    por un diccionario por fila).
+    """
+    return {columna: list(map(attrgetter(atributo), registros)) for atributo, columna in campos(clase)}
+
+
+def tabla_registros(registros, clase):
+    """
+    DataFrame con una columna por campo. Sin registros, vacío y sin columnas
+    (como pd.DataFrame([]) con los diccionarios de antes).
+    """
+    if not registros:
+        return pd.DataFrame()
+    return pd.DataFrame(columnas_registros(registros, clase))
@@ -1,126 +1,288 @@
-import pdfplumber
+import os
 import re
 import unicodedata
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
+from cache_extractores import leer_contenido
+from normalizacion import importe_es
+from paginas_pdf import iterar_textos, contar_paginas, unir_medidas
+from registros import BaseRNTAnual, BaseRNTMensual
 
-def _parse_importe(s: str) -> float:
-    return float(s.replace(".", "").replace(",", "."))
+VERSION_EXTRACTOR = 2
+
+
+# Patrones precompilados (antes se construían/buscaban en cada línea)
+_PATRON_PERIODO = re.compile(r"Periodo de liquidación\s+(\d{2})/(\d{4})")
+_PATRON_TRABAJADOR = re.compile(r"(\d{11,12})\s+(\d{9,10}[A-Z])")
+
+# Importe al final de una línea. Cualquier coincidencia de r"(importe)\s*$"
+# cae dentro del último token (separado por espacios) de la línea, así que
+# solo se busca en ese token, y solo si acaba en ",dd".
+_PATRON_IMPORTE_FINAL = re.compile(r"([\d]{1,3}(?:\.[\d]{3})*,[\d]{2})$")
+_PATRON_IMPORTE_PURO = re.compile(r"[\d]{1,3}(?:\.[\d]{3})*,[\d]{2}")
+
+# Un único patrón que localiza en la página normalizada todas las líneas que
+# pueden hacer algo (inicio de trabajador, totales o alguna base). Las líneas
+# sin coincidencia no cambian el estado y se saltan sin mirarlas.
+_PATRON_LINEA_RELEVANTE = re.compile(
+    r"^\d{11,12}[^\S\n]+\d{9,10}[A-Z]"
+    r"|SUMA DE BASES|BASE DE CONTINGENCIAS COMUNES|BASE DE ACCIDENTES DE TRABAJO"
+    r"|COTIZACION ADIC|SOLIDARIDAD",
+    re.MULTILINE
+)
+
+
+def _importe_final(linea):
+    partes = linea.rsplit(None, 1)
+    if not partes or partes[-1][-3:-2] != ",":
+        return None
+    m = _PATRON_IMPORTE_FINAL.search(partes[-1])
+    return importe_es(m.group(1)) if m else None
+
+
+def _importe_puro(linea):
+    candidata = linea.strip()
+    if candidata[-3:-2] != "," or not _PATRON_IMPORTE_PURO.fullmatch(candidata):
+        return None
+    return importe_es(candidata)
 
 
 def _extraer_importe_en_linea_o_siguiente(lineas, i, max_offset=3):
 
     # 1) misma línea
-    m = re.search(r"([\d]{1,3}(?:\.[\d]{3})*,[\d]{2})\s*$", lineas[i])
-    if m:
-        return _parse_importe(m.group(1))
+    valor = _importe_final(lineas[i])
+    if valor is not None:
+        return valor
 
     # 2) siguientes líneas solo si es importe puro
     for offset in range(1, max_offset + 1):
         if i + offset >= len(lineas):
             break
-        candidata = lineas[i + offset].strip()
-
-        if re.fullmatch(r"[\d]{1,3}(?:\.[\d]{3})*,[\d]{2}", candidata):
-            return _parse_importe(candidata)
+        valor = _importe_puro(lineas[i + offset])
+        if valor is not None:
+            return valor
 
     return None
 
 
-def extraer_bases_rnt(pdf_path, debug_dni=None):
-
-    # 🔹 Estructura mensual
+def _lineas_relevantes(normalizado):
+    # Índices (en orden) de las líneas con alguna coincidencia del patrón combinado
+    indice, contado, pos = 0, 0, 0
+    while True:
+        m = _PATRON_LINEA_RELEVANTE.search(normalizado, pos)
+        if not m:
+            return
+        indice += normalizado.count("\n", contado, m.start())
+        yield indice
+        # El resto de coincidencias de la misma línea no aportan nada: saltamos a la siguiente
+        fin_linea = normalizado.find("\n", m.start())
+        if fin_linea == -1:
+            return
+        indice += 1
+        contado = pos = fin_linea + 1
+
+
+# Marcador para el estado (trabajador / periodo) que viene de páginas anteriores
+# y que un bloque procesado en paralelo todavía no conoce
+_HEREDADO = "<heredado>"
+
+CAMPOS_DEBUG = {"Base_CC": "CC capturada:", "Base_AT": "AT capturada:", "Base_Solidaridad": "Solidaridad capturada:"}
+
+
+def _escanear_pagina(texto, trabajador_actual, año_actual, mes_actual):
+    """
+    Clasifica las líneas de una página partiendo del estado recibido.
+    La página se normaliza (NFKD + ASCII) una sola vez y solo se examinan
+    las líneas que localiza el patrón combinado; los importes se leen de las
+    líneas sin normalizar, como siempre.
+    Devuelve (bases, hay_periodo, estado_final, usa_periodo_heredado).
+    """
+    bases = []
+    usa_periodo_heredado = False
+
+    # 🔎 Detectar periodo
+    match_periodo = _PATRON_PERIODO.search(texto)
+    if match_periodo:
+        mes_actual = match_periodo.group(1)
+        año_actual = match_periodo.group(2)
+
+    # Limpieza caracteres (toda la página de una vez; no cambia el número de líneas)
+    normalizado = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    lineas_norm = normalizado.split("\n")
+    lineas = texto.split("\n")
+
+    for i in _lineas_relevantes(normalizado):
+        linea = lineas_norm[i]
+
+        # Detectar trabajador
+        match_trabajador = _PATRON_TRABAJADOR.match(linea)
+        if match_trabajador:
+            trabajador_actual = match_trabajador.group(2)
+
+        if not trabajador_actual or not mes_actual:
+            continue
+
+        if mes_actual == _HEREDADO:
+            usa_periodo_heredado = True
+
+        # Ignorar totales
+        if "SUMA DE BASES" in linea:
+            trabajador_actual = None
+            continue
+
+        clave = (trabajador_actual, año_actual, mes_actual)
+
+        # =========================
+        # BASE CC
+        # =========================
+        if "BASE DE CONTINGENCIAS COMUNES" in linea:
+            valor = _extraer_importe_en_linea_o_siguiente(lineas, i)
+            if valor is not None:
+                bases.append((clave, "Base_CC", valor))
+
+        # =========================
+        # BASE AT
+        # =========================
+        if "BASE DE ACCIDENTES DE TRABAJO" in linea:
+            valor = _extraer_importe_en_linea_o_siguiente(lineas, i)
+            if valor is not None:
+                bases.append((clave, "Base_AT", valor))
+
+        # =========================
+        # SOLIDARIDAD
+        # =========================
+        if "COTIZACION ADIC" in linea or "SOLIDARIDAD" in linea:
+            valor = _extraer_importe_en_linea_o_siguiente(lineas, i)
+            if valor is not None:
+                bases.append((clave, "Base_Solidaridad", valor))
+
+    return bases, bool(match_periodo), (trabajador_actual, año_actual, mes_actual), usa_periodo_heredado
+
+
+def _procesar_bloque(origen, inicio, fin, estado_inicial):
+    """
+    Procesa las páginas [inicio, fin) (hasta el final si fin es None) partiendo de `estado_inicial`
+    (trabajador, año, mes), que puede contener _HEREDADO.
+    Devuelve, por página, las bases capturadas con su clave y el estado al
+    terminar el bloque, para que _unir_bloques resuelva lo heredado.
+    """
+    trabajador_actual, año_actual, mes_actual = estado_inicial
+    usa_periodo_heredado = False
+    paginas = []
+
+    medida = {}
+    for num_pagina, texto in iterar_textos(origen, inicio, fin, medida=medida):
+        if not texto:
+            paginas.append({"num": num_pagina + 1, "sin_texto": True})
+            continue
+
+        bases, con_periodo, (trabajador_actual, año_actual, mes_actual), heredado = _escanear_pagina(
+            texto, trabajador_actual, año_actual, mes_actual
+        )
+        usa_periodo_heredado = usa_periodo_heredado or heredado
+
+        paginas.append({"num": num_pagina + 1, "sin_texto": False, "con_periodo": con_periodo, "bases": bases})
+
+    return {
+        "inicio": inicio,
+        "fin": fin,
+        "paginas": paginas,
+        "estado_final": (trabajador_actual, año_actual, mes_actual),
+        "usa_periodo_heredado": usa_periodo_heredado,
+        "medida": medida,
+    }
+
+
+def _resolver(valor, heredado):
+    return heredado if valor == _HEREDADO else valor
+
+
+def _unir_bloques(origen, bloques, debug_dni=None):
+    """
+    Une los bloques en orden: sustituye el estado heredado por el estado
+    final real del bloque anterior y acumula las bases en el mismo orden que
+    una lectura secuencial (mismas sumas y mismo orden de claves).
+    """
     detalle = defaultdict(lambda: {
         "Base_CC": 0.0,
         "Base_AT": 0.0,
         "Base_Solidaridad": 0.0
     })
-
-    trabajador_actual = None
-    dni_actual = None
-    mes_actual = None
-    año_actual = None
-
     paginas_con_error = []
+    estado = (None, None, None)
 
-    with pdfplumber.open(pdf_path) as pdf:
-        for num_pagina, pagina in enumerate(pdf.pages):
-
-            bases_en_pagina = 0  # 🔎 contador nuevo
+    for bloque in bloques:
+        trabajador_prev, año_prev, mes_prev = estado
 
-            texto = pagina.extract_text()
+        # Si el bloque asumió un periodo heredado y en realidad aún no había
+        # ninguno, lo repetimos con el estado real (caso raro: primeras páginas sin periodo)
+        if bloque["usa_periodo_heredado"] and mes_prev is None:
+            bloque = _procesar_bloque(origen, bloque["inicio"], bloque["fin"], estado)
 
-            if not texto:
-                paginas_con_error.append(num_pagina + 1)
+        for pagina in bloque["paginas"]:
+            if pagina["sin_texto"]:
+                paginas_con_error.append(pagina["num"])
                 continue
 
-            # 🔎 Detectar periodo
-            match_periodo = re.search(r"Periodo de liquidación\s+(\d{2})/(\d{4})", texto)
-            if match_periodo:
-                mes_actual = match_periodo.group(1)
-                año_actual = match_periodo.group(2)
-
-            lineas = texto.split("\n")
-
-            for i, linea in enumerate(lineas):
-
-                # Limpieza caracteres
-                linea = unicodedata.normalize("NFKD", linea)
-                linea = linea.encode("ascii", "ignore").decode()
-
-                # Detectar trabajador
-                match_trabajador = re.match(r"(\d{11,12})\s+(\d{9,10}[A-Z])", linea)
-                if match_trabajador:
-                    trabajador_actual = match_trabajador.group(2)
-                    dni_actual = trabajador_actual[-9:]
-
-                if not trabajador_actual or not mes_actual:
+            bases_en_pagina = 0
+            for (trabajador, año, mes), campo, valor in pagina["bases"]:
+                trabajador = _resolver(trabajador, trabajador_prev)
+                año, mes = _resolver(año, año_prev), _resolver(mes, mes_prev)
+                if not trabajador or not mes:
                     continue
-
-                # Ignorar totales
-                if "SUMA DE BASES" in linea:
-                    trabajador_actual = None
-                    dni_actual = None
-                    continue
-
-                clave = (trabajador_actual, año_actual, mes_actual)
-
-                # =========================
-                # BASE CC
-                # =========================
-                if "BASE DE CONTINGENCIAS COMUNES" in linea:
-                    valor = _extraer_importe_en_linea_o_siguiente(lineas, i)
-                    if valor is not None:
-                        detalle[clave]["Base_CC"] += valor
-                        bases_en_pagina += 1
-                        if debug_dni == dni_actual:
-                            print("CC capturada:", valor)
-
-                # =========================
-                # BASE AT
-                # =========================
-                if "BASE DE ACCIDENTES DE TRABAJO" in linea:
-                    valor = _extraer_importe_en_linea_o_siguiente(lineas, i)
-                    if valor is not None:
-                        detalle[clave]["Base_AT"] += valor
-                        bases_en_pagina += 1
-                        if debug_dni == dni_actual:
-                            print("AT capturada:", valor)
-
-                # =========================
-                # SOLIDARIDAD
-                # =========================
-                if "COTIZACION ADIC" in linea or "SOLIDARIDAD" in linea:
-                    valor = _extraer_importe_en_linea_o_siguiente(lineas, i)
-                    if valor is not None:
-                        detalle[clave]["Base_Solidaridad"] += valor
-                        bases_en_pagina += 1
-                        if debug_dni == dni_actual:
-                            print("Solidaridad capturada:", valor)
+                detalle[(trabajador, año, mes)][campo] += valor
+                bases_en_pagina += 1
+                if debug_dni == trabajador[-9:]:
+                    print(CAMPOS_DEBUG[campo], valor)
 
             # 🔎 Si hay periodo pero no hemos capturado bases → marcar página problemática
-            if match_periodo and bases_en_pagina == 0:
-                paginas_con_error.append(num_pagina + 1)
+            if pagina["con_periodo"] and bases_en_pagina == 0:
+                paginas_con_error.append(pagina["num"])
+
+        trabajador_fin, año_fin, mes_fin = bloque["estado_final"]
+        estado = (
+            _resolver(trabajador_fin, trabajador_prev),
+            _resolver(año_fin, año_prev),
+            _resolver(mes_fin, mes_prev),
+        )
+
+    return detalle, paginas_con_error
+
+
+def _procesar_bloque_paralelo(args):
+    return _procesar_bloque(*args)
+
+
+def extraer_bases_rnt(pdf_path, debug_dni=None, procesos=1, paginas_por_bloque=None, medida=None):
+    """
+    Lee las bases de cotización de un RNT. `pdf_path` puede ser una ruta, un
+    archivo abierto/BytesIO o bytes.
+
+    Con procesos > 1 las páginas se reparten en bloques entre varios procesos
+    y después se "cosen" los trabajadores que cruzan de un bloque a otro; el
+    resultado es idéntico al de la lectura secuencial.
+    `medida` (dict) recibe las páginas leídas, el pico de memoria, los
+    segundos de texto y de análisis y los registros (meses por trabajador).
+    """
+    if procesos <= 1:
+        bloques = [_procesar_bloque(pdf_path, 0, None, (None, None, None))]
+    else:
+        # Los procesos hijos necesitan algo serializable: ruta o bytes
+        origen = pdf_path if isinstance(pdf_path, (str, os.PathLike, bytes)) else bytes(leer_contenido(pdf_path))
+        n_paginas = contar_paginas(origen)
+        tam = paginas_por_bloque or max(1, -(-n_paginas // (procesos * 4)))
+        tareas = [
+            (origen, ini, min(ini + tam, n_paginas), (None, None, None) if ini == 0 else (_HEREDADO, _HEREDADO, _HEREDADO))
+            for ini in range(0, n_paginas, tam)
+        ]
+        with ProcessPoolExecutor(max_workers=min(procesos, len(tareas) or 1)) as pool:
+            bloques = list(pool.map(_procesar_bloque_paralelo, tareas))
+        pdf_path = origen
+
+    detalle, paginas_con_error = _unir_bloques(pdf_path, bloques, debug_dni)
+    if medida is not None:
+        medida.update(unir_medidas([b["medida"] for b in bloques]))
 
     # =========================
     # GENERAR DETALLE MENSUAL
@@ -128,15 +290,15 @@ def extraer_bases_rnt(pdf_path, debug_dni=None):
 
     detalle_mensual = []
     for (ipf, año, mes), valores in detalle.items():
-        detalle_mensual.append({
-            "IPF": ipf,
-            "DNI": ipf[-9:],
-            "Año": int(año),
-            "Mes": int(mes),
-            "Base_CC": round(valores["Base_CC"], 2),
-            "Base_AT": round(valores["Base_AT"], 2),
-            "Base_Solidaridad": round(valores["Base_Solidaridad"], 2)
-        })
+        detalle_mensual.append(BaseRNTMensual(
+            ipf=ipf,
+            dni=ipf[-9:],
+            anio=int(año),
+            mes=int(mes),
+            base_cc=round(valores["Base_CC"], 2),
+            base_at=round(valores["Base_AT"], 2),
+            base_solidaridad=round(valores["Base_Solidaridad"], 2)
+        ))
 
     # =========================
     # GENERAR RESUMEN ANUAL
@@ -149,19 +311,22 @@ def extraer_bases_rnt(pdf_path, debug_dni=None):
     })
 
     for item in detalle_mensual:
-        clave = (item["DNI"], item["Año"])
-        resumen[clave]["Base_CC"] += item["Base_CC"]
-        resumen[clave]["Base_AT"] += item["Base_AT"]
-        resumen[clave]["Base_Solidaridad"] += item["Base_Solidaridad"]
+        clave = (item.dni, item.anio)
+        resumen[clave]["Base_CC"] += item.base_cc
+        resumen[clave]["Base_AT"] += item.base_at
+        resumen[clave]["Base_Solidaridad"] += item.base_solidaridad
 
     resumen_anual = []
     for (dni, año), valores in resumen.items():
-        resumen_anual.append({
-            "DNI": dni,
-            "Año": año,
-            "Base_CC_Anual": round(valores["Base_CC"], 2),
-            "Base_AT_Anual": round(valores["Base_AT"], 2),
-            "Base_Solidaridad_Anual": round(valores["Base_Solidaridad"], 2)
-        })
+        resumen_anual.append(BaseRNTAnual(
+            dni=dni,
+            anio=año,
+            base_cc_anual=round(valores["Base_CC"], 2),
+            base_at_anual=round(valores["Base_AT"], 2),
+            base_solidaridad_anual=round(valores["Base_Solidaridad"], 2)
+        ))
+
+    if medida is not None:
+        medida["registros"] = len(detalle_mensual)
 
     return detalle_mensual, resumen_anual, paginas_con_error
\ No newline at end of file
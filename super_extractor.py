@@ -1,40 +1,26 @@
 import streamlit as st
 import pandas as pd
 import io
-import os
-import shutil
-from datetime import datetime, timedelta
-def obtener_tipo_desempleo(codigo_contrato):
-    grupo_5_5 = ["100", "109", "130", "139", "150", "189", "200", "209", "230", "250", "289", "300", "389"]
-    grupo_6_7 = ["401", "402", "410", "421", "430", "441", "450", "501", "502", "510", "530", "541"]
-    
-    if str(codigo_contrato) in grupo_5_5:
-        return 5.5
-    elif str(codigo_contrato) in grupo_6_7:
-        return 6.7
-    return 0.0
+import json
+import time
+from datetime import datetime
 # --- IMPORTACIONES DE TUS EXTRACTORES ---
-from extractor_idc import extraer_datos_idc
-from extractor_190 import extraer_datos_190
-from extractor_nominas import procesar_documento, split_pdf
-from rnt_reader import extraer_bases_rnt 
-
-SPLIT_DIR = "split_temp"
-if not os.path.exists(SPLIT_DIR):
-    os.makedirs(SPLIT_DIR, exist_ok=True)
-
-# --- FUNCIÓN DE NORMALIZACIÓN ---
-def normalizar_dni_final(valor):
-    if pd.isna(valor) or str(valor).strip() == "": return None
-    s = "".join(filter(str.isalnum, str(valor))).upper()
-    return s[-9:] if len(s) >= 9 else s
-
-def limpiar_valor_numerico(valor):
-    if pd.isna(valor) or valor == "" or valor == "N/A": return 0.0
-    if isinstance(valor, (int, float)): return float(valor)
-    s = str(valor).strip().replace('.', '').replace(',', '.')
-    try: return float(s)
-    except ValueError: return 0.0
+from extractor_nominas import invalidar_cache_nominas
+from ejecutor_lote import PROCESOS_POR_DEFECTO, LIMITE_SEGUNDOS, LIMITE_MB
+from motor_horas import construir_matriz_horas, resumen_escenarios
+from cuadro_mando import huella, construir_cuadro, claves_disponibles, nombres_disponibles, filtrar_cuadro
+# --- MOTOR COMÚN CON LA LÍNEA DE COMANDOS ---
+from pipeline_auditoria import (
+    ANIOS_AUDITORIA, cronometro, informe_rendimiento, nombres_idc, tabla_idc_final, tabla_190, tabla_rnt
+)
+from trabajos_extraccion import lanzar_trabajo, obtener_trabajo
+from registros import BaseRNTMensual, tabla_registros
+from almacen_auditorias import TABLAS, auditorias_guardadas, cargar_auditoria, cif_de_lote, consultar, guardar_auditoria
+
+# Mientras dura un trabajo los registros nuevos pasan a la sesión cada segundo,
+# pero las tablas derivadas (matriz de horas, cuadro) se rehacen como mucho
+# cada tantos segundos y al terminar
+REFRESCO_PESTANAS_S = 15
 
 def to_excel(df, sheet_name='Datos'):
     output = io.BytesIO()
@@ -42,7 +28,184 @@ def to_excel(df, sheet_name='Datos'):
         df.to_excel(writer, index=False, sheet_name=sheet_name)
     return output.getvalue()
 
+def _aplicar_lote(lote):
+    for key in ['raw_idc', 'raw_190', 'raw_nom', 'raw_rnt_det', 'raw_rnt_res']:
+        st.session_state[key] = lote[key]
+    # Las tablas derivadas (matriz IDC, cuadro) se rehacen con los nuevos registros
+    st.session_state.version_idc = st.session_state.get('version_idc', 0) + 1
+
+def _sumar_registros(lote):
+    # Añade registros a los de la sesión sin tocar las tablas derivadas
+    for key in ['raw_idc', 'raw_190', 'raw_nom', 'raw_rnt_det', 'raw_rnt_res']:
+        st.session_state[key].extend(lote[key])
+
+def _trabajo_en_marcha():
+    """
+    Trabajo de extracción de esta sesión (o el de ?trabajo= tras recargar la página).
+    """
+    if 'trabajo_id' not in st.session_state and "trabajo" in st.query_params:
+        st.session_state.trabajo_id = st.query_params["trabajo"]
+        st.session_state.trabajo_visto = -1
+        st.session_state.trabajo_aplicado = False
+    if 'trabajo_id' not in st.session_state:
+        return None
+    trabajo = obtener_trabajo(st.session_state.trabajo_id)
+    if trabajo is None:
+        # Ya purgado o de otro arranque del servidor
+        del st.session_state.trabajo_id
+        st.query_params.pop("trabajo", None)
+    return trabajo
+
+def _terminar_trabajo(trabajo):
+    p = trabajo.progreso()
+    del st.session_state.trabajo_id
+    st.query_params.pop("trabajo", None)
+    if p["estado"] == "error":
+        st.session_state.mensaje_trabajo = None
+        st.session_state.errores_archivos = [{"Archivo": "(trabajo)", "Tipo": "", "Motivo": "error", "Página": None, "Error": p["error"]}]
+        return
+    lote = trabajo.lote
+    # Sin archivos nuevos ni quitados las tablas derivadas siguen valiendo (salvo tras recargar la página)
+    if (lote["nuevos"] or lote["eliminados"] or st.session_state.get('anio_190_lote') != trabajo.anio_190
+            or 'archivos_procesados' not in st.session_state):
+        _aplicar_lote(lote)
+    st.session_state.anio_190_lote = trabajo.anio_190
+    st.session_state.archivos_procesados = trabajo.procesados
+    st.session_state.errores_archivos = lote["errores"]
+    st.session_state.avisos_archivos = lote["avisos"]
+    st.session_state.memoria_archivos = lote["memoria"]
+    st.session_state.rendimiento_trabajo = informe_rendimiento(trabajo.tiempos, lote) if trabajo.tiempos is not None else None
+    st.session_state.stats_cache = lote["cache"]
+    sin_cambios = p["total_archivos"] - lote["nuevos"]
+    st.session_state.mensaje_trabajo = (
+        f"✅ Procesamiento completado en {p['segundos']:.1f} s: {lote['nuevos']} archivo(s) nuevos, "
+        f"{lote['eliminados']} quitado(s), {sin_cambios} sin cambios."
+    )
+
+@st.fragment(run_every=1.0)
+def _seguir_trabajo():
+    """
+    Progreso del trabajo en la barra lateral, refrescado cada segundo. Cada
+    vez que terminan archivos sus registros se suman a la sesión; las
+    pestañas se rehacen cada REFRESCO_PESTANAS_S segundos y al acabar.
+    """
+    trabajo = _trabajo_en_marcha()
+    if trabajo is None:
+        return
+    p = trabajo.progreso()
+    if not trabajo.activo:
+        _terminar_trabajo(trabajo)
+        st.rerun()
+
+    if p["estado"] == "en cola":
+        st.info(f"⏳ En cola ({p['en_cola']} trabajo(s) por delante)")
+        return
+    total = max(p["total_archivos"], 1)
+    st.progress(p["archivos_hechos"] / total, text=f"{p['archivos_hechos']}/{p['total_archivos']} archivos")
+    st.caption(f"📄 {p['paginas']} páginas · {p['paginas_por_segundo']:.1f} pág/s · {p['segundos']:.0f} s"
+               + (f" · último: {p['ultimo_archivo']}" if p["ultimo_archivo"] else ""))
+    if p["extraidos"] > st.session_state.get('trabajo_visto', -1):
+        if st.session_state.get('trabajo_aplicado'):
+            nuevos, hechos = trabajo.registros_desde(st.session_state.trabajo_visto)
+            _sumar_registros(nuevos)
+        else:
+            # La primera vez se sustituye lo que hubiera (incluye los archivos ya procesados antes)
+            lote, hechos = trabajo.registros_desde()
+            _aplicar_lote(lote)
+            st.session_state.trabajo_aplicado = True
+        st.session_state.trabajo_visto = hechos
+        st.session_state.trabajo_pendiente = True
+    if (st.session_state.get('trabajo_pendiente')
+            and time.monotonic() - st.session_state.get('trabajo_refresco', 0.0) >= REFRESCO_PESTANAS_S):
+        st.session_state.trabajo_pendiente = False
+        st.session_state.trabajo_refresco = time.monotonic()
+        st.session_state.version_idc = st.session_state.get('version_idc', 0) + 1
+        st.rerun()
+
+def _panel_almacen(guardadas, anio_audit, cif_manual):
+    """
+    Guardar la auditoría en pantalla en el almacén (por CIF y año) o cargar una anterior.
+    """
+    with st.expander("💾 Auditorías guardadas"):
+        lote = {k: st.session_state[k] for k in ['raw_idc', 'raw_190', 'raw_nom', 'raw_rnt_det', 'raw_rnt_res']}
+        cif = st.text_input("CIF del cliente:", value=cif_de_lote(lote, cif_manual) or "")
+        hay_datos = any(lote.values())
+        if st.button(f"💾 Guardar auditoría {anio_audit}", disabled=not hay_datos, use_container_width=True):
+            try:
+                filas = guardar_auditoria(lote, cif, anio_audit)
+                st.toast(f"Guardada: {cif.upper()} {anio_audit} ({sum(filas.values())} registros)")
+                st.rerun()
+            except ValueError as e:
+                st.error(f"⚠️ {e}")
+
+        if guardadas:
+            elegida = st.selectbox(
+                "Auditoría:", guardadas,
+                format_func=lambda a: f"{a['CIF']} · {a['Año']} ({a.get('idc', 0)} IDC, {a.get('rnt_anual', 0)} RNT) · {a['Guardada']}"
+            )
+            if st.button("📂 Cargar", use_container_width=True):
+                try:
+                    _aplicar_lote(cargar_auditoria(elegida['CIF'], elegida['Año']))
+                except ValueError as e:
+                    st.error(f"⚠️ {e}")
+                    return
+                # Lo cargado no viene de archivos subidos: el próximo PROCESAR TODO extrae los que haya
+                st.session_state.archivos_procesados = {}
+                st.session_state.anio_190_lote = None
+                for key in ['errores_archivos', 'avisos_archivos', 'memoria_archivos']:
+                    st.session_state.pop(key, None)
+                st.session_state.mensaje_trabajo = f"📂 Auditoría {elegida['CIF']} {elegida['Año']} cargada del almacén."
+                st.rerun()
+
+def _consulta_almacen(guardadas):
+    """
+    Consultas por tabla, DNI, CIF y año sobre todas las auditorías guardadas.
+    """
+    with st.expander("🔎 Consultar auditorías guardadas"):
+        q1, q2, q3, q4 = st.columns(4)
+        with q1: tabla = st.selectbox("Tabla:", list(TABLAS), index=list(TABLAS).index("rnt_anual"))
+        with q2: dni = st.text_input("DNI:", value="")
+        with q3: cif = st.selectbox("CIF:", ["Todos"] + sorted({a['CIF'] for a in guardadas}))
+        with q4: anio = st.selectbox("Año:", ["Todos"] + sorted({a['Año'] for a in guardadas}, reverse=True))
+        try:
+            resultado = consultar(tabla, dni=dni.strip() or None, cif=None if cif == "Todos" else cif,
+                                  anio=None if anio == "Todos" else anio)
+        except ValueError as e:
+            st.error(f"⚠️ {e}")
+            return
+        st.dataframe(resultado, use_container_width=True)
+
+def _panel_rendimiento(tiempos):
+    """
+    Panel plegable con el desglose de la última extracción y de esta recarga
+    de la página (si se está midiendo), descargable en JSON.
+    """
+    with st.expander("⏱️ Rendimiento"):
+        st.checkbox("Medir rendimiento", key="medir_rendimiento",
+                    help="Tiempos por etapa y contadores por tipo de documento de las próximas extracciones y recargas")
+        if tiempos is None:
+            st.caption("Actívalo y pulsa PROCESAR TODO para ver el desglose.")
+            return
+        informe = dict(st.session_state.get('rendimiento_trabajo') or {"etapas": [], "documentos": []})
+        informe["pantalla"] = [{"Etapa": etapa, "Segundos": round(segundos, 3)} for etapa, segundos in tiempos.items()]
+        if 'stats_cache' in st.session_state:
+            informe["cache"] = st.session_state.stats_cache
+        if informe["etapas"]:
+            st.markdown("**Última extracción**")
+            st.dataframe(pd.DataFrame(informe["etapas"]), hide_index=True, use_container_width=True)
+        if informe["documentos"]:
+            st.dataframe(pd.DataFrame(informe["documentos"]), hide_index=True, use_container_width=True)
+        if informe["pantalla"]:
+            st.markdown("**Esta recarga de la página**")
+            st.dataframe(pd.DataFrame(informe["pantalla"]), hide_index=True, use_container_width=True)
+        st.download_button("📥 Descargar JSON", json.dumps(informe, ensure_ascii=False, indent=2),
+                           file_name=f"rendimiento_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                           mime="application/json", use_container_width=True)
+
 def ejecutar_super_extractor():
+    # Sin medir, cronometro no guarda nada y las extracciones no llevan contadores
+    tiempos = {} if st.session_state.get('medir_rendimiento') else None
+
     # --- INICIALIZACIÓN ---
     for key in ['raw_idc', 'raw_190', 'raw_nom', 'raw_rnt_det', 'raw_rnt_res', 'errores_idc']:
         if key not in st.session_state: st.session_state[key] = []
@@ -54,8 +217,13 @@ def ejecutar_super_extractor():
 
     with st.sidebar:
         st.header("📂 Carga de Documentos")
+        f_auto = st.file_uploader(
+            "📥 Subir documentos de cualquier tipo", type="pdf", accept_multiple_files=True, key="up_auto",
+            help="IDC, Modelo 190, RNT o nóminas mezclados: el tipo se detecta con la primera página"
+        )
+        st.divider()
         f_idc = st.file_uploader("Subir IDCs", type="pdf", accept_multiple_files=True, key="up_idc")
-        anio_audit = st.selectbox("Año Auditoría IDC:", [2026, 2025, 2024, 2023], index=0)
+        anio_audit = st.selectbox("Año Auditoría IDC:", ANIOS_AUDITORIA, index=0)
         tipo_general = st.number_input("Tipo Cotización General (%):", value=25.07, step=0.01)
         h_conv = st.number_input("Horas Convenio Anual:", value=1800.0)
         emp_manual = st.text_input("Empresa Cliente (Autónomos):", value="")
@@ -67,42 +235,66 @@ def ejecutar_super_extractor():
         
         st.divider()
         f_nom = st.file_uploader("Subir Nóminas", type="pdf", accept_multiple_files=True, key="up_nom")
+        if st.button("♻️ Vaciar caché de nóminas", help="Úsalo si ha cambiado la versión del procesador de Document AI"):
+            invalidar_cache_nominas()
+            st.session_state.archivos_procesados = {
+                k: v for k, v in st.session_state.get('archivos_procesados', {}).items() if k[0] != "nominas"
+            }
+            st.toast("Caché de nóminas vaciada.")
         st.divider()
         f_rnt = st.file_uploader("Subir RNTs", type="pdf", accept_multiple_files=True, key="up_rnt")
+        st.divider()
+        n_procesos = st.number_input("Procesos en paralelo:", min_value=1, max_value=64, value=PROCESOS_POR_DEFECTO, step=1)
+        with st.expander("⏱️ Límites por documento"):
+            limite_s = st.number_input("Segundos como máximo (0 = sin límite):", min_value=0.0, value=LIMITE_SEGUNDOS, step=60.0)
+            limite_mb = st.number_input("Memoria como máximo en MB (0 = sin límite):", min_value=0.0, value=LIMITE_MB, step=256.0)
         
-        if st.button("🚀 PROCESAR TODO", use_container_width=True):
-            st.session_state.raw_idc, st.session_state.raw_190, st.session_state.raw_nom, st.session_state.raw_rnt_det, st.session_state.raw_rnt_res = [], [], [], [], []
-            if f_idc:
-                for f in f_idc:
-                    datos, _ = extraer_datos_idc(f)
-                    if datos: st.session_state.raw_idc.extend(datos)
-            if f_190:
-                for f in f_190:
-                    datos = extraer_datos_190(f)
-                    for d in datos: d["Año_190"] = anio_190
-                    st.session_state.raw_190.extend(datos)
-            if f_nom:
-                temp_paths = []
-                for uploaded in f_nom:
-                    tmp_path = os.path.join(SPLIT_DIR, uploaded.name)
-                    with open(tmp_path, "wb") as f_tmp: f_tmp.write(uploaded.getbuffer())
-                    temp_paths.append(tmp_path)
-                for path in temp_paths:
-                    paginas = split_pdf(path, split_dir=SPLIT_DIR)
-                    for pagina in paginas:
-                        datos = procesar_documento(pagina)
-                        st.session_state.raw_nom.append(datos)
-                shutil.rmtree(SPLIT_DIR)
-                os.makedirs(SPLIT_DIR, exist_ok=True)
-            if f_rnt:
-                for f in f_rnt:
-                    # Guardamos temporalmente para que el lector RNT pueda abrirlo
-                    with open("temp_rnt.pdf", "wb") as tmp:
-                        tmp.write(f.read())
-                    det, res, errs = extraer_bases_rnt("temp_rnt.pdf")
-                    if det: st.session_state.raw_rnt_det.extend(det)
-                    if res: st.session_state.raw_rnt_res.extend(res)
-            st.success("✅ Procesamiento completado.")
+        if st.button("🚀 PROCESAR TODO", use_container_width=True, disabled=_trabajo_en_marcha() is not None):
+            # getvalue() de un UploadedFile no copia: son los mismos bytes que guarda
+            # Streamlit para esta sesión, y de ahí no pasan a disco en ningún momento
+            archivos = (
+                [("idc", f.name, f.getvalue()) for f in (f_idc or [])] +
+                [("190", f.name, f.getvalue()) for f in (f_190 or [])] +
+                [("rnt", f.name, f.getvalue()) for f in (f_rnt or [])] +
+                [("nominas", f.name, f.getvalue()) for f in (f_nom or [])] +
+                [(None, f.name, f.getvalue()) for f in (f_auto or [])]
+            )
+            # La extracción va a segundo plano: la página sigue respondiendo y,
+            # si se recarga, el trabajo se recupera con el ?trabajo= de la URL.
+            # Solo se extraen los archivos nuevos o cambiados; los quitados desaparecen del lote
+            trabajo = lanzar_trabajo(archivos, int(n_procesos), anio_190, st.session_state.get('archivos_procesados'),
+                                     {"limite_s": limite_s, "limite_mb": limite_mb}, medir=tiempos is not None)
+            st.session_state.trabajo_id = trabajo.id
+            st.session_state.trabajo_visto = 0
+            st.session_state.trabajo_aplicado = False
+            st.session_state.mensaje_trabajo = None
+            st.query_params["trabajo"] = trabajo.id
+
+        if _trabajo_en_marcha() is not None:
+            _seguir_trabajo()
+        elif st.session_state.get('mensaje_trabajo'):
+            st.success(st.session_state.mensaje_trabajo)
+
+        if st.session_state.get('errores_archivos'):
+            with st.expander(f"⚠️ {len(st.session_state.errores_archivos)} archivo(s) con fallos (motivo y página)"):
+                st.dataframe(pd.DataFrame(st.session_state.errores_archivos), use_container_width=True)
+
+        if st.session_state.get('avisos_archivos'):
+            with st.expander(f"🔀 {len(st.session_state.avisos_archivos)} archivo(s) subidos en el cargador de otro tipo"):
+                st.dataframe(pd.DataFrame(st.session_state.avisos_archivos), use_container_width=True)
+
+        if st.session_state.get('memoria_archivos'):
+            with st.expander("🧠 Memoria por archivo (pico de RSS durante la lectura)"):
+                st.dataframe(pd.DataFrame(st.session_state.memoria_archivos), use_container_width=True)
+
+        if 'stats_cache' in st.session_state:
+            st.caption(f"🗄️ Caché de extracción: {st.session_state.stats_cache['aciertos']} aciertos · {st.session_state.stats_cache['fallos']} fallos")
+
+        guardadas = auditorias_guardadas()
+        _panel_almacen(guardadas, anio_audit, cif_manual)
+
+        # Se rellena al final, con los tiempos de toda la página
+        hueco_rendimiento = st.container()
 
     tab_idc, tab_190, tab_nom, tab_rnt, tab_maestra = st.tabs(["📊 IDC", "📄 190", "💰 Nóminas", "📑 RNT", "🎯 Cuadro de Mando"])
 
@@ -110,10 +302,7 @@ def ejecutar_super_extractor():
     with tab_idc:
         if st.session_state.raw_idc:
 
-            nombres_dis = sorted(list({
-                r['Nombre'] for r in st.session_state.raw_idc
-                if "DESCONOCIDO" not in r['Nombre']
-            }))
+            nombres_dis = nombres_idc(st.session_state.raw_idc)
 
             if nombres_dis:
 
@@ -123,122 +312,44 @@ def ejecutar_super_extractor():
                     default=nombres_dis
                 )
 
-                dias_anio = 366 if (anio_audit % 4 == 0 and (anio_audit % 100 != 0 or anio_audit % 400 == 0)) else 365
-                v_h_d = h_conv / dias_anio
-                f_limite_ini = datetime(anio_audit, 1, 1)
-
-                res_final_idc = []
-
-                for p in seleccion:
-
-                    idcs_p = sorted(
-                        [r for r in st.session_state.raw_idc if r['Nombre'] == p],
-                        key=lambda x: x['Desde_Info']
-                    )
-
-                    if not idcs_p:
-                        continue
-
-                    h_t, h_i, d_it, d_alta = 0.0, 0.0, 0, 0
-                    primer_dia, ultimo_dia = None, None
-                    hay_hueco = False
-
-                    es_aut = idcs_p[0].get('Es_Autonomo', False)
-                    f_contrato_orig = idcs_p[0]['Inicio_Contrato']
-
-                    for d in range(dias_anio):
-
-                        dia = f_limite_ini + timedelta(days=d)
-
-                        vig = next(
-                            (i for i in reversed(idcs_p)
-                            if i['Desde_Info'] <= dia <= i['Hasta_Info']),
-                            None
-                        )
-
-                        deberia_haber_datos = f_contrato_orig <= dia
-
-                        if vig:
-
-                            try:
-                                f_a = datetime.strptime(vig['Alta'], "%d-%m-%Y")
-                                f_b = datetime.strptime(vig['Baja'], "%d-%m-%Y") if vig['Baja'] != "ACTIVO" else datetime(2099, 1, 1)
-
-                                if f_a <= dia <= f_b:
-
-                                    d_alta += 1
-
-                                    if primer_dia is None:
-                                        primer_dia = dia
-                                    ultimo_dia = dia
+                # La matriz días x trabajadores se construye una vez por cada lote procesado;
+                # cambiar año, horas de convenio o tipo general solo la reduce de nuevo
+                clave_matriz = (st.session_state.get('version_idc', 0), len(st.session_state.raw_idc))
+                if st.session_state.get('matriz_idc_clave') != clave_matriz:
+                    with cronometro(tiempos, "horas IDC: matriz"):
+                        st.session_state.matriz_idc = construir_matriz_horas(st.session_state.raw_idc, ANIOS_AUDITORIA)
+                    st.session_state.matriz_idc_clave = clave_matriz
+                matriz = st.session_state.matriz_idc
 
-                                    ctp_val = vig.get('CTP', 0)
-                                    factor = 1.0 if (es_aut or ctp_val in [0, 1000]) else ctp_val / 1000.0
-
-                                    h_t += v_h_d * factor
-
-                                    if not es_aut and any(it[0] <= dia <= it[1] for it in vig['Tramos_IT']):
-                                        d_it += 1
-                                        h_i += v_h_d * factor
-
-                            except:
-                                continue
-
-                        elif deberia_haber_datos:
-                            hay_hueco = True
-
-                    if d_alta > 0:
-                        # 1. Recuperamos el código de contrato y calculamos desempleo
-                        cod_contrato = idcs_p[0].get('Tipo_Contrato', 'N/A')
-                        tipo_des_auto = obtener_tipo_desempleo(cod_contrato)
-                        
-                        # 2. Calculamos el Total (General + Desempleo)
-                        total_cotiz_final = round(tipo_general + tipo_des_auto, 2)
-
-                        # 3. Dedicación
-                        ultimo_ctp = idcs_p[-1].get('CTP', 0)
-                        dedicacion_texto = "100%" if (es_aut or ultimo_ctp in [0, 1000]) else f"{(ultimo_ctp/10):.2f}%"
-
-                        dni_ok = normalizar_dni_final(idcs_p[0]['DNI_Trabajador'])
-
-                        res_final_idc.append({
-                            "Nombre": p,
-                            "DNI": dni_ok,
-                            "CIF Empresa": cif_manual if es_aut else idcs_p[0]['NIF_Empresa'],
-                            "Empresa": emp_manual if es_aut else idcs_p[0]['Empresa'],
-                            "Estado": "⚠️ INCOMPLETO" if hay_hueco else "✅ OK",
-                            "Contrato": cod_contrato, # <--- NUEVA COLUMNA
-                            "Inicio Contrato": f_contrato_orig.strftime("%d-%m-%Y"),
-                            "Inicio Auditado": primer_dia.strftime("%d-%m-%Y") if primer_dia else "N/A",
-                            "Fin Auditado": ultimo_dia.strftime("%d-%m-%Y") if ultimo_dia else "N/A",
-                            "Días IT": int(d_it),
-                            "Horas Teóricas": round(h_t, 2),
-                            "Horas IT": round(h_i, 2),
-                            "Horas Efectivas": round(h_t - h_i, 2),
-                            "Dedicación": dedicacion_texto,
-                            # --- NUEVAS COLUMNAS DE COTIZACIÓN ---
-                            "Cotiz. Gral (%)": tipo_general,
-                            "Cotiz. Desempleo (%)": tipo_des_auto,
-                            "Total Cotización (%)": total_cotiz_final
-                        })
-
-                st.session_state.df_final_idc = pd.DataFrame(res_final_idc)
+                with cronometro(tiempos, "horas IDC: tabla"):
+                    st.session_state.df_final_idc = tabla_idc_final(matriz, anio_audit, h_conv, tipo_general, seleccion, emp_manual, cif_manual)
 
                 st.dataframe(
                     st.session_state.df_final_idc,
                     use_container_width=True
                 )
+
+                with st.expander("🔀 Comparativa de escenarios (multi-año)"):
+                    e1, e2 = st.columns(2)
+                    with e1: anios_esc = st.multiselect("Años:", options=matriz['anios'], default=matriz['anios'])
+                    with e2: horas_esc = st.text_input("Horas Convenio (separadas por comas):", value=f"{h_conv:g}")
+                    try:
+                        lista_horas = [float(h) for h in horas_esc.replace(";", ",").split(",") if h.strip()]
+                    except ValueError:
+                        lista_horas = []
+                        st.warning("⚠️ Introduce las horas como números separados por comas.")
+                    escenarios = [
+                        {"anio": a, "h_conv": h, "tipo_general": tipo_general}
+                        for a in sorted(anios_esc) for h in lista_horas
+                    ]
+                    if escenarios:
+                        st.dataframe(resumen_escenarios(matriz, escenarios, seleccion), use_container_width=True)
     
     # 2. PESTAÑA 190
     with tab_190:
         if st.session_state.raw_190:
-            df_190 = pd.DataFrame(st.session_state.raw_190)
-            for col in ['Percepciones', 'Retenciones', 'Dinerarias NO IL', 'Especie NO IL']:
-                if col in df_190.columns: df_190[col] = df_190[col].apply(limpiar_valor_numerico)
-            
-            col_id = 'NIF' if 'NIF' in df_190.columns else ('DNI' if 'DNI' in df_190.columns else None)
-            if col_id: df_190[col_id] = df_190[col_id].apply(normalizar_dni_final)
-            
+            with cronometro(tiempos, "tabla 190"):
+                df_190 = tabla_190(st.session_state.raw_190)
             st.session_state.df_final_190 = df_190
             c1, c2 = st.columns([1, 3])
             with c1: sel_clv = st.multiselect("Clave (190):", options=sorted(df_190['Clave'].unique()))
@@ -251,9 +362,9 @@ def ejecutar_super_extractor():
     with tab_rnt:
         # Generamos el DF desde la lista cruda acumulada en el procesamiento
         if st.session_state.raw_rnt_res:
-            df_rnt_v = pd.DataFrame(st.session_state.raw_rnt_res)
             # Aseguramos que el DNI esté limpio para mostrar
-            df_rnt_v['DNI'] = df_rnt_v['DNI'].apply(normalizar_dni_final)
+            with cronometro(tiempos, "tabla RNT"):
+                df_rnt_v = tabla_rnt(st.session_state.raw_rnt_res)
             
             st.session_state.df_final_rnt = df_rnt_v # Guardamos para la Tab Maestra
             
@@ -262,7 +373,7 @@ def ejecutar_super_extractor():
             
             with st.expander("Ver Detalle Mensual"):
                 if st.session_state.raw_rnt_det:
-                    st.dataframe(pd.DataFrame(st.session_state.raw_rnt_det), use_container_width=True)
+                    st.dataframe(tabla_registros(st.session_state.raw_rnt_det, BaseRNTMensual), use_container_width=True)
         else:
             st.info("No hay datos de RNT procesados.")
 
@@ -270,96 +381,44 @@ def ejecutar_super_extractor():
     with tab_maestra:
         st.header("🎯 Cuadro de Mando Unificado")
         
-        # Trabajamos con los Dataframes base cargados
-        df_i = st.session_state.df_final_idc.copy()
-        df_1 = st.session_state.df_final_190.copy()
-        df_n = st.session_state.df_final_nom.copy()
-        df_r = st.session_state.df_final_rnt.copy()
+        # La tabla unificada se construye una vez por lote procesado (190, RNT y
+        # nóminas solo cambian al procesar) y por contenido del IDC, que depende
+        # de los parámetros de su pestaña. Los filtros trabajan sobre ella.
+        df_i = st.session_state.df_final_idc
+        df_1 = st.session_state.df_final_190
+        version = st.session_state.get('version_idc', 0)
+        clave_cuadro = (version, len(st.session_state.raw_190), len(st.session_state.raw_rnt_res),
+                        huella(df_i), huella(st.session_state.df_final_nom))
 
         if not df_1.empty:
+            if st.session_state.get('cuadro_clave') != clave_cuadro:
+                # Los agregados por DNI de RNT/nóminas se reutilizan dentro del mismo lote
+                if st.session_state.get('cuadro_memo_version') != version:
+                    st.session_state.cuadro_memo = {}
+                    st.session_state.cuadro_memo_version = version
+                with cronometro(tiempos, "cuadro: unión"):
+                    st.session_state.cuadro = construir_cuadro(
+                        df_i, df_1, st.session_state.df_final_nom, st.session_state.df_final_rnt,
+                        st.session_state.cuadro_memo
+                    )
+                st.session_state.cuadro_clave = clave_cuadro
+            cuadro = st.session_state.cuadro
+
             # --- FILTROS PARA EL CUADRO DE MANDO ---
             st.subheader("Filtros de Análisis")
             f1, f2 = st.columns([1, 3])
             with f1:
-                claves_disp = sorted(df_1['Clave'].unique())
+                claves_disp = claves_disponibles(cuadro)
                 sel_clv_m = st.multiselect("Seleccionar Claves:", options=claves_disp, default=claves_disp)
             
-            # Filtramos el Modelo 190 base antes de unir
-            df_1_filtered = df_1[df_1['Clave'].isin(sel_clv_m)]
-            
             with f2:
-                nombres_disp = sorted(df_1_filtered['Nombre'].unique()) if not df_1_filtered.empty else []
+                nombres_disp = nombres_disponibles(cuadro, sel_clv_m)
                 sel_nom_m = st.multiselect("Seleccionar Trabajadores:", options=nombres_disp)
             
-            if sel_nom_m:
-                df_1_filtered = df_1_filtered[df_1_filtered['Nombre'].isin(sel_nom_m)]
-            
-            # --- LÓGICA DE UNIÓN ---
-            # Para el match, normalizamos el DNI en todas
-            for df_temp, col_temp in [(df_i, 'DNI'), (df_1_filtered, 'NIF'), (df_1_filtered, 'DNI'), (df_n, 'DNI'), (df_r, 'DNI')]:
-                if not df_temp.empty and col_temp in df_temp.columns:
-                    df_temp['DNI_JOIN'] = df_temp[col_temp].apply(normalizar_dni_final)
-
-            # UNIÓN: El IDC no tiene clave, así que lo pegamos por DNI a cada registro del 190
-            if not df_i.empty:
-                # Quitamos columnas de nombre del IDC para no duplicar. 
-                # AÑADIMOS: 'Contrato' y 'Total Cotización (%)' para el análisis final.
-                df_i_min = df_i[[
-                    'DNI_JOIN', 
-                    'Horas Efectivas', 
-                    'Días IT', 
-                    'Empresa', 
-                    'CIF Empresa', 
-                    'Contrato', 
-                    'Total Cotización (%)'
-                ]]
-                resultado = pd.merge(df_1_filtered, df_i_min, on='DNI_JOIN', how='left')
-            else:
-                resultado = df_1_filtered
-
-            #  --- NUEVA UNIÓN RNT ---
-            if not df_r.empty and 'DNI_JOIN' in df_r.columns:
-                # Borramos restos de columnas RNT si existieran por re-ejecución
-                cols_rnt_limpiar = [c for c in resultado.columns if any(p in c for p in ['Base_CC', 'Base_AT', 'Solidaridad'])]
-                resultado = resultado.drop(columns=cols_rnt_limpiar)
-
-                # Preparamos el RNT sumando SOLO la Base CC
-                df_r_min = df_r.groupby('DNI_JOIN')[['Base_CC_Anual']].sum().reset_index()
-                resultado = pd.merge(resultado, df_r_min, on='DNI_JOIN', how='left')
-           
-            # 3. UNIÓN NÓMINAS
-            if not df_n.empty:
-                # Aseguramos normalización del DNI en nóminas
-                df_n['DNI_JOIN'] = df_n['DNI'].apply(normalizar_dni_final)
-                df_n_min = df_n.groupby('DNI_JOIN')[['AportacionEmpresa']].sum().reset_index()
-                # Limpieza preventiva de columna de nómina si ya existe
-                if 'AportacionEmpresa' in resultado.columns:
-                    resultado = resultado.drop(columns=['AportacionEmpresa'])
-                resultado = pd.merge(resultado, df_n_min, on='DNI_JOIN', how='left')
+            with cronometro(tiempos, "cuadro: filtrado"):
+                resultado = filtrar_cuadro(cuadro, sel_clv_m, sel_nom_m)
 
             if not resultado.empty:
-                # --- 1. CÁLCULO DE LA SS TEÓRICA ---
-                if 'Base_CC_Anual' in resultado.columns and 'Total Cotización (%)' in resultado.columns:
-                    # Fórmula: (Base RNT * Porcentaje IDC) / 100
-                    resultado['SS a cargo Empresa'] = round(
-                        (resultado['Base_CC_Anual'] * resultado['Total Cotización (%)']) / 100, 2
-                    )
-                # --- 2. CÁLCULO DE COSTES POR HORA ---
-                # Verificamos que existan las horas y no sean cero para evitar errores
-                if 'Horas Efectivas' in resultado.columns:
-                    # Creamos primero 'Coste hora' simple (Percepciones / Horas) para tener la referencia
-                    if 'Percepciones' in resultado.columns:
-                        resultado['Coste hora'] = round(resultado['Percepciones'] / resultado['Horas Efectivas'], 2)
-                    
-                    # NUEVA COLUMNA: Coste Hora Real (Dinerarias + SS) / Horas
-                    if 'Dinerarias NO IL' in resultado.columns and 'SS a cargo Empresa' in resultado.columns:
-                        resultado['Coste Hora Real'] = round(
-                            (resultado['Dinerarias NO IL'] + resultado['SS a cargo Empresa']) / resultado['Horas Efectivas'], 2
-                        )
-                # Limpieza final de columnas técnicas
-                if 'DNI_JOIN' in resultado.columns: 
-                    resultado.drop(columns=['DNI_JOIN'], inplace=True)
-                    
                 # --- 🎯 NUEVO: FILTRO DE COLUMNAS PARA DESCARGA ---
                 st.markdown("---")
                 st.subheader("🛠️ Configuración de Columnas")
@@ -377,9 +436,11 @@ def ejecutar_super_extractor():
                     st.subheader("📋 Vista Previa del Informe Personalizado")
                     st.dataframe(df_exportar, use_container_width=True)
                     
+                    with cronometro(tiempos, "excel"):
+                        excel = to_excel(df_exportar, 'Consolidado')
                     st.download_button(
                         label="📥 Descargar Informe Personalizado (Excel)",
-                        data=to_excel(df_exportar, 'Consolidado'),
+                        data=excel,
                         file_name=f"Auditoria_Personalizada_{datetime.now().strftime('%Y%m%d')}.xlsx",
                         use_container_width=True
                     )
@@ -389,4 +450,10 @@ def ejecutar_super_extractor():
             else:
                 st.warning("No hay datos que coincidan con los filtros seleccionados.")
         else:
-            st.info("💡 Procesa IDCs y Modelos 190 para ver la unificación detallada.")
\ No newline at end of file
+            st.info("💡 Procesa IDCs y Modelos 190 para ver la unificación detallada.")
+
+        if guardadas:
+            _consulta_almacen(guardadas)
+
+    with hueco_rendimiento:
+        _panel_rendimiento(tiempos)
\ No newline at end of file
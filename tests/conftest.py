@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# Las pruebas usan su propia caché (no la del usuario) y el backend local de
+# nóminas; se fija antes de importar nada de la app
+os.environ["AUDITORIA_CACHE"] = os.path.join(tempfile.mkdtemp(prefix="auditoria_pruebas_"), "extractores.sqlite")
+os.environ["NOMINAS_BACKEND"] = "falso"
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
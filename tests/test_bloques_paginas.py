@@ -0,0 +1,53 @@
+"""
+La lectura por bloques de páginas en varios procesos (190 y RNT) tiene que dar
+exactamente lo mismo que la lectura secuencial, corte donde corte el bloque.
+Los PDF salen de benchmarks/generador_pdf.py.
+"""
+import io
+
+import pytest
+
+from extractor_190 import extraer_datos_190
+from generador_pdf import pdf_190, pdf_rnt, plantilla
+from paginas_pdf import contar_paginas
+from rnt_reader import extraer_bases_rnt
+
+BLOQUES = [1, 2, 3, 7, None]
+
+
+@pytest.fixture(scope="module", params=[True, False], ids=["cabecera_por_pagina", "seguido"])
+def rnt(request):
+    # Seguido, los bloques empiezan a mitad de mes y de trabajador (estado heredado)
+    return pdf_rnt(*plantilla(30), cabecera_por_pagina=request.param)
+
+
+@pytest.fixture(scope="module")
+def modelo_190():
+    return pdf_190(*plantilla(60))
+
+
+def _archivo(contenido, nombre):
+    archivo = io.BytesIO(contenido)
+    archivo.name = nombre
+    return archivo
+
+
+def test_los_pdf_tienen_varias_paginas(rnt, modelo_190):
+    assert contar_paginas(rnt) > 7
+    assert contar_paginas(modelo_190) > 3
+
+
+@pytest.mark.parametrize("paginas_por_bloque", BLOQUES)
+def test_rnt_por_bloques_igual_que_secuencial(rnt, paginas_por_bloque):
+    secuencial = extraer_bases_rnt(_archivo(rnt, "rnt.pdf"))
+    por_bloques = extraer_bases_rnt(_archivo(rnt, "rnt.pdf"), procesos=2, paginas_por_bloque=paginas_por_bloque)
+    assert secuencial[0]
+    assert por_bloques == secuencial
+
+
+@pytest.mark.parametrize("paginas_por_bloque", BLOQUES)
+def test_190_por_bloques_igual_que_secuencial(modelo_190, paginas_por_bloque):
+    secuencial = extraer_datos_190(_archivo(modelo_190, "190.pdf"))
+    por_bloques = extraer_datos_190(_archivo(modelo_190, "190.pdf"), procesos=2, paginas_por_bloque=paginas_por_bloque)
+    assert secuencial
+    assert por_bloques == secuencial
@@ -0,0 +1,56 @@
+"""
+Un archivo subido en el cargador de un tipo solo se pasa a otro si lo dice el
+título o una marca propia del informe; las etiquetas genéricas que también
+lleva una nómina no bastan.
+"""
+import pytest
+
+from clasificador_pdf import tipo_por_texto
+from generador_pdf import pdf_de_lineas, pdf_rnt, plantilla
+from pipeline_auditoria import asignar_tipos
+
+NOMINA_PERIODO = [
+    "RECIBO DE SALARIOS",
+    "EMPRESA SINTETICA SL CIF B00000000",
+    "Periodo de liquidación 01/01/2024 a 31/01/2024",
+    "SALARIO BASE 1.500,00",
+    "TOTAL A PERCIBIR 1.320,00",
+]
+NOMINA_CONTRATO = [
+    "RECIBO DE SALARIOS",
+    "TRABAJADOR: JOSE GARCIA T.CONTRATO: 100",
+    "SALARIO BASE 1.500,00",
+]
+
+
+@pytest.mark.parametrize("lineas, esperado", [
+    (["RELACIÓN NOMINAL DE TRABAJADORES"], ("rnt", True)),
+    (["Modelo 190"], ("190", True)),
+    (["PERIODO: DESDE 01-01-2024"], ("idc", True)),
+    (["I. DEVENGOS"], ("nominas", False)),
+    (NOMINA_PERIODO, ("rnt", False)),
+    (NOMINA_CONTRATO, ("idc", False)),
+    ([""], ("nominas", False)),
+    (["OTRA COSA"], (None, False)),
+])
+def test_tipo_por_texto(lineas, esperado):
+    assert tipo_por_texto("\n".join(lineas)) == esperado
+
+
+@pytest.mark.parametrize("lineas", [NOMINA_PERIODO, NOMINA_CONTRATO])
+def test_nomina_subida_como_nomina_se_queda(lineas):
+    contenido = pdf_de_lineas([lineas])
+    asignados, avisos, errores = asignar_tipos([("nominas", "nomina.pdf", contenido)])
+    assert [tipo for tipo, _, _ in asignados] == ["nominas"]
+    assert avisos == [] and errores == []
+
+
+def test_sin_tipo_toma_el_detectado():
+    asignados, _, _ = asignar_tipos([(None, "nomina.pdf", pdf_de_lineas([NOMINA_PERIODO]))])
+    assert asignados[0][0] == "rnt"
+
+
+def test_informe_en_cargador_equivocado_se_corrige():
+    asignados, avisos, _ = asignar_tipos([("idc", "rnt.pdf", pdf_rnt(*plantilla(2), meses=1))])
+    assert asignados[0][0] == "rnt"
+    assert avisos == [{"Archivo": "rnt.pdf", "Subido como": "idc", "Procesado como": "rnt"}]
@@ -0,0 +1,81 @@
+"""
+La tabla del IDC (matriz días x trabajadores) tiene que dar lo mismo que el
+cálculo de antes, día a día y trabajador a trabajador. Las filas esperadas
+son las que daba aquel bucle con estos mismos IDCs: contratos que se
+solapan, IT (también cruzando el cambio de año), huecos sin IDC,
+coeficientes de parcialidad, un autónomo y un alta ilegible.
+"""
+from datetime import datetime as F
+
+import pytest
+
+from motor_horas import construir_matriz_horas, tabla_idc
+from registros import RegistroIDC
+
+def _idc(nombre, dni, desde, hasta, alta, baja, ctp=0, tramos_it=(), inicio=None, autonomo=False, contrato="100"):
+    return RegistroIDC(
+        nombre=nombre, dni_trabajador=dni, nif_empresa="B00000000", empresa="EMPRESA PRUEBA SL", ctp=ctp,
+        es_autonomo=autonomo, desde_info=desde, hasta_info=hasta, inicio_contrato=inicio or alta or desde,
+        tramos_it=tuple(tramos_it), alta=alta, baja=baja, tipo_contrato=contrato,
+    )
+
+
+IDCS = [
+    # Dos IDCs que se solapan (el segundo manda desde marzo), parcial al 50 % y luego completo,
+    # IT en cada uno y la segunda cruzando el cambio de año
+    _idc("ANA GARCIA", "12345678Z", F(2023, 6, 1), F(2024, 6, 30), F(2023, 6, 1), None, ctp=500,
+         tramos_it=[(F(2024, 2, 10), F(2024, 2, 20))]),
+    _idc("ANA GARCIA", "12345678Z", F(2024, 3, 1), F(2025, 3, 31), F(2023, 6, 1), None, ctp=1000,
+         tramos_it=[(F(2024, 12, 20), F(2025, 1, 10))]),
+    # Parcial al 75 %, sin IDC entre el inicio del contrato y el alta (incompleto) y baja en septiembre
+    _idc("LUIS PEREZ", "87654321X", F(2024, 4, 15), F(2024, 12, 31), F(2024, 4, 15), F(2024, 9, 30), ctp=750,
+         inicio=F(2024, 1, 1), contrato="401", tramos_it=[(F(2024, 9, 25), F(2024, 10, 5))]),
+    # Autónomo: dedicación completa y la IT no cuenta
+    _idc("MARTA LOPEZ", "11111111H", F(2023, 12, 1), F(2025, 2, 28), F(2023, 12, 1), None, autonomo=True,
+         contrato="", tramos_it=[(F(2024, 5, 1), F(2024, 5, 31))]),
+    # Dos contratos con un hueco en medio, coeficiente 62,5 % en el segundo
+    _idc("PEDRO RUIZ", "22222222J", F(2024, 1, 1), F(2024, 3, 31), F(2023, 1, 1), F(2024, 3, 31), ctp=1000,
+         inicio=F(2023, 1, 1), contrato="502"),
+    _idc("PEDRO RUIZ", "22222222J", F(2024, 5, 1), F(2024, 12, 31), F(2024, 5, 1), F(2025, 1, 15), ctp=625,
+         inicio=F(2023, 1, 1), contrato="502", tramos_it=[(F(2024, 12, 30), F(2025, 1, 3))]),
+    # Alta ilegible: no cuenta ningún día
+    _idc("SIN FECHAS", "33333333P", F(2024, 1, 1), F(2024, 12, 31), None, None, ctp=1000),
+]
+
+COLUMNAS = ["Nombre", "Estado", "Inicio Auditado", "Fin Auditado", "Días IT", "Horas Teóricas", "Horas IT",
+            "Horas Efectivas", "Dedicación", "Cotiz. Desempleo (%)", "Total Cotización (%)"]
+OK, INCOMPLETO = "✅ OK", "⚠️ INCOMPLETO"
+
+ESPERADO = {
+    (2024, 1800.0, 25.07): [
+        ("ANA GARCIA", OK, "01-01-2024", "31-12-2024", 23, 1652.46, 86.07, 1566.39, "100%", 5.5, 30.57),
+        ("LUIS PEREZ", INCOMPLETO, "15-04-2024", "30-09-2024", 6, 623.36, 22.13, 601.23, "75.00%", 6.7, 31.77),
+        ("MARTA LOPEZ", OK, "01-01-2024", "31-12-2024", 0, 1800.0, 0.0, 1800.0, "100%", 0.0, 25.07),
+        ("PEDRO RUIZ", INCOMPLETO, "01-01-2024", "31-12-2024", 2, 1200.61, 6.15, 1194.47, "62.50%", 6.7, 31.77),
+    ],
+    (2025, 1750.5, 23.6): [
+        ("ANA GARCIA", INCOMPLETO, "01-01-2025", "31-03-2025", 10, 431.63, 47.96, 383.67, "100%", 5.5, 29.1),
+        ("MARTA LOPEZ", INCOMPLETO, "01-01-2025", "28-02-2025", 0, 282.96, 0.0, 282.96, "100%", 0.0, 23.6),
+    ],
+}
+
+
+@pytest.fixture(scope="module")
+def matriz():
+    return construir_matriz_horas(IDCS, [2024, 2025])
+
+
+@pytest.mark.parametrize("escenario", list(ESPERADO))
+def test_tabla_idc_igual_que_el_calculo_dia_a_dia(matriz, escenario):
+    anio, h_conv, tipo_general = escenario
+    df = tabla_idc(matriz, anio, h_conv, tipo_general).sort_values("Nombre")
+    assert [tuple(fila) for fila in df[COLUMNAS].itertuples(index=False)] == ESPERADO[escenario]
+    assert (df["Cotiz. Gral (%)"] == tipo_general).all()
+
+
+def test_autonomo_con_empresa_manual_y_seleccion(matriz):
+    df = tabla_idc(matriz, 2024, 1800.0, 25.07, seleccion=["MARTA LOPEZ", "SIN FECHAS", "NADIE"],
+                   emp_manual="CLIENTE SL", cif_manual="B99999999")
+    assert df[["Nombre", "DNI", "Empresa", "CIF Empresa"]].values.tolist() == [
+        ["MARTA LOPEZ", "11111111H", "CLIENTE SL", "B99999999"]
+    ]
@@ -0,0 +1,84 @@
+"""
+Nóminas contra el backend local (ClienteDocumentAIFalso): orden de los
+resultados, límite de peticiones en vuelo, reintentos ante errores de cuota
+y fallos por archivo en el lote.
+"""
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+import extractor_nominas
+from cache_extractores import cache
+from extractor_nominas import ClienteDocumentAIFalso, iterar_documentos, procesar_pagina
+from generador_pdf import lote_sintetico, pdf_nominas, plantilla
+from pipeline_auditoria import extraer_documentos
+
+
+@pytest.fixture(autouse=True)
+def sin_esperas(monkeypatch):
+    # Sin respuestas guardadas de otra prueba y sin esperar entre reintentos
+    cache.invalidar("nominas")
+    monkeypatch.setattr(extractor_nominas, "ESPERA_REINTENTO_S", 0.0)
+
+
+def _paginas(n):
+    return [(f"pagina_{i:03d}.pdf", f"contenido {i}".encode()) for i in range(n)]
+
+
+def test_resultados_en_el_orden_de_las_paginas():
+    cliente = ClienteDocumentAIFalso(latencia=0.01, variacion=1.0)
+    paginas = _paginas(40)
+    resultados = list(iterar_documentos(paginas, max_en_vuelo=6, cliente=cliente))
+    assert [r["Archivo"] for r in resultados] == [nombre for nombre, _ in paginas]
+    assert cliente.llamadas == 40
+
+
+@pytest.mark.parametrize("max_en_vuelo", [1, 3, 8])
+def test_peticiones_en_vuelo_acotadas(max_en_vuelo):
+    cliente = ClienteDocumentAIFalso(latencia=0.02)
+    list(iterar_documentos(_paginas(24), max_en_vuelo=max_en_vuelo, cliente=cliente))
+    assert cliente.max_en_vuelo == max_en_vuelo
+
+
+@pytest.mark.parametrize("error", [google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable])
+def test_reintenta_los_errores_transitorios(error):
+    cliente = ClienteDocumentAIFalso(errores=[error("cuota"), error("cuota")])
+    campos = procesar_pagina("p.pdf", b"una pagina", cliente)
+    assert campos["Nombre"] == "TRABAJADOR FALSO"
+    assert cliente.llamadas == 3
+
+
+def test_deja_de_reintentar_al_llegar_al_maximo():
+    errores = [google_exceptions.ResourceExhausted("cuota")] * (extractor_nominas.MAX_REINTENTOS + 1)
+    cliente = ClienteDocumentAIFalso(errores=errores)
+    with pytest.raises(google_exceptions.ResourceExhausted):
+        procesar_pagina("p.pdf", b"una pagina", cliente)
+    assert cliente.llamadas == extractor_nominas.MAX_REINTENTOS + 1
+
+
+def test_error_no_transitorio_no_se_reintenta():
+    cliente = ClienteDocumentAIFalso(errores=[google_exceptions.InvalidArgument("página ilegible")])
+    with pytest.raises(google_exceptions.InvalidArgument):
+        procesar_pagina("p.pdf", b"una pagina", cliente)
+    assert cliente.llamadas == 1
+
+
+def test_nomina_que_falla_no_tumba_el_lote(monkeypatch):
+    cliente = ClienteDocumentAIFalso(errores=[google_exceptions.InvalidArgument("página ilegible")])
+    monkeypatch.setitem(extractor_nominas.BACKENDS_NOMINAS, "prueba", lambda: cliente)
+    extractor_nominas.usar_backend("prueba")
+    try:
+        empresa, trabajadores = plantilla(3)
+        archivos = lote_sintetico(3) + [("nominas", "nominas_02.pdf", pdf_nominas(empresa, trabajadores, mes=2))]
+        lote, procesados = extraer_documentos(archivos, procesos=1)
+    finally:
+        extractor_nominas.usar_backend("falso")
+
+    assert cliente.llamadas == 6
+    assert len(lote["errores"]) == 1
+    fallo = lote["errores"][0]
+    assert fallo["Tipo"] == "nominas" and fallo["Motivo"] == "error"
+    assert fallo["Error"].startswith("InvalidArgument")
+    # La otra nómina y el resto de documentos sí se extraen
+    assert len(lote["raw_nom"]) == 3
+    assert len(lote["raw_idc"]) == 3 and lote["raw_190"] and lote["raw_rnt_res"]
+    assert len(procesados) == len(archivos) - 1
@@ -0,0 +1,59 @@
+"""
+Las versiones de columna de normalizacion tienen que dar exactamente lo
+mismo que aplicar la escalar fila a fila, también con valores sucios.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from normalizacion import (limpiar_columna_numerica, limpiar_valor_numerico, normalizar_dni_columna,
+                           normalizar_dni_final)
+
+SUCIOS = [
+    "", "   ", None, np.nan, pd.NA, "N/A", "n/a", "-",
+    "1.234,56", "1.234.567,8", " 12,5 ", "-3,40", "0,00", ",5", "5,", "1,2,3", "1.2.3", "1e3", "inf",
+    "01/02/24", "31/12/2023", "12-05-24",
+    "12345678z", " 12.345.678-Z ", "x1234567l", "ES12345678Z", "b-12.345.678", "12 345 678 z", "1234",
+    "Peña 1.000,00", "ñ12345678", "１２３,４５", "12 345,00", "\t7,5\n",
+    1234.5, 7, 0, -2.25, np.float64(3.5),
+]
+
+
+def _columna(valores, dtype=object):
+    return pd.Series(valores, dtype=dtype, name="col", index=range(100, 100 + len(valores)))
+
+
+def _iguales(columna, escalar):
+    # Mismo valor fila a fila (None == None, NaN no aparece en ninguna de las dos)
+    assert list(columna) == list(escalar)
+    assert columna.index.equals(escalar.index) and columna.name == escalar.name
+
+
+@pytest.mark.parametrize("valor", SUCIOS, ids=repr)
+def test_importe_un_valor(valor):
+    serie = _columna([valor, "1.000,00"])
+    _iguales(limpiar_columna_numerica(serie), serie.apply(limpiar_valor_numerico).astype(float))
+
+
+@pytest.mark.parametrize("valor", SUCIOS, ids=repr)
+def test_dni_un_valor(valor):
+    serie = _columna([valor, "12345678Z"])
+    _iguales(normalizar_dni_columna(serie), serie.apply(normalizar_dni_final))
+
+
+@pytest.mark.parametrize("dtype", [object, "string"])
+def test_columna_mezclada(dtype):
+    textos = ([v for v in SUCIOS if isinstance(v, str)] + [None]) * 50
+    np.random.default_rng(0).shuffle(textos)
+    serie = _columna(textos, dtype)
+    _iguales(limpiar_columna_numerica(serie), serie.apply(limpiar_valor_numerico).astype(float))
+    _iguales(normalizar_dni_columna(serie), serie.apply(normalizar_dni_final))
+
+
+@pytest.mark.parametrize("serie", [
+    pd.Series([1.5, np.nan, 3.0], name="col"),
+    pd.Series([1, 2, 3], name="col"),
+    pd.Series([True, False], name="col"),
+])
+def test_importe_columna_numerica(serie):
+    _iguales(limpiar_columna_numerica(serie), serie.apply(limpiar_valor_numerico).astype(float))
@@ -0,0 +1,19 @@
+"""
+Aciertos y fallos de caché de una extracción: los de esa llamada, no los
+contadores globales de CacheDisco que comparten sesiones y trabajos.
+"""
+from cache_extractores import cache
+from generador_pdf import lote_sintetico
+from pipeline_auditoria import extraer_documentos
+
+
+def test_aciertos_de_cache_por_llamada():
+    cache.invalidar()
+    archivos = lote_sintetico(2)
+    primero, _ = extraer_documentos(archivos, procesos=1)
+    # Otras búsquedas en la caché (otra sesión, otro trabajo) no cuentan
+    cache.obtener("otra sesión")
+    segundo, _ = extraer_documentos(archivos, procesos=1)
+    # 2 IDC + 190 + RNT y 2 páginas de nómina: la primera vez se extrae todo, la segunda sale de caché
+    assert primero["cache"] == {"aciertos": 0, "fallos": 6}
+    assert segundo["cache"] == {"aciertos": 6, "fallos": 0}
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline_auditoria import asignar_tipos, clave_archivo, ensamblar_registros, extraer_documentos
+
+# Extracciones en segundo plano. El pool vive en el proceso del servidor (no
+# en la ejecución del script de Streamlit), así que un trabajo sigue su curso
+# aunque la página se recargue, y varios auditores pueden encolar trabajos
+# sin bloquearse: hasta TRABAJOS_SIMULTANEOS a la vez, el resto espera turno.
+
+TRABAJOS_SIMULTANEOS = int(os.environ.get("AUDITORIA_TRABAJOS", "2"))
+# Un trabajo terminado se puede recuperar durante este tiempo
+CONSERVAR_TERMINADOS_S = 3600
+
+_pool = ThreadPoolExecutor(max_workers=TRABAJOS_SIMULTANEOS, thread_name_prefix="extraccion")
+_trabajos = {}
+_lock = threading.Lock()
+
+
+class Trabajo:
+    """
+    Una extracción encolada. Se actualiza desde el hilo del pool y se
+    consulta desde las sesiones de Streamlit con progreso() y registros_desde().
+    """
+
+    def __init__(self, archivos, procesos, anio_190, procesados, limites, medir=False):
+        self.id = uuid.uuid4().hex
+        self.anio_190 = anio_190
+        self.estado = "en cola"
+        self.error = None
+        self.total_archivos = len(archivos)
+        self.archivos_hechos = 0
+        self.extraidos = 0
+        self.paginas = 0
+        self.ultimo_archivo = None
+        self.creado = time.time()
+        self.inicio = None
+        self.fin = None
+        self.lote = None
+        self.procesados = {}
+        self.claves = []
+        # Claves de los archivos extraídos en este trabajo, en el orden en que terminan
+        self.terminados = []
+        # Segundos por etapa (clasificación, extracción) si se mide el rendimiento
+        self.tiempos = {} if medir else None
+        self._args = (archivos, procesos, procesados or {}, limites or {})
+        self._lock = threading.Lock()
+
+    def _ejecutar(self):
+        archivos, procesos, procesados, limites = self._args
+        with self._lock:
+            self.estado = "en curso"
+            self.inicio = time.time()
+        try:
+            archivos, avisos, errores = asignar_tipos(archivos, procesos, self.tiempos)
+            claves = [clave_archivo(*archivo) for archivo in archivos]
+            with self._lock:
+                self.claves = claves
+                self.total_archivos = len(archivos)
+                self.procesados = {c: procesados[c] for c in claves if c in procesados}
+                self.archivos_hechos = len(self.procesados)
+            lote, vigentes = extraer_documentos(
+                archivos, procesos, self.anio_190, procesados, self.tiempos, claves=claves,
+                al_terminar=self._archivo_terminado, **limites
+            )
+            lote["avisos"], lote["errores"] = avisos, errores + lote["errores"]
+            with self._lock:
+                self.lote, self.procesados = lote, vigentes
+                self.estado = "terminado"
+        except Exception as e:
+            with self._lock:
+                self.error = f"{type(e).__name__}: {e}"
+                self.estado = "error"
+        finally:
+            with self._lock:
+                self.fin = time.time()
+                self._args = None  # suelta los PDFs
+
+    def _archivo_terminado(self, clave, resultado):
+        with self._lock:
+            self.archivos_hechos += 1
+            self.extraidos += 1
+            self.paginas += resultado['paginas'] or 0
+            self.ultimo_archivo = resultado['nombre']
+            self.terminados.append(clave)
+            if not resultado['error']:
+                self.procesados[clave] = resultado['datos']
+
+    def progreso(self):
+        """
+        Foto del estado: archivos hechos (extraídos ahora o de antes), páginas y páginas por segundo.
+        """
+        with self._lock:
+            segundos = ((self.fin or time.time()) - self.inicio) if self.inicio else 0.0
+            return {
+                "estado": self.estado,
+                "error": self.error,
+                "archivos_hechos": self.archivos_hechos,
+                "extraidos": self.extraidos,
+                "total_archivos": self.total_archivos,
+                "paginas": self.paginas,
+                "segundos": segundos,
+                "paginas_por_segundo": self.paginas / segundos if segundos else 0.0,
+                "ultimo_archivo": self.ultimo_archivo,
+                "en_cola": sum(1 for t in list(_trabajos.values()) if t.estado == "en cola" and t.creado < self.creado),
+            }
+
+    def registros_desde(self, n=None):
+        """
+        (lote con los registros de los archivos terminados del n-ésimo en
+        adelante, archivos terminados hasta ahora). Sirve para ir sumando a lo
+        ya mostrado sin volver a montar el lote entero. Con n=None, todo lo
+        disponible (también lo que ya estaba procesado antes del trabajo).
+        """
+        with self._lock:
+            claves = list(self.claves) if n is None else self.terminados[n:]
+            procesados = {c: self.procesados[c] for c in claves if c in self.procesados}
+            hechos = len(self.terminados)
+        return ensamblar_registros(claves, procesados, self.anio_190), hechos
+
+    @property
+    def activo(self):
+        return self.estado in ("en cola", "en curso")
+
+
+def _purgar():
+    limite = time.time() - CONSERVAR_TERMINADOS_S
+    for id_trabajo in [i for i, t in _trabajos.items() if t.fin and t.fin < limite]:
+        del _trabajos[id_trabajo]
+
+
+def lanzar_trabajo(archivos, procesos, anio_190=2024, procesados=None, limites=None, medir=False):
+    """
+    Encola la extracción de `archivos` (ver extraer_documentos; los de tipo
+    None se clasifican antes con asignar_tipos) y devuelve el Trabajo.
+    `limites`: {"limite_s", "limite_mb"} por documento (por defecto los de ejecutor_lote).
+    Con `medir` el trabajo guarda sus tiempos por etapa y el lote su rendimiento por tipo.
+    """
+    trabajo = Trabajo(archivos, procesos, anio_190, procesados, limites, medir)
+    with _lock:
+        _purgar()
+        _trabajos[trabajo.id] = trabajo
+    _pool.submit(trabajo._ejecutar)
+    return trabajo
+
+
+def obtener_trabajo(id_trabajo):
+    with _lock:
+        return _trabajos.get(id_trabajo)